@@ -0,0 +1,124 @@
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+
+from core.metricas import contador, incrementar, registrar_gauge
+
+
+# Controle otimista de concorrência: o formulário devolve a `versao` lida
+# e a gravação é um UPDATE ... WHERE id = ? AND versao = ?. Nenhuma linha
+# fica travada entre o GET e o POST.
+
+
+class Conflito:
+    """
+    Linha alterada (ou removida) por outro usuário desde a leitura.
+    `diferencas`: (campo, valor enviado, valor atual) dos campos que
+    divergem.
+    """
+
+    def __init__(self, enviada, atual, diferencas):
+        self.enviada = enviada
+        self.atual = atual
+        self.diferencas = diferencas
+
+    @property
+    def removida(self):
+        return self.atual is None
+
+
+class ConflitoDeVersao(Exception):
+    """
+    Nenhuma linha foi gravada: ao menos uma estava em outra versão
+    """
+
+    def __init__(self, conflitos):
+        self.conflitos = conflitos
+        super().__init__(f"{len(conflitos)} registro(s) alterado(s) por outro usuário.")
+
+
+def _nome_metrica(modelo):
+    return f"concorrencia.{modelo._meta.label_lower}"
+
+
+def _conflitos(modelo, objs, campos):
+    atuais = modelo._default_manager.in_bulk([obj.pk for obj in objs])
+    conflitos = []
+    for obj in objs:
+        atual = atuais.get(obj.pk)
+        if atual is not None and atual.versao == obj.versao:
+            continue
+        diferencas = []
+        if atual is not None:
+            for campo in campos:
+                enviado, gravado = getattr(obj, campo), getattr(atual, campo)
+                if enviado != gravado:
+                    nome = modelo._meta.get_field(campo).verbose_name
+                    diferencas.append((nome, enviado, gravado))
+        conflitos.append(Conflito(obj, atual, diferencas))
+    return conflitos
+
+
+def gravar_com_versao(objs, campos):
+    """
+    Grava `campos` de todas as instâncias (mesmo modelo) num UPDATE só,
+    condicionado à `versao` de cada uma, e incrementa a versão.
+
+    Se alguma linha mudou desde a leitura, nada é gravado e
+    ConflitoDeVersao traz as diferenças para mostrar ao usuário.
+    """
+    objs = list(objs)
+    if not objs:
+        return 0
+    modelo = type(objs[0])
+    opts = modelo._meta
+
+    condicao = Q()
+    for obj in objs:
+        condicao |= Q(pk=obj.pk, versao=obj.versao)
+
+    if len(objs) == 1:
+        valores = {campo: getattr(objs[0], campo) for campo in campos}
+    else:
+        valores = {
+            campo: Case(
+                *[When(pk=obj.pk, then=Value(getattr(obj, campo), output_field=opts.get_field(campo)))
+                  for obj in objs],
+                output_field=opts.get_field(campo),
+            )
+            for campo in campos
+        }
+
+    metrica = _nome_metrica(modelo)
+    incrementar(f"{metrica}.gravacoes")
+    try:
+        with transaction.atomic():
+            gravadas = modelo._default_manager.filter(condicao).update(
+                versao=F("versao") + 1, **valores
+            )
+            if gravadas != len(objs):
+                # Desfaz as linhas que passaram: é tudo ou nada
+                raise ConflitoDeVersao([])
+    except ConflitoDeVersao:
+        incrementar(f"{metrica}.conflitos")
+        # Lidas depois do rollback: dentro do atomic viriam as linhas
+        # que este UPDATE acabou de gravar
+        raise ConflitoDeVersao(_conflitos(modelo, objs, campos)) from None
+
+    for obj in objs:
+        obj.versao += 1
+    return gravadas
+
+
+def taxa_de_conflitos(modelo):
+    """
+    Conflitos / gravações desde o início dos contadores
+    """
+    metrica = _nome_metrica(modelo)
+    gravacoes = contador(f"{metrica}.gravacoes")
+    return round(contador(f"{metrica}.conflitos") / gravacoes, 4) if gravacoes else 0.0
+
+
+def registrar_metricas_de_conflito(modelo):
+    metrica = _nome_metrica(modelo)
+    registrar_gauge(f"{metrica}.conflitos", lambda: contador(f"{metrica}.conflitos"))
+    registrar_gauge(f"{metrica}.taxa_conflitos", lambda: taxa_de_conflitos(modelo))
@@ -0,0 +1,127 @@
+import csv
+import tempfile
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.http import FileResponse, Http404, StreamingHttpResponse
+from django.utils import timezone
+
+
+# Linhas lidas do banco por vez; a memória não cresce com o período exportado
+TAMANHO_BLOCO = 2000
+
+FORMATOS = ("csv", "xlsx")
+
+
+class Echo:
+    """
+    Pseudo-buffer para o csv.writer: devolve a linha em vez de guardá-la
+    """
+
+    def write(self, value):
+        return value
+
+
+def _hora_local(valor):
+    # Datetimes vêm do banco em UTC; a planilha mostra a hora local, sem fuso
+    if isinstance(valor, datetime) and timezone.is_aware(valor):
+        return timezone.localtime(valor).replace(tzinfo=None)
+    return valor
+
+
+def _valor_csv(valor):
+    # Formato do Excel em pt-BR: data dd/mm/aaaa e vírgula decimal
+    if valor is None:
+        return ""
+    if isinstance(valor, datetime):
+        return _hora_local(valor).strftime("%d/%m/%Y %H:%M")
+    if isinstance(valor, date):
+        return valor.strftime("%d/%m/%Y")
+    if isinstance(valor, Decimal):
+        return str(valor).replace(".", ",")
+    return valor
+
+
+def resposta_csv(nome_arquivo, cabecalho, linhas):
+    """
+    CSV enviado linha a linha enquanto o iterador do banco é consumido
+    """
+    escritor = csv.writer(Echo(), delimiter=";")
+
+    def gerar():
+        # BOM para o Excel reconhecer UTF-8 (acentos)
+        yield "\ufeff" + escritor.writerow(cabecalho)
+        for linha in linhas:
+            yield escritor.writerow([_valor_csv(valor) for valor in linha])
+
+    response = StreamingHttpResponse(gerar(), content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="{nome_arquivo}.csv"'
+    return response
+
+
+def resposta_xlsx(nome_arquivo, cabecalho, linhas):
+    """
+    XLSX gravado em modo constant_memory (cada linha vai para o disco assim
+    que a seguinte começa) num arquivo temporário e enviado em blocos só
+    depois da última linha. Não é streaming como o CSV: o download começa
+    quando a planilha inteira está pronta.
+    """
+    import xlsxwriter
+
+    arquivo = tempfile.TemporaryFile()
+    workbook = xlsxwriter.Workbook(arquivo, {
+        "constant_memory": True,
+        "default_date_format": "dd/mm/yyyy",
+    })
+    planilha = workbook.add_worksheet(nome_arquivo[:31])
+    negrito = workbook.add_format({"bold": True})
+    data_hora = workbook.add_format({"num_format": "dd/mm/yyyy hh:mm"})
+
+    planilha.write_row(0, 0, cabecalho, negrito)
+    for numero, linha in enumerate(linhas, start=1):
+        for coluna, valor in enumerate(linha):
+            if isinstance(valor, datetime):
+                planilha.write_datetime(numero, coluna, _hora_local(valor), data_hora)
+            else:
+                planilha.write(numero, coluna, "" if valor is None else valor)
+    workbook.close()
+
+    arquivo.seek(0)
+    return FileResponse(
+        arquivo,
+        as_attachment=True,
+        filename=f"{nome_arquivo}.xlsx",
+        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    )
+
+
+class ExportacaoMixin:
+    """
+    Exporta o queryset filtrado de uma ListView em CSV ou XLSX.
+
+    Herde junto com a view do cenário para reaproveitar o get_queryset (e
+    os mesmos filtros do GET). Defina `colunas_exportacao` com pares
+    (título, caminho do campo) e, se preciso, `ordenacao_exportacao`.
+    """
+
+    colunas_exportacao = []
+    ordenacao_exportacao = None
+    nome_exportacao = "exportacao"
+
+    def linhas_exportacao(self):
+        campos = [campo for _, campo in self.colunas_exportacao]
+        queryset = self.get_queryset().select_related(None).prefetch_related(None)
+        if self.ordenacao_exportacao:
+            queryset = queryset.order_by(*self.ordenacao_exportacao)
+        return queryset.values_list(*campos).iterator(chunk_size=TAMANHO_BLOCO)
+
+    def get(self, request, *args, **kwargs):
+        formato = kwargs.get("formato")
+        if formato not in FORMATOS:
+            raise Http404("Formato de exportação inválido.")
+
+        cabecalho = [titulo for titulo, _ in self.colunas_exportacao]
+        linhas = self.linhas_exportacao()
+        if formato == "xlsx":
+            return resposta_xlsx(self.nome_exportacao, cabecalho, linhas)
+        return resposta_csv(self.nome_exportacao, cabecalho, linhas)
@@ -0,0 +1,60 @@
+import secrets
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+
+
+# Métricas calculadas na hora da leitura: nome → função sem argumentos
+_gauges = {}
+
+PREFIXO_CONTADOR = "metrica:"
+
+
+def registrar_gauge(nome, funcao):
+    """
+    Registra uma métrica calculada sob demanda (ex.: atraso do outbox)
+    """
+    _gauges[nome] = funcao
+
+
+def incrementar(nome, valor=1):
+    """
+    Soma `valor` a um contador. Os contadores ficam no cache do Django;
+    com cache local (LocMem) valem só para o processo atual.
+    """
+    chave = PREFIXO_CONTADOR + nome
+    if not cache.add(chave, valor, timeout=None):
+        try:
+            cache.incr(chave, valor)
+        except ValueError:
+            cache.set(chave, valor, timeout=None)
+
+
+def contador(nome):
+    return cache.get(PREFIXO_CONTADOR + nome, 0)
+
+
+def coletar():
+    """
+    Valores atuais de todos os gauges registrados
+    """
+    return {nome: funcao() for nome, funcao in sorted(_gauges.items())}
+
+
+def _autorizado(request):
+    if request.user.is_authenticated and request.user.is_staff:
+        return True
+    token = settings.METRICAS_TOKEN
+    enviado = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+    return bool(token) and secrets.compare_digest(enviado.encode(), token.encode())
+
+
+def metricas_view(request):
+    """
+    Métricas em JSON para usuários staff ou para quem enviar o
+    METRICAS_TOKEN no cabeçalho Authorization (coletores)
+    """
+    if not _autorizado(request):
+        return JsonResponse({"erro": "Não autorizado."}, status=403)
+    return JsonResponse(coletar())
@@ -0,0 +1,206 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def _ordenacao(queryset, campos):
+    """
+    Converte ("-inicio_separacao", "id") em [(campo, desc, nulo)]
+    """
+    ordenacao = []
+    for campo in campos:
+        nome = campo.lstrip("-")
+        ordenacao.append((
+            nome,
+            campo.startswith("-"),
+            queryset.model._meta.get_field(nome).null,
+        ))
+    return ordenacao
+
+
+def _order_by(ordenacao, invertida=False):
+    """
+    Expressões de ORDER BY. Campos anuláveis ficam com NULL no fim (ou no
+    início, na ordem invertida) para que o cursor seja determinístico em
+    qualquer banco. Campos NOT NULL usam a ordenação simples, que o índice
+    atende nos dois sentidos.
+    """
+    expressoes = []
+    nulos = {"nulls_first": True} if invertida else {"nulls_last": True}
+    for nome, desc, nulo in ordenacao:
+        desc = desc != invertida
+        extra = nulos if nulo else {}
+        expressoes.append(F(nome).desc(**extra) if desc else F(nome).asc(**extra))
+    return expressoes
+
+
+def _filtro_apos(ordenacao, valores, invertida=False):
+    """
+    Q das linhas que vêm depois de `valores` na ordenação (seek):
+    (a > x) OR (a = x AND b > y) OR ...
+    """
+    filtro = Q(pk__in=[])
+    iguais = Q()
+    for (nome, desc, nulo), valor in zip(ordenacao, valores):
+        desc = desc != invertida
+        nulos_no_fim = not invertida
+
+        if valor is None:
+            # Depois de NULL só vem algo se os NULLs estão no início
+            if nulos_no_fim:
+                depois = Q(pk__in=[])
+            else:
+                depois = Q(**{f"{nome}__isnull": False})
+            igual = Q(**{f"{nome}__isnull": True})
+        else:
+            depois = Q(**{f"{nome}__{'lt' if desc else 'gt'}": valor})
+            if nulo and nulos_no_fim:
+                depois |= Q(**{f"{nome}__isnull": True})
+            igual = Q(**{nome: valor})
+
+        filtro |= iguais & depois
+        iguais &= igual
+    return filtro
+
+
+def codificar_cursor(valores, direcao):
+    dados = json.dumps({"v": valores, "d": direcao}, cls=DjangoJSONEncoder)
+    return base64.urlsafe_b64encode(dados.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor, queryset, ordenacao):
+    try:
+        preenchido = cursor + "=" * (-len(cursor) % 4)
+        dados = json.loads(base64.urlsafe_b64decode(preenchido.encode()))
+        valores = dados["v"]
+        direcao = dados["d"]
+        if direcao not in ("n", "p") or len(valores) != len(ordenacao):
+            raise CursorInvalido(cursor)
+        opts = queryset.model._meta
+        return [
+            None if valor is None else opts.get_field(nome).to_python(valor)
+            for (nome, _, _), valor in zip(ordenacao, valores)
+        ], direcao
+    except (binascii.Error, ValueError, KeyError, TypeError,
+            FieldDoesNotExist, ValidationError) as exc:
+        raise CursorInvalido(cursor) from exc
+
+
+class PaginaKeyset:
+    """
+    Página de uma paginação por cursor. Expõe a mesma interface básica do
+    Page do Django usada nos templates (has_next, has_previous...).
+    """
+
+    def __init__(self, object_list, request, parametro, cursor_anterior, cursor_proximo):
+        self.object_list = object_list
+        self.request = request
+        self.parametro = parametro
+        self.cursor_anterior = cursor_anterior
+        self.cursor_proximo = cursor_proximo
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.cursor_proximo is not None
+
+    def has_previous(self):
+        return self.cursor_anterior is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def _url(self, cursor):
+        # Mantém os filtros atuais do GET, trocando apenas o cursor
+        params = self.request.GET.copy()
+        params[self.parametro] = cursor
+        return f"?{params.urlencode()}"
+
+    @property
+    def next_url(self):
+        return self._url(self.cursor_proximo) if self.has_next() else None
+
+    @property
+    def previous_url(self):
+        return self._url(self.cursor_anterior) if self.has_previous() else None
+
+
+def consulta_da_pagina(queryset, campos, por_pagina, valores=None, invertida=False):
+    """
+    Queryset (ainda não avaliado) de uma página: ordenação, seek a partir
+    de `valores` e LIMIT por_pagina + 1. Útil também para EXPLAIN.
+    """
+    ordenacao = _ordenacao(queryset, campos)
+    queryset = queryset.order_by(*_order_by(ordenacao, invertida))
+    if valores is not None:
+        queryset = queryset.filter(_filtro_apos(ordenacao, valores, invertida))
+    return queryset[:por_pagina + 1]
+
+
+def paginar_keyset(request, queryset, campos, por_pagina, parametro="cursor"):
+    """
+    Pagina o queryset por seek em `campos` (ex.: ("-inicio_separacao", "id")).
+
+    Cada página busca por_pagina + 1 linhas a partir do cursor, usando
+    o índice da ordenação; o custo não cresce com o tamanho da tabela.
+    Os campos precisam identificar a linha de forma única (inclua a pk).
+    """
+    ordenacao = _ordenacao(queryset, campos)
+    cursor = request.GET.get(parametro)
+
+    valores, direcao = None, "n"
+    if cursor:
+        try:
+            valores, direcao = decodificar_cursor(cursor, queryset, ordenacao)
+        except CursorInvalido:
+            valores, direcao = None, "n"
+
+    invertida = direcao == "p"
+    linhas = list(consulta_da_pagina(queryset, campos, por_pagina, valores, invertida))
+    sobrou = len(linhas) > por_pagina
+    linhas = linhas[:por_pagina]
+    if invertida:
+        linhas.reverse()
+
+    def chave(obj):
+        return [getattr(obj, nome) for nome, _, _ in ordenacao]
+
+    if invertida:
+        tem_anterior, tem_proximo = sobrou, True
+    else:
+        tem_anterior, tem_proximo = valores is not None, sobrou
+
+    cursor_anterior = codificar_cursor(chave(linhas[0]), "p") if linhas and tem_anterior else None
+    cursor_proximo = codificar_cursor(chave(linhas[-1]), "n") if linhas and tem_proximo else None
+
+    return PaginaKeyset(linhas, request, parametro, cursor_anterior, cursor_proximo)
+
+
+class KeysetPaginationMixin:
+    """
+    Paginação por cursor para ListView. Define `keyset_ordering` com os
+    campos da ordenação (terminando em um campo único).
+    """
+
+    keyset_ordering = ("-id",)
+    paginate_by = 50
+    cursor_param = "cursor"
+
+    def paginate_queryset(self, queryset, page_size):
+        pagina = paginar_keyset(
+            self.request, queryset, self.keyset_ordering, page_size,
+            parametro=self.cursor_param,
+        )
+        return (None, pagina, pagina.object_list, pagina.has_other_pages())
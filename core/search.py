@@ -0,0 +1,251 @@
+import sqlite3
+
+from django.db import connections
+from django.db.models.expressions import RawSQL
+
+
+# Índices de texto: (tabela, tabela FTS5 no SQLite, colunas).
+# No PostgreSQL as mesmas colunas têm um índice GIN pg_trgm sobre
+# UPPER(coluna::text), a expressão que o Django gera para __icontains.
+INDICES_TEXTO = [
+    ("transport_lecom", "transport_lecom_busca", ["lecom", "destino"]),
+    ("transport_carga", "transport_carga_busca", ["carga"]),
+    ("expedicao_separacaocarga", "expedicao_separacaocarga_busca", ["numero_transporte"]),
+]
+
+COLUNAS_INDEXADAS = {
+    (tabela, coluna): tabela_fts
+    for tabela, tabela_fts, colunas in INDICES_TEXTO
+    for coluna in colunas
+}
+
+# Índices de trigramas só conseguem usar termos com 3+ caracteres
+TAMANHO_MINIMO = 3
+
+
+def _resolver_caminho(modelo, caminho):
+    """
+    "cargas__carga" a partir de Lecom → (Carga, campo carga, "cargas", True)
+
+    O último item indica se o caminho passa por uma relação para muitos,
+    caso em que o filtro precisa de subconsulta para não duplicar linhas.
+    """
+    partes = caminho.split("__")
+    muitos = False
+    for parte in partes[:-1]:
+        campo = modelo._meta.get_field(parte)
+        muitos = muitos or campo.one_to_many or campo.many_to_many
+        modelo = campo.related_model
+    return modelo, modelo._meta.get_field(partes[-1]), "__".join(partes[:-1]), muitos
+
+
+class BuscaIcontains:
+    """
+    Busca por substring com __icontains. É o comportamento padrão e o
+    fallback para termos curtos ou colunas sem índice.
+    """
+
+    def ids_correspondentes(self, modelo, campo, termo):
+        return modelo._base_manager.filter(
+            **{f"{campo.name}__icontains": termo}
+        ).values("pk")
+
+    def filtro_direto(self, queryset, campo, termo):
+        return queryset.filter(**{f"{campo.name}__icontains": termo})
+
+    def filtrar(self, queryset, caminho, termo):
+        modelo, campo, prefixo, muitos = _resolver_caminho(queryset.model, caminho)
+
+        if not prefixo:
+            return self.filtro_direto(queryset, campo, termo)
+
+        ids = self.ids_correspondentes(modelo, campo, termo)
+        if not muitos:
+            return queryset.filter(**{f"{prefixo}__in": ids})
+
+        # Relação reversa: IN (subconsulta) dispensa o .distinct()
+        return queryset.filter(pk__in=queryset.model._base_manager.filter(
+            **{f"{prefixo}__in": ids}
+        ).values("pk"))
+
+
+class BuscaTrigrama(BuscaIcontains):
+    """
+    PostgreSQL: o __icontains vira UPPER(coluna::text) LIKE UPPER(%termo%),
+    que os índices GIN pg_trgm das migrações atendem diretamente. Só a
+    montagem por subconsulta (herdada) muda em relação ao filtro original.
+    """
+
+
+class BuscaFTS5(BuscaIcontains):
+    """
+    SQLite: tabelas FTS5 (tokenizer trigram) espelhando as colunas
+    indexadas, mantidas por triggers criados nas migrações.
+    """
+
+    def __init__(self, alias):
+        self.alias = alias
+        self._tabelas = None
+
+    def tabelas_disponiveis(self):
+        # Versões antigas do SQLite não têm o tokenizer trigram; nesse caso
+        # a migração não cria as tabelas e a busca cai no __icontains.
+        if self._tabelas is None:
+            tabelas = set(COLUNAS_INDEXADAS.values())
+            with connections[self.alias].cursor() as cursor:
+                cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+                self._tabelas = {linha[0] for linha in cursor.fetchall()} & tabelas
+        return self._tabelas
+
+    def ids_correspondentes(self, modelo, campo, termo):
+        tabela_fts = COLUNAS_INDEXADAS.get((modelo._meta.db_table, campo.column))
+        if (
+            tabela_fts is None
+            or len(termo) < TAMANHO_MINIMO
+            or tabela_fts not in self.tabelas_disponiveis()
+        ):
+            return super().ids_correspondentes(modelo, campo, termo)
+
+        # Frase entre aspas: casa a substring, sem interpretar operadores
+        frase = '"%s"' % termo.replace('"', '""')
+        return RawSQL(
+            f'SELECT rowid FROM "{tabela_fts}" WHERE "{campo.column}" MATCH %s',
+            [frase],
+        )
+
+    def filtro_direto(self, queryset, campo, termo):
+        ids = self.ids_correspondentes(queryset.model, campo, termo)
+        if isinstance(ids, RawSQL):
+            return queryset.filter(pk__in=ids)
+        return super().filtro_direto(queryset, campo, termo)
+
+
+_backends = {}
+
+
+def get_backend(alias="default"):
+    """
+    Backend de busca escolhido pelo ENGINE do banco em DATABASES
+    """
+    if alias not in _backends:
+        vendor = connections[alias].vendor
+        if vendor == "postgresql":
+            _backends[alias] = BuscaTrigrama()
+        elif vendor == "sqlite":
+            _backends[alias] = BuscaFTS5(alias)
+        else:
+            _backends[alias] = BuscaIcontains()
+    return _backends[alias]
+
+
+def filtrar_texto(queryset, caminho, termo):
+    """
+    Equivale a queryset.filter(<caminho>__icontains=termo), usando o índice
+    de texto do banco quando existir. Caminhos por relações reversas
+    (ex.: "cargas__carga") não precisam de .distinct().
+    """
+    termo = (termo or "").strip()
+    if not termo:
+        return queryset
+    return get_backend(queryset.db).filtrar(queryset, caminho, termo)
+
+
+# =================== INSTALAÇÃO DOS ÍNDICES ===================
+
+def _sql_postgresql(tabela, tabela_fts, colunas):
+    return [
+        f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{tabela}_{coluna}_trgm" '
+        f'ON "{tabela}" USING gin ((UPPER("{coluna}"::text)) gin_trgm_ops)'
+        for coluna in colunas
+    ]
+
+
+def _sql_sqlite(tabela, tabela_fts, colunas):
+    lista = ", ".join(f'"{c}"' for c in colunas)
+    novos = ", ".join(f'new."{c}"' for c in colunas)
+    antigos = ", ".join(f'old."{c}"' for c in colunas)
+    remover = (
+        f'INSERT INTO "{tabela_fts}"("{tabela_fts}", rowid, {lista}) '
+        f"VALUES ('delete', old.id, {antigos});"
+    )
+    inserir = f'INSERT INTO "{tabela_fts}"(rowid, {lista}) VALUES (new.id, {novos});'
+    return [
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS "{tabela_fts}" USING fts5('
+        f"{lista}, content='{tabela}', content_rowid='id', tokenize='trigram')",
+        f'CREATE TRIGGER IF NOT EXISTS "{tabela_fts}_ai" AFTER INSERT ON "{tabela}" '
+        f"BEGIN {inserir} END",
+        f'CREATE TRIGGER IF NOT EXISTS "{tabela_fts}_ad" AFTER DELETE ON "{tabela}" '
+        f"BEGIN {remover} END",
+        f'CREATE TRIGGER IF NOT EXISTS "{tabela_fts}_au" AFTER UPDATE OF {lista} ON "{tabela}" '
+        f"BEGIN {remover} {inserir} END",
+    ]
+
+
+def _objetos_sqlite(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        return {linha[0] for linha in cursor.fetchall()}
+
+
+def instalar_indices_texto(schema_editor, tabelas):
+    """
+    Cria os índices de texto das tabelas informadas. Idempotente.
+
+    No SQLite, se a tabela FTS ou algum trigger estiver faltando (o
+    SQLite recria a tabela em vários ALTERs e os triggers se perdem),
+    recria o que falta e reconstrói o índice a partir da tabela.
+    """
+    connection = schema_editor.connection
+    indices = [indice for indice in INDICES_TEXTO if indice[0] in tabelas]
+
+    if connection.vendor == "postgresql":
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for indice in indices:
+            for sql in _sql_postgresql(*indice):
+                schema_editor.execute(sql)
+
+    elif connection.vendor == "sqlite" and sqlite3.sqlite_version_info >= (3, 34, 0):
+        # tokenizer trigram disponível a partir do SQLite 3.34
+        existentes = _objetos_sqlite(connection)
+        for tabela, tabela_fts, colunas in indices:
+            esperados = {tabela_fts} | {f"{tabela_fts}_{s}" for s in ("ai", "ad", "au")}
+            if esperados <= existentes:
+                continue
+            for sql in _sql_sqlite(tabela, tabela_fts, colunas):
+                schema_editor.execute(sql)
+            schema_editor.execute(
+                f'INSERT INTO "{tabela_fts}"("{tabela_fts}") VALUES (\'rebuild\')'
+            )
+
+    for backend in _backends.values():
+        if isinstance(backend, BuscaFTS5):
+            backend._tabelas = None
+
+
+def remover_indices_texto(schema_editor, tabelas):
+    connection = schema_editor.connection
+    for tabela, tabela_fts, colunas in INDICES_TEXTO:
+        if tabela not in tabelas:
+            continue
+        if connection.vendor == "postgresql":
+            for coluna in colunas:
+                schema_editor.execute(
+                    f'DROP INDEX CONCURRENTLY IF EXISTS "{tabela}_{coluna}_trgm"'
+                )
+        elif connection.vendor == "sqlite":
+            for sufixo in ("ai", "ad", "au"):
+                schema_editor.execute(f'DROP TRIGGER IF EXISTS "{tabela_fts}_{sufixo}"')
+            schema_editor.execute(f'DROP TABLE IF EXISTS "{tabela_fts}"')
+
+
+def reinstalar_indices_sqlite(using="default", **kwargs):
+    """
+    Handler de post_migrate: devolve triggers FTS perdidos em recriações
+    de tabela feitas por migrações posteriores no SQLite.
+    """
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        return
+    tabelas = set(connection.introspection.table_names())
+    with connection.schema_editor() as schema_editor:
+        instalar_indices_texto(schema_editor, tabelas)
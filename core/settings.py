@@ -3,6 +3,7 @@ from django.contrib.messages import constants as messages
 from decouple import config, Csv
 from dj_database_url import parse as db_url
 import os
+import tempfile
 import dj_database_url
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -33,6 +34,7 @@ INSTALLED_APPS = [
     "expedicao",
     "transport",
     "dashboard",
+    "jobs",
 ]
 
 MIDDLEWARE = [
@@ -77,6 +79,25 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Padrão: memória local (por processo). Com vários workers, use um cache
+# compartilhado para a invalidação valer em todos, ex.:
+#   CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache
+#   CACHE_LOCATION=/var/tmp/sgl_cache
+
+CACHES = {
+    "default": {
+        "BACKEND": config("CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": config("CACHE_LOCATION", default="sgl"),
+    }
+}
+
+# KPIs do dashboard em cache (invalidados por signals; o timeout cobre
+# escritas em bulk)
+DASHBOARD_CACHE_SEGUNDOS = config("DASHBOARD_CACHE_SEGUNDOS", default=300, cast=int)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -127,3 +148,25 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 LOGIN_URL = '/accounts/login/'
 LOGIN_REDIRECT_URL = 'dashboard_home'
 LOGOUT_REDIRECT_URL = '/accounts/login/'
+
+# Sincronização transporte → expedição pelo outbox (worker processar_outbox).
+# Desligue para sincronizar dentro da requisição, sem worker.
+SINCRONIZACAO_EM_SEGUNDO_PLANO = config("SINCRONIZACAO_EM_SEGUNDO_PLANO", default=True, cast=bool)
+
+# Painéis ao vivo (SSE): com vários workers, cada conexão aberta consulta a
+# tabela de eventos a cada N segundos para ver o que foi gravado nos outros
+# processos (0 desliga; são conexões / N consultas por segundo). Eventos mais
+# antigos que a retenção são apagados pelo comando limpar_eventos_separacao
+# (agende no cron) ou pela tarefa expedicao.limpar_eventos.
+SSE_INTERVALO_POLLING = config("SSE_INTERVALO_POLLING", default=5, cast=float)
+SSE_RETENCAO_HORAS = config("SSE_RETENCAO_HORAS", default=24, cast=int)
+
+# /metricas/: liberado para usuários staff logados; coletores externos
+# mandam "Authorization: Bearer <METRICAS_TOKEN>" (vazio desliga o token)
+METRICAS_TOKEN = config("METRICAS_TOKEN", default="")
+
+# Uploads da tela de importação de NF-e aguardando o job (receipt.importar_nfes).
+# Com o worker de jobs em outra máquina, aponte para um volume compartilhado.
+IMPORTACAO_NFE_DIR = config(
+    "IMPORTACAO_NFE_DIR", default=os.path.join(tempfile.gettempdir(), "sgl_importacao_nfe")
+)
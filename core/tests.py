@@ -0,0 +1,254 @@
+import re
+import zipfile
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from io import BytesIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F
+from django.test import RequestFactory, TestCase, override_settings
+
+from core.concorrencia import ConflitoDeVersao, gravar_com_versao, taxa_de_conflitos
+from core.exportacao import resposta_xlsx
+from core.pagination import paginar_keyset
+from core.search import filtrar_texto
+from expedicao.models import ControleSeparacao, SeparacaoCarga
+from transport.models import Carga, Lecom
+
+
+class PaginacaoKeysetTests(TestCase):
+    """
+    Seek em (-inicio_separacao, id), com NULLs no fim
+    """
+
+    ORDENACAO = ("-inicio_separacao", "id")
+
+    @classmethod
+    def setUpTestData(cls):
+        lecom = Lecom.objects.create(lecom="1", destino="Destino", uf="SP", data=date(2026, 10, 18))
+        controle = ControleSeparacao.objects.create(lecom=lecom)
+        inicio = datetime(2026, 10, 18, 8, tzinfo=dt_timezone.utc)
+        cargas = Carga.objects.bulk_create([Carga(lecom=lecom, seq=seq) for seq in range(1, 24)])
+        SeparacaoCarga.objects.bulk_create([
+            SeparacaoCarga(
+                controle=controle, carga=carga, seq=carga.seq, numero_transporte=str(carga.seq),
+                # Inícios repetidos (empate resolvido pelo id) e nulos
+                inicio_separacao=None if carga.seq % 5 == 0 else inicio + timedelta(hours=carga.seq // 3),
+            )
+            for carga in cargas
+        ])
+        cls.esperado = list(
+            SeparacaoCarga.objects.order_by(F("inicio_separacao").desc(nulls_last=True), "id")
+            .values_list("pk", flat=True)
+        )
+
+    def pagina(self, url="/", **params):
+        request = RequestFactory().get(url, params)
+        return paginar_keyset(request, SeparacaoCarga.objects.all(), self.ORDENACAO, 5)
+
+    def test_percorre_todas_as_linhas_sem_repetir(self):
+        vistos, pagina = [], self.pagina(status="Aguardando")
+        self.assertFalse(pagina.has_previous())
+        while True:
+            vistos.extend(obj.pk for obj in pagina)
+            if not pagina.has_next():
+                break
+            # O link mantém os filtros do GET
+            self.assertIn("status=Aguardando", pagina.next_url)
+            pagina = self.pagina(status="Aguardando", cursor=pagina.cursor_proximo)
+
+        self.assertEqual(vistos, self.esperado)
+
+    def test_volta_para_a_pagina_anterior(self):
+        primeira = self.pagina()
+        segunda = self.pagina(cursor=primeira.cursor_proximo)
+        terceira = self.pagina(cursor=segunda.cursor_proximo)
+
+        volta = self.pagina(cursor=terceira.cursor_anterior)
+        self.assertEqual([obj.pk for obj in volta], [obj.pk for obj in segunda])
+        self.assertTrue(volta.has_previous())
+        self.assertTrue(volta.has_next())
+
+    def test_cursor_invalido_volta_para_o_inicio(self):
+        pagina = self.pagina(cursor="nao-e-um-cursor")
+        self.assertEqual([obj.pk for obj in pagina], self.esperado[:5])
+
+    def test_custo_da_pagina_nao_depende_da_posicao(self):
+        pagina = self.pagina()
+        for _ in range(3):
+            pagina = self.pagina(cursor=pagina.cursor_proximo)
+        with self.assertNumQueries(1):
+            self.pagina(cursor=pagina.cursor_proximo)
+
+
+class BuscaTextoTests(TestCase):
+    """
+    filtrar_texto no SQLite: tabelas FTS5 (trigram) mantidas por triggers
+    """
+
+    def setUp(self):
+        self.lecom = Lecom.objects.create(
+            lecom="123456", destino="Campinas", uf="SP", data=date(2026, 10, 18)
+        )
+
+    def buscar(self, caminho, termo, queryset=None):
+        return list(filtrar_texto(queryset or Lecom.objects.all(), caminho, termo))
+
+    def rowids_fts(self, termo):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT rowid FROM "transport_lecom_busca" WHERE "destino" MATCH %s', [f'"{termo}"']
+            )
+            return [linha[0] for linha in cursor.fetchall()]
+
+    def test_triggers_mantem_o_indice_em_dia(self):
+        self.assertEqual(self.rowids_fts("mpin"), [self.lecom.pk])
+
+        Lecom.objects.filter(pk=self.lecom.pk).update(destino="Sorocaba")
+        self.assertEqual(self.rowids_fts("mpin"), [])
+        self.assertEqual(self.rowids_fts("roca"), [self.lecom.pk])
+        self.assertEqual(self.buscar("destino", "ROCA"), [self.lecom])
+
+        Lecom.objects.filter(pk=self.lecom.pk).delete()
+        self.assertEqual(self.rowids_fts("roca"), [])
+
+    def test_termo_longo_usa_o_indice(self):
+        queryset = filtrar_texto(Lecom.objects.all(), "destino", "camp")
+        self.assertIn("MATCH", str(queryset.query))
+        self.assertEqual(list(queryset), [self.lecom])
+
+    def test_termo_curto_usa_icontains(self):
+        queryset = filtrar_texto(Lecom.objects.all(), "destino", "ca")
+        self.assertNotIn("MATCH", str(queryset.query))
+        self.assertIn("LIKE", str(queryset.query))
+        self.assertEqual(list(queryset), [self.lecom])
+
+    def test_aspas_e_operadores_sao_texto(self):
+        Lecom.objects.filter(pk=self.lecom.pk).update(destino='Rua "B" OR Centro')
+
+        # Mesmo resultado do __icontains, sem erro de sintaxe no MATCH
+        for termo in ('"B" OR', '"', '" OR "x', "NEAR(a b)", "Cen*"):
+            self.assertEqual(
+                self.buscar("destino", termo), list(Lecom.objects.filter(destino__icontains=termo))
+            )
+        self.assertEqual(self.buscar("destino", '"B" OR'), [self.lecom])
+
+    def test_relacao_reversa_sem_duplicar(self):
+        Carga.objects.bulk_create([
+            Carga(lecom=self.lecom, carga=f"99{seq}", seq=seq) for seq in range(1, 4)
+        ])
+        self.assertEqual(self.buscar("cargas__carga", "991"), [self.lecom])
+        self.assertEqual(self.buscar("cargas__carga", "99"), [self.lecom])
+
+
+class GravacaoComVersaoTests(TestCase):
+    """
+    Concorrência otimista: UPDATE condicionado à versão, tudo ou nada
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.lecoms = Lecom.objects.bulk_create([
+            Lecom(lecom=str(numero), destino="Destino", uf="SP", data=date(2026, 10, 18))
+            for numero in range(3)
+        ])
+
+    def test_grava_e_incrementa_a_versao(self):
+        for lecom in self.lecoms:
+            lecom.destino = f"Novo {lecom.lecom}"
+
+        with self.assertNumQueries(3):  # savepoint, UPDATE, release
+            self.assertEqual(gravar_com_versao(self.lecoms, ["destino"]), 3)
+
+        self.assertEqual([lecom.versao for lecom in self.lecoms], [2, 2, 2])
+        self.assertEqual(
+            list(Lecom.objects.order_by("pk").values_list("destino", "versao")),
+            [("Novo 0", 2), ("Novo 1", 2), ("Novo 2", 2)],
+        )
+
+    def test_versao_antiga_nao_grava_nenhuma_linha(self):
+        concorrente = Lecom.objects.get(pk=self.lecoms[1].pk)
+        concorrente.destino = "Outro usuário"
+        gravar_com_versao([concorrente], ["destino"])
+
+        for lecom in self.lecoms:
+            lecom.destino = "Meu"
+        with self.assertRaises(ConflitoDeVersao) as contexto:
+            gravar_com_versao(self.lecoms, ["destino"])
+
+        [conflito] = contexto.exception.conflitos
+        self.assertEqual(conflito.enviada.pk, self.lecoms[1].pk)
+        self.assertFalse(conflito.removida)
+        self.assertEqual(conflito.diferencas, [("destino", "Meu", "Outro usuário")])
+        # As linhas em dia também ficam como estavam
+        self.assertEqual(
+            list(Lecom.objects.order_by("pk").values_list("destino", "versao")),
+            [("Destino", 1), ("Outro usuário", 2), ("Destino", 1)],
+        )
+        self.assertEqual([lecom.versao for lecom in self.lecoms], [1, 1, 1])
+
+    def test_linha_removida_e_conflito(self):
+        removida = self.lecoms[0]
+        Lecom.objects.filter(pk=removida.pk).delete()
+
+        with self.assertRaises(ConflitoDeVersao) as contexto:
+            gravar_com_versao([removida], ["destino"])
+        self.assertTrue(contexto.exception.conflitos[0].removida)
+
+    def test_metricas_de_conflito(self):
+        gravar_com_versao([self.lecoms[0]], ["destino"])
+        velha = Lecom.objects.get(pk=self.lecoms[1].pk)
+        gravar_com_versao([self.lecoms[1]], ["destino"])
+        with self.assertRaises(ConflitoDeVersao):
+            gravar_com_versao([velha], ["destino"])
+
+        self.assertEqual(taxa_de_conflitos(Lecom), round(1 / 3, 4))
+
+
+class ExportacaoXlsxTests(TestCase):
+    """
+    Formatos de data e de data / hora nas células do XLSX
+    """
+
+    def test_data_e_data_hora_com_formatos_proprios(self):
+        momento = datetime(2026, 10, 18, 13, 45, tzinfo=dt_timezone.utc)
+        resposta = resposta_xlsx("notas", ["Data", "Início"], iter([(date(2026, 10, 18), momento)]))
+
+        with zipfile.ZipFile(BytesIO(b"".join(resposta.streaming_content))) as pacote:
+            estilos = pacote.read("xl/styles.xml").decode()
+            celulas = pacote.read("xl/worksheets/sheet1.xml").decode()
+
+        formatos = dict(re.findall(r'numFmtId="(\d+)" formatCode="([^"]+)"', estilos))
+        xfs = re.findall(r'<xf numFmtId="(\d+)"', estilos.split("<cellXfs")[1])
+        estilo = dict(re.findall(r'<c r="([AB]2)" s="(\d+)"', celulas))
+
+        self.assertEqual(formatos[xfs[int(estilo["A2"])]], "dd/mm/yyyy")
+        self.assertEqual(formatos[xfs[int(estilo["B2"])]], "dd/mm/yyyy hh:mm")
+
+
+class MetricasViewTests(TestCase):
+    """
+    /metricas/ só para staff ou com o token dos coletores
+    """
+
+    def test_anonimo_e_usuario_comum_sao_recusados(self):
+        self.assertEqual(self.client.get("/metricas/").status_code, 403)
+
+        self.client.force_login(User.objects.create_user("operador"))
+        self.assertEqual(self.client.get("/metricas/").status_code, 403)
+
+    def test_staff_ve_as_metricas(self):
+        self.client.force_login(User.objects.create_user("gestor", is_staff=True))
+        self.assertEqual(self.client.get("/metricas/").status_code, 200)
+
+    @override_settings(METRICAS_TOKEN="segredo")
+    def test_token_no_cabecalho(self):
+        resposta = self.client.get("/metricas/", headers={"Authorization": "Bearer segredo"})
+        self.assertEqual(resposta.status_code, 200)
+        resposta = self.client.get("/metricas/", headers={"Authorization": "Bearer outro"})
+        self.assertEqual(resposta.status_code, 403)
+
+    def test_sem_token_configurado_o_cabecalho_nao_libera(self):
+        resposta = self.client.get("/metricas/", headers={"Authorization": "Bearer "})
+        self.assertEqual(resposta.status_code, 403)
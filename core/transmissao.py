@@ -0,0 +1,63 @@
+import asyncio
+import threading
+
+
+class Transmissor:
+    """
+    Fan-out em processo para as conexões SSE abertas neste worker.
+
+    `publicar` pode ser chamado de qualquer thread (views síncronas,
+    on_commit); cada inscrito recebe os eventos na fila do seu event loop.
+    Inscrito lento perde eventos em vez de segurar quem publica: o
+    polling da tabela de eventos cobre a lacuna.
+    """
+
+    TAMANHO_FILA = 200
+
+    def __init__(self):
+        self._inscritos = set()
+        self._lock = threading.Lock()
+
+    def inscrever(self):
+        inscrito = (asyncio.get_running_loop(), asyncio.Queue(self.TAMANHO_FILA))
+        with self._lock:
+            self._inscritos.add(inscrito)
+        return inscrito
+
+    def cancelar(self, inscrito):
+        with self._lock:
+            self._inscritos.discard(inscrito)
+
+    @property
+    def quantidade(self):
+        return len(self._inscritos)
+
+    def publicar(self, eventos):
+        with self._lock:
+            inscritos = list(self._inscritos)
+        for loop, fila in inscritos:
+            try:
+                loop.call_soon_threadsafe(self._entregar, fila, eventos)
+            except RuntimeError:
+                # Loop já encerrado: a conexão está caindo
+                self.cancelar((loop, fila))
+
+    @staticmethod
+    def _entregar(fila, eventos):
+        try:
+            fila.put_nowait(eventos)
+        except asyncio.QueueFull:
+            pass
+
+
+def formatar_sse(dados, id=None, evento=None):
+    """
+    Um evento no formato text/event-stream
+    """
+    linhas = []
+    if id is not None:
+        linhas.append(f"id: {id}")
+    if evento:
+        linhas.append(f"event: {evento}")
+    linhas.extend(f"data: {linha}" for linha in dados.splitlines() or [""])
+    return "\n".join(linhas) + "\n\n"
@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.urls import path, include
 from receipt.views import NotasUpdateView
 from django.contrib.auth import views as auth_views
+from core.metricas import metricas_view
 
 urlpatterns = [
     path("admin/", admin.site.urls),
@@ -14,9 +15,11 @@ urlpatterns = [
     path("expedicao/", include(('expedicao.urls', 'expedicao'), namespace='expedicao')),
     path("receipt/", include("receipt.urls")), 
     path("transport/", include(('transport.urls', 'transport'), namespace='transport')),
+    path("jobs/", include(('jobs.urls', 'jobs'), namespace='jobs')),
     
     # Views diretas
     path("update/<int:pk>", NotasUpdateView.as_view(), name="notas_update"),
+    path("metricas/", metricas_view, name="metricas"),
     
     
     # Autenticação
@@ -0,0 +1,228 @@
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from receipt.models import NotaFiscal, ResumoDiarioNotas
+from receipt.services import totais_por_un
+from transport.models import Lecom
+
+
+UNIDADES = ("UN10", "UN20", "UN40")
+
+PREFIXO_CACHE = "dashboard:kpis:"
+
+
+def _como_data(valor):
+    # TruncWeek / TruncMonth devolvem datetime em alguns bancos; instância
+    # criada com a data em texto (Lecom.objects.create(data="2026-10-18"))
+    # só tem date depois de um refresh_from_db
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date) or not valor:
+        return valor or None
+    try:
+        return parse_date(str(valor))
+    except ValueError:  # formato certo, data inexistente (2026-02-30)
+        return None
+
+
+def _chave(data):
+    return f"{PREFIXO_CACHE}{_como_data(data).isoformat()}"
+
+
+def _kpis_notas(data):
+    """
+    Números das notas sobre o resumo diário (receipt.ResumoDiarioNotas):
+    o custo cresce com os dias, não com as notas. Os totais por UN são um
+    GROUP BY pela FK da unidade.
+    """
+    do_dia = Q(data=data)
+    # Prefixo nos apelidos: "notas" também é nome de coluna do resumo
+    totais = ResumoDiarioNotas.objects.aggregate(
+        kpi_notas=Sum("notas"),
+        kpi_nf_total_hj=Sum("notas", filter=do_dia),
+        kpi_total_pallets=Sum("pallets"),
+        kpi_total_pallets_hj=Sum("pallets", filter=do_dia),
+        kpi_total_peso=Sum("peso"),
+        kpi_total_peso_hj=Sum("peso", filter=do_dia),
+    )
+    kpis = {chave.removeprefix("kpi_"): valor or 0 for chave, valor in totais.items()}
+
+    geral, do_dia = totais_por_un(), totais_por_un(data)
+    for codigo in UNIDADES:
+        un = codigo.lower()
+        dia = do_dia.get(codigo, {})
+        kpis[un] = geral.get(codigo, {}).get("notas") or 0
+        kpis[f"nf_total_hj_{un}"] = dia.get("notas") or 0
+        kpis[f"total_pallets_hj_{un}"] = dia.get("pallets") or 0
+        kpis[f"total_peso_hj_{un}"] = dia.get("peso") or 0
+    return kpis
+
+
+def _kpis_lecoms(data):
+    """
+    Números de Lecom numa agregação condicional (uma consulta)
+    """
+    do_dia = Q(data=data)
+    agregados = Lecom.objects.aggregate(
+        lecoms=Count("pk"),
+        lecoms_hj=Count("pk", filter=do_dia),
+        total_peso_transp_hj=Sum("peso", filter=do_dia),
+        total_m3_transp_hj=Sum("m3", filter=do_dia),
+    )
+    return {chave: valor or 0 for chave, valor in agregados.items()}
+
+
+def calcular_kpis(data):
+    return {**_kpis_notas(data), **_kpis_lecoms(data)}
+
+
+def kpis_do_dia(data=None):
+    """
+    KPIs do dashboard para a data (padrão: hoje), do cache quando houver.
+    Invalidado pelos signals de NotaFiscal e Lecom; o timeout cobre as
+    escritas em bulk, que não disparam signals.
+    """
+    data = data or timezone.localdate()
+    return cache.get_or_set(
+        _chave(data), lambda: calcular_kpis(data), timeout=settings.DASHBOARD_CACHE_SEGUNDOS
+    )
+
+
+def invalidar_kpis(*datas):
+    """
+    Descarta os KPIs das datas informadas e de hoje (os totais gerais
+    aparecem em todas as datas)
+    """
+    datas = {_como_data(data) for data in datas} | {timezone.localdate()}
+    cache.delete_many([_chave(data) for data in datas if data])
+
+
+# =================== SÉRIE TEMPORAL ===================
+
+# Agrupamento no banco: a coluna `data` já é o dia; semana (segunda-feira)
+# e mês via Trunc
+GRANULARIDADES = {
+    "dia": lambda: F("data"),
+    "semana": lambda: TruncWeek("data"),
+    "mes": lambda: TruncMonth("data"),
+}
+
+# Limite de pontos por série (ex.: ~13 meses por dia)
+MAX_PERIODOS = 400
+
+
+class PeriodoInvalido(ValueError):
+    """
+    Intervalo ou granularidade fora do que a série aceita
+    """
+
+
+def inicio_do_periodo(data, granularidade):
+    if granularidade == "semana":
+        return data - timedelta(days=data.weekday())
+    if granularidade == "mes":
+        return data.replace(day=1)
+    return data
+
+
+def _proximo_periodo(data, granularidade):
+    if granularidade == "semana":
+        return data + timedelta(weeks=1)
+    if granularidade == "mes":
+        return (data.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return data + timedelta(days=1)
+
+
+def periodos_entre(inicio, fim, granularidade):
+    """
+    Início de cada período do intervalo, sem buracos (dias sem movimento
+    entram com zero)
+    """
+    if granularidade not in GRANULARIDADES:
+        raise PeriodoInvalido(f"Granularidade inválida: {granularidade}")
+    if inicio > fim:
+        raise PeriodoInvalido("A data inicial é maior que a final.")
+
+    periodos = []
+    periodo = inicio_do_periodo(inicio, granularidade)
+    while periodo <= fim:
+        periodos.append(periodo)
+        if len(periodos) > MAX_PERIODOS:
+            raise PeriodoInvalido(
+                f"Intervalo longo demais para a granularidade {granularidade} "
+                f"(máximo de {MAX_PERIODOS} pontos)."
+            )
+        periodo = _proximo_periodo(periodo, granularidade)
+    return periodos
+
+
+def _serie_notas(inicio, fim, granularidade, indice):
+    """
+    Notas, pallets e peso por período e turno: um GROUP BY sobre o resumo
+    diário. O total do período é a soma dos turnos.
+    """
+    linhas = (
+        ResumoDiarioNotas.objects.filter(data__range=(inicio, fim))
+        .annotate(periodo=GRANULARIDADES[granularidade]())
+        .values("periodo", "turno")
+        .annotate(total_notas=Sum("notas"), total_pallets=Sum("pallets"), total_peso=Sum("peso"))
+        .order_by()
+    )
+
+    def vazia():
+        return {"notas": [0] * len(indice), "pallets": [0] * len(indice), "peso": [0.0] * len(indice)}
+
+    total = vazia()
+    turnos = {str(turno): vazia() for turno, _ in NotaFiscal.TURNO_CHOICES}
+    for linha in linhas:
+        posicao = indice[_como_data(linha["periodo"])]
+        for serie in (total, turnos.setdefault(str(linha["turno"]), vazia())):
+            serie["notas"][posicao] += linha["total_notas"] or 0
+            serie["pallets"][posicao] += linha["total_pallets"] or 0
+            serie["peso"][posicao] = round(serie["peso"][posicao] + float(linha["total_peso"] or 0), 2)
+    return {"total": total, "turnos": turnos}
+
+
+def _serie_lecoms(inicio, fim, granularidade, indice):
+    """
+    LECOMs, peso e m³ por período: um GROUP BY sobre transport.Lecom
+    (pelo índice de data)
+    """
+    linhas = (
+        Lecom.objects.filter(data__range=(inicio, fim))
+        .annotate(periodo=GRANULARIDADES[granularidade]())
+        .values("periodo")
+        .annotate(total_lecoms=Count("pk"), total_peso=Sum("peso"), total_m3=Sum("m3"))
+        .order_by()
+    )
+    serie = {"lecoms": [0] * len(indice), "peso": [0.0] * len(indice), "m3": [0.0] * len(indice)}
+    for linha in linhas:
+        posicao = indice[_como_data(linha["periodo"])]
+        serie["lecoms"][posicao] = linha["total_lecoms"]
+        serie["peso"][posicao] = round(float(linha["total_peso"] or 0), 2)
+        serie["m3"][posicao] = round(float(linha["total_m3"] or 0), 2)
+    return serie
+
+
+def serie_de_kpis(inicio, fim, granularidade="dia"):
+    """
+    KPIs de notas e LECOMs de `inicio` a `fim` agrupados por dia, semana
+    ou mês: uma consulta por tabela, qualquer que seja o intervalo. As
+    séries são listas alinhadas com `periodos`, prontas para o gráfico.
+    """
+    periodos = periodos_entre(inicio, fim, granularidade)
+    indice = {periodo: posicao for posicao, periodo in enumerate(periodos)}
+    return {
+        "granularidade": granularidade,
+        "inicio": inicio,
+        "fim": fim,
+        "periodos": periodos,
+        "notas": _serie_notas(inicio, fim, granularidade, indice),
+        "lecoms": _serie_lecoms(inicio, fim, granularidade, indice),
+    }
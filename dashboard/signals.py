@@ -0,0 +1,20 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from receipt.models import NotaFiscal
+from transport.models import Lecom
+
+from .services import invalidar_kpis
+
+
+@receiver(post_save, sender=NotaFiscal)
+@receiver(post_delete, sender=NotaFiscal)
+@receiver(post_save, sender=Lecom)
+@receiver(post_delete, sender=Lecom)
+def invalidar_dashboard(sender, instance, **kwargs):
+    """
+    KPIs do dashboard em cache: data da linha alterada e hoje
+    """
+    if kwargs.get("raw"):
+        return
+    invalidar_kpis(instance.data)
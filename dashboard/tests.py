@@ -1,3 +1,27 @@
+from datetime import date
+
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+from dashboard.services import _chave, invalidar_kpis, kpis_do_dia
+from transport.models import Lecom
+
+
+class InvalidacaoKpisTests(TestCase):
+    """
+    Cache dos KPIs descartado pelos signals de Lecom / NotaFiscal
+    """
+
+    def setUp(self):
+        cache.clear()
+
+    def test_data_em_texto_na_instancia(self):
+        kpis_do_dia(date(2026, 10, 18))
+        self.assertIsNotNone(cache.get(_chave(date(2026, 10, 18))))
+
+        # O post_save recebe a instância com data ainda em texto
+        Lecom.objects.create(lecom="1", destino="Destino", uf="SP", data="2026-10-18")
+        self.assertIsNone(cache.get(_chave(date(2026, 10, 18))))
+
+    def test_datas_vazias_ou_invalidas_sao_ignoradas(self):
+        invalidar_kpis(None, "", "nao-e-data", "2026-02-30")
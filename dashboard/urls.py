@@ -1,6 +1,7 @@
 from django.urls import path
-from .views import CardView
+from .views import CardView, SerieKpisView
 
 urlpatterns = [
     path('', CardView.as_view(), name='dashboard_home'),
+    path('serie/', SerieKpisView.as_view(), name='dashboard_serie'),
 ]
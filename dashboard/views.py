@@ -1,8 +1,12 @@
-from django.views.generic import TemplateView
+from datetime import timedelta
+
+from django.http import JsonResponse
 from django.utils import timezone
-from receipt.models import NotaFiscal
-from transport.models import Lecom
-from django.db.models import Sum
+from django.utils.dateparse import parse_date
+from django.views import View
+from django.views.generic import TemplateView
+
+from dashboard.services import GRANULARIDADES, PeriodoInvalido, kpis_do_dia, serie_de_kpis
 
 class CardView(TemplateView):
     template_name = "dashboard/home.html"
@@ -12,54 +16,35 @@ class CardView(TemplateView):
         hoje = timezone.localdate()
         context['hoje'] = hoje.strftime("%d/%m/%Y")
 
-        # Queryset base receipt
-        
-        notas_qs = NotaFiscal.objects.all()
-        notas_hj_qs = notas_qs.filter(data=hoje)
-        
-        # Queryset base transport
-        
-        lecom_total = Lecom.objects.all()
-        lecom_hj = lecom_total.filter(data=hoje)
-        lecom_hj_qs = Lecom.objects.filter(data=hoje)
-        m3_total_hj = Lecom.objects.filter(data=hoje)
-        
-        # Total de peso bruto dos transportes de hoje
-        total_peso_transp_hj = lecom_hj_qs.aggregate(total=Sum('peso'))['total'] or 0
-        total_m3_transp_hj = m3_total_hj.aggregate(total=Sum('m3'))['total'] or 0
+        # NFs, pallets, peso e lecoms: uma agregação por tabela, em cache
+        # por data (ver dashboard.services)
+        context.update(kpis_do_dia(hoje))
 
-        # -------------------- NFs --------------------
-        context['notas'] = notas_qs.count()  # total NFs
-        context['nf_total_hj'] = notas_hj_qs.count()  # total NFs hoje
+        # Filtros iniciais do gráfico de tendência
+        context['serie_inicio'] = (hoje - timedelta(days=29)).isoformat()
+        context['serie_fim'] = hoje.isoformat()
+        context['granularidades'] = list(GRANULARIDADES)
 
-        # NFs de hoje por UN
-        context['nf_total_hj_un10'] = notas_hj_qs.filter(un_origem__iexact="un10").count()
-        context['nf_total_hj_un20'] = notas_hj_qs.filter(un_origem__iexact="un20").count()
-        context['nf_total_hj_un40'] = notas_hj_qs.filter(un_origem__iexact="un40").count()
-
-        # Total de NFs por UN (independente da data)
-        context['un10'] = notas_qs.filter(un_origem__iexact="un10").count()
-        context['un20'] = notas_qs.filter(un_origem__iexact="un20").count()
-        context['un40'] = notas_qs.filter(un_origem__iexact="un40").count()
-
-        # -------------------- Pallets --------------------
-        context['total_pallets'] = notas_qs.aggregate(total=Sum('qnt_pallet'))['total'] or 0
-        context['total_pallets_hj'] = notas_hj_qs.aggregate(total=Sum('qnt_pallet'))['total'] or 0
-        context['total_pallets_hj_un10'] = notas_hj_qs.filter(un_origem__iexact="un10").aggregate(total=Sum('qnt_pallet'))['total'] or 0
-        context['total_pallets_hj_un20'] = notas_hj_qs.filter(un_origem__iexact="un20").aggregate(total=Sum('qnt_pallet'))['total'] or 0
-        context['total_pallets_hj_un40'] = notas_hj_qs.filter(un_origem__iexact="un40").aggregate(total=Sum('qnt_pallet'))['total'] or 0
+        return context
 
-        # -------------------- Peso bruto --------------------
-        context['total_peso'] = notas_qs.aggregate(total=Sum('peso_nota'))['total'] or 0
-        context['total_peso_hj'] = notas_hj_qs.aggregate(total=Sum('peso_nota'))['total'] or 0
-        context['total_peso_hj_un10'] = notas_hj_qs.filter(un_origem__iexact="un10").aggregate(total=Sum('peso_nota'))['total'] or 0
-        context['total_peso_hj_un20'] = notas_hj_qs.filter(un_origem__iexact="un20").aggregate(total=Sum('peso_nota'))['total'] or 0
-        context['total_peso_hj_un40'] = notas_hj_qs.filter(un_origem__iexact="un40").aggregate(total=Sum('peso_nota'))['total'] or 0
 
-        # -------------------- lecoms --------------------
-        context['lecoms'] = lecom_total.count()  # total lecoms
-        context['lecoms_hj'] = lecom_hj.count()  # total lecoms hoje
-        context['total_peso_transp_hj'] = total_peso_transp_hj # total peso bruto dos transportes de hoje
-        context['total_m3_transp_hj'] = total_m3_transp_hj  # total lecoms hoje
-        
-        return context
+class SerieKpisView(View):
+    """
+    Série temporal dos KPIs em JSON para os gráficos do dashboard.
+    GET ?inicio=AAAA-MM-DD&fim=AAAA-MM-DD&granularidade=dia|semana|mes
+    (padrão: últimos 30 dias, por dia)
+    """
+
+    def get(self, request):
+        try:
+            fim = parse_date(request.GET.get("fim") or "") or timezone.localdate()
+            inicio = parse_date(request.GET.get("inicio") or "") or fim - timedelta(days=29)
+        except ValueError:
+            return JsonResponse({"erro": "Data inválida."}, status=400)
+        granularidade = request.GET.get("granularidade") or "dia"
+
+        try:
+            serie = serie_de_kpis(inicio, fim, granularidade)
+        except PeriodoInvalido as erro:
+            return JsonResponse({"erro": str(erro)}, status=400)
+        return JsonResponse(serie)
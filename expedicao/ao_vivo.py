@@ -0,0 +1,142 @@
+import asyncio
+import json
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+from core.transmissao import Transmissor, formatar_sse
+
+from .models import ControleSeparacao, EventoSeparacao, SeparacaoCarga
+
+
+# Conexões SSE abertas neste processo
+transmissor = Transmissor()
+
+# Comentário periódico para manter a conexão (proxies fecham conexões mudas)
+INTERVALO_HEARTBEAT = 15
+# Tempo que o navegador espera antes de reconectar (ms)
+RECONEXAO_MS = 3000
+
+
+def publicar_transicao(modelo, pks):
+    """
+    Grava um evento por linha com o estado atual (status da carga e do
+    controle) e entrega às conexões deste processo. Chamado após o commit
+    da transição; os eventos antigos são apagados por limpar_eventos.
+    """
+    if modelo is SeparacaoCarga:
+        linhas = SeparacaoCarga.objects.filter(pk__in=pks).values_list(
+            "controle_id", "pk", "status", "controle__status", "conferente",
+        )
+    else:
+        linhas = ControleSeparacao.objects.filter(pk__in=pks).values_list(
+            "pk", "status",
+        )
+        linhas = [(controle, None, "", status, "") for controle, status in linhas]
+
+    eventos = EventoSeparacao.objects.bulk_create([
+        EventoSeparacao(
+            controle=controle, carga=carga, status=status,
+            status_controle=status_controle, conferente=conferente or "",
+        )
+        for controle, carga, status, status_controle, conferente in linhas
+    ])
+
+    # Sem id (banco sem RETURNING no bulk_create) o polling entrega
+    transmissor.publicar([evento.como_dict() for evento in eventos if evento.pk])
+
+
+def limpar_eventos(horas=None):
+    """
+    Apaga os eventos mais antigos que `horas` (padrão:
+    SSE_RETENCAO_HORAS). Roda periodicamente pelo comando
+    limpar_eventos_separacao ou pela tarefa expedicao.limpar_eventos.
+    """
+    horas = settings.SSE_RETENCAO_HORAS if horas is None else horas
+    apagados, _ = EventoSeparacao.objects.filter(
+        criado_em__lt=timezone.now() - timedelta(hours=horas)
+    ).delete()
+    return apagados
+
+
+def ultimo_evento():
+    return EventoSeparacao.objects.order_by("-pk").values_list("pk", flat=True).first() or 0
+
+
+def eventos_desde(cursor, limite=500):
+    return [
+        evento.como_dict()
+        for evento in EventoSeparacao.objects.filter(pk__gt=cursor).order_by("pk")[:limite]
+    ]
+
+
+def formatar_evento(evento):
+    return formatar_sse(json.dumps(evento), id=evento["id"])
+
+
+async def fluxo_de_eventos(cursor):
+    """
+    text/event-stream a partir do evento `cursor`.
+
+    Eventos deste processo chegam pelo transmissor; os gravados por
+    outros workers (ou pelo processar_outbox / run_workers) chegam pelo
+    polling da tabela a cada SSE_INTERVALO_POLLING segundos. `cursor` é
+    o maior id entregue (por qualquer dos dois caminhos); `lido` é até
+    onde o polling já leu a tabela. `entregues` guarda só os ids que o
+    transmissor entregou acima de `lido`, para o polling não repetir.
+
+    O polling é por conexão, não por processo: cada painel aberto faz um
+    SELECT (pk > lido, pelo índice da chave) a cada intervalo, ou seja,
+    conexões / SSE_INTERVALO_POLLING consultas por segundo (100 painéis a
+    5 s = 20/s). Com um único worker servindo os painéis o transmissor
+    basta e SSE_INTERVALO_POLLING = 0 desliga o polling.
+    """
+    inscrito = transmissor.inscrever()
+    _, fila = inscrito
+    polling = settings.SSE_INTERVALO_POLLING
+    entregues = set()
+
+    try:
+        # O id inicial já vale como Last-Event-ID se a conexão cair antes
+        # do primeiro evento
+        yield f"retry: {RECONEXAO_MS}\nid: {cursor}\n\n"
+
+        # Reconexão: o que foi perdido desde o Last-Event-ID
+        for evento in await sync_to_async(eventos_desde)(cursor):
+            yield formatar_evento(evento)
+            cursor = evento["id"]
+        lido = cursor
+
+        while True:
+            try:
+                eventos = await asyncio.wait_for(fila.get(), timeout=polling or INTERVALO_HEARTBEAT)
+            except asyncio.TimeoutError:
+                if not polling:
+                    yield ": heartbeat\n\n"
+                    continue
+                lidos = await sync_to_async(eventos_desde)(lido)
+                eventos = [evento for evento in lidos if evento["id"] not in entregues]
+                if lidos:
+                    # Avança também sobre os já entregues pelo transmissor
+                    lido = max(evento["id"] for evento in lidos)
+                    entregues = {pk for pk in entregues if pk > lido}
+                if not eventos:
+                    yield ": heartbeat\n\n"
+                    continue
+            else:
+                limite = lido if polling else cursor
+                eventos = [
+                    evento for evento in eventos
+                    if evento["id"] > limite and evento["id"] not in entregues
+                ]
+                if polling:
+                    entregues.update(evento["id"] for evento in eventos)
+
+            if eventos:
+                cursor = max(cursor, *(evento["id"] for evento in eventos))
+            for evento in eventos:
+                yield formatar_evento(evento)
+    finally:
+        transmissor.cancelar(inscrito)
@@ -1,6 +1,25 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class ExpedicaoConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "expedicao"
+
+    def ready(self):
+        from core.concorrencia import registrar_metricas_de_conflito
+        from core.metricas import registrar_gauge
+
+        from . import signals  # noqa: F401
+        from .ao_vivo import transmissor
+        from .models import SeparacaoCarga
+        from .rollup import reinstalar_rollup_sqlite
+        from .services import atraso_outbox, pendencias_com_erro_outbox, pendencias_outbox
+
+        registrar_gauge("outbox_atraso_segundos", atraso_outbox)
+        registrar_gauge("outbox_pendencias", pendencias_outbox)
+        registrar_gauge("outbox_pendencias_com_erro", pendencias_com_erro_outbox)
+        registrar_metricas_de_conflito(SeparacaoCarga)
+        registrar_gauge("sse_conexoes", lambda: transmissor.quantidade)
+
+        post_migrate.connect(reinstalar_rollup_sqlite, sender=self)
@@ -0,0 +1,255 @@
+from django.db import connection, transaction
+from django.db.models import Case, DateTimeField, Exists, F, OuterRef, Value, When
+from django.db.models.functions import Coalesce
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import STATUS_ATIVOS, ControleSeparacao, SeparacaoCarga
+from .rollup import rollup_no_banco
+
+
+class TransicaoInvalida(Exception):
+    """
+    A linha não estava em um dos status de origem da transição
+    (normalmente porque outro usuário a alterou antes)
+    """
+
+
+# Enviado após o commit de cada transição, para métricas e integrações.
+# sender: modelo; kwargs: pks (pedidos), quantidade (alterados), transicao, destino
+transicao_realizada = Signal()
+
+
+class Transicao:
+    """
+    Transição de status: origens permitidas, destino e demais colunas
+    gravadas no mesmo UPDATE
+    """
+
+    def __init__(self, nome, origens, destino, campos=None):
+        self.nome = nome
+        self.origens = origens
+        self.destino = destino
+        self.campos = campos or {}
+
+
+TRANSICOES_CARGA = {
+    "iniciar": Transicao(
+        "iniciar",
+        origens=(SeparacaoCarga.STATUS_AGUARDANDO,),
+        destino=SeparacaoCarga.STATUS_EM_ANDAMENTO,
+        campos={"atribuida": True},
+    ),
+    "concluir": Transicao(
+        "concluir",
+        origens=(SeparacaoCarga.STATUS_AGUARDANDO, SeparacaoCarga.STATUS_EM_ANDAMENTO),
+        destino=SeparacaoCarga.STATUS_CONCLUIDO,
+        campos={"finalizada": True},
+    ),
+}
+
+TRANSICOES_CONTROLE = {
+    "liberar": Transicao(
+        "liberar",
+        origens=(ControleSeparacao.STATUS_PENDENTE,),
+        destino=ControleSeparacao.STATUS_AGUARDANDO,
+        campos={"liberada": True},
+    ),
+    "finalizar": Transicao(
+        "finalizar",
+        origens=(
+            ControleSeparacao.STATUS_PENDENTE,
+            ControleSeparacao.STATUS_AGUARDANDO,
+            ControleSeparacao.STATUS_EM_ANDAMENTO,
+        ),
+        destino=ControleSeparacao.STATUS_CONCLUIDO,
+        campos={"finalizado": True},
+    ),
+}
+
+
+def _inicio(agora):
+    # Mantém o início já gravado; só preenche quando vazio
+    return Coalesce(F("inicio_separacao"), Value(agora, output_field=DateTimeField()))
+
+
+def _avisar(modelo, pks, quantidade, transicao):
+    # robust: erro num receiver (ex.: painel ao vivo) é logado e não vira
+    # 500 numa transição que já foi gravada
+    transaction.on_commit(lambda: transicao_realizada.send(
+        sender=modelo, pks=pks, quantidade=quantidade,
+        transicao=transicao.nome, destino=transicao.destino,
+    ), robust=True)
+
+
+def recalcular_status_controle(controle_ids, agora=None):
+    """
+    Rollup do status do controle a partir das cargas, num UPDATE só:
+    todas concluídas → Concluido e finalizado; alguma iniciada → Em
+    Andamento; senão o status fica como está. finalizado nunca é
+    desmarcado aqui (o controle pode ter sido finalizado à mão).
+
+    No PostgreSQL e no SQLite quem faz isso são os triggers de
+    expedicao.rollup; aqui fica o fallback para os demais bancos.
+    """
+    agora = agora or timezone.now()
+    cargas = SeparacaoCarga.objects.filter(controle=OuterRef("pk")).order_by()
+    tem_cargas = Exists(cargas)
+    todas_concluidas = tem_cargas & ~Exists(cargas.exclude(status=SeparacaoCarga.STATUS_CONCLUIDO))
+    alguma_iniciada = Exists(cargas.exclude(status=SeparacaoCarga.STATUS_AGUARDANDO))
+
+    return ControleSeparacao.objects.filter(pk__in=controle_ids).update(
+        status=Case(
+            When(todas_concluidas, then=Value(ControleSeparacao.STATUS_CONCLUIDO)),
+            When(alguma_iniciada, then=Value(ControleSeparacao.STATUS_EM_ANDAMENTO)),
+            default=F("status"),
+        ),
+        finalizado=Case(When(todas_concluidas, then=Value(True)), default=F("finalizado")),
+        inicio_separacao=Case(When(alguma_iniciada, then=_inicio(agora)), default=F("inicio_separacao")),
+    )
+
+
+def transicionar_cargas(carga_ids, nome, **campos):
+    """
+    Aplica a transição `nome` às cargas com um UPDATE ... WHERE status IN
+    (origens); as que estão em outro status ficam como estão. Retorna
+    quantas mudaram. `campos` grava outros valores (ex.: conferente) no
+    mesmo UPDATE.
+
+    Antes do UPDATE, um SELECT ... FOR UPDATE trava os controles das
+    cargas em ordem de pk (no PostgreSQL; nos demais bancos é só a
+    leitura dos ids): lotes concorrentes travam na mesma ordem, sem
+    deadlock, e conferentes no mesmo LECOM fazem o rollup em sequência.
+    O rollup dos controles é feito pelo trigger do banco (ou por um
+    UPDATE a mais, nos bancos sem trigger).
+
+    São dois comandos na transação. Após o commit, os receivers de
+    transicao_realizada (ver expedicao.signals) somam mais três:
+    marcadores e leitura e INSERT dos eventos do painel, cada escrita na
+    sua transação.
+    """
+    transicao = TRANSICOES_CARGA[nome]
+    agora = timezone.now()
+    valores = {"status": transicao.destino, **transicao.campos, **campos}
+    if nome == "iniciar":
+        valores["inicio_separacao"] = _inicio(agora)
+    if campos:
+        # Campos da grade de edição: invalida a versão lida por ela
+        valores["versao"] = F("versao") + 1
+
+    carga_ids = list(carga_ids)
+    with transaction.atomic():
+        # Lista materializada: dentro de um __in o ORDER BY seria
+        # descartado e os locks sairiam em qualquer ordem
+        controle_ids = list(
+            ControleSeparacao.objects.select_for_update()
+            .filter(pk__in=SeparacaoCarga.objects.filter(pk__in=carga_ids).values("controle_id"))
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+        atualizadas = SeparacaoCarga.objects.filter(
+            pk__in=carga_ids, status__in=transicao.origens,
+        ).update(**valores)
+        if atualizadas:
+            if not rollup_no_banco(SeparacaoCarga.objects.db):
+                recalcular_status_controle(controle_ids, agora)
+            _avisar(SeparacaoCarga, carga_ids, atualizadas, transicao)
+    return atualizadas
+
+
+def transicionar_carga(carga, nome, **campos):
+    """
+    Transição de uma carga só (ver transicionar_cargas). Levanta
+    TransicaoInvalida se a carga já não estava num status de origem.
+    """
+    agora = timezone.now()
+    if not transicionar_cargas([carga.pk], nome, **campos):
+        raise TransicaoInvalida(
+            f"{carga}: não é possível {nome} a partir do status atual."
+        )
+
+    # Reflete no objeto o que foi gravado
+    transicao = TRANSICOES_CARGA[nome]
+    for campo, valor in {"status": transicao.destino, **transicao.campos, **campos}.items():
+        setattr(carga, campo, valor)
+    if nome == "iniciar" and carga.inicio_separacao is None:
+        carga.inicio_separacao = agora
+    if campos:
+        carga.versao += 1
+    return carga
+
+
+def transicionar_controle(controle, nome):
+    """
+    Transição direta do controle (liberar / finalizar): um UPDATE
+    condicional ao status de origem
+    """
+    transicao = TRANSICOES_CONTROLE[nome]
+    valores = {"status": transicao.destino, **transicao.campos}
+
+    with transaction.atomic():
+        atualizados = ControleSeparacao.objects.filter(
+            pk=controle.pk, status__in=transicao.origens,
+        ).update(**valores)
+        if not atualizados:
+            raise TransicaoInvalida(
+                f"{controle}: não é possível {nome} a partir do status atual."
+            )
+        _avisar(ControleSeparacao, [controle.pk], atualizados, transicao)
+
+    for campo, valor in valores.items():
+        setattr(controle, campo, valor)
+    return controle
+
+
+def fila_de_cargas(turno=None, box=None):
+    """
+    Cargas aguardando separação em controles já liberados, na ordem em
+    que devem ser puxadas: doca (data / hora) e seq
+    """
+    cargas = SeparacaoCarga.objects.filter(
+        # A condição repetida habilita o índice parcial sepcarga_ativas_idx
+        status__em_literais=STATUS_ATIVOS,
+        status=SeparacaoCarga.STATUS_AGUARDANDO,
+        controle__status__em_literais=STATUS_ATIVOS,
+    )
+    if turno:
+        cargas = cargas.filter(controle__turno=turno)
+    if box:
+        cargas = cargas.filter(box=box)
+    return cargas.order_by(
+        F("controle__data_carregamento").asc(nulls_last=True),
+        F("controle__hora_carregamento").asc(nulls_last=True),
+        "seq",
+        "pk",
+    )
+
+
+def reservar_proxima_carga(conferente, turno=None, box=None):
+    """
+    Entrega ao conferente a próxima carga da fila já iniciada (status,
+    conferente e inicio_separacao no mesmo UPDATE), ou None se a fila
+    estiver vazia.
+
+    No PostgreSQL usa SELECT ... FOR UPDATE SKIP LOCKED: coletores
+    concorrentes pulam a carga que outro está reservando, sem esperar.
+    Nos demais bancos a reserva é a própria transição condicional; se
+    outro conferente chegou antes, tenta a próxima.
+    """
+    fila = fila_de_cargas(turno=turno, box=box)
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            carga = fila.select_for_update(skip_locked=True, of=("self",)).first()
+            if carga is None:
+                return None
+            return transicionar_carga(carga, "iniciar", conferente=conferente)
+
+    while True:
+        carga = fila.first()
+        if carga is None:
+            return None
+        try:
+            return transicionar_carga(carga, "iniciar", conferente=conferente)
+        except TransicaoInvalida:
+            continue
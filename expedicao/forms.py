@@ -0,0 +1,61 @@
+from django import forms
+from django.forms import modelformset_factory
+from expedicao.models import SeparacaoCarga
+
+
+class SeparacaoCargaForm(forms.ModelForm):
+    """
+    Uma linha da grade de edição: só os campos que o conferente preenche
+    """
+
+    # Versão lida no GET; a gravação só passa se a linha ainda estiver nela
+    versao = forms.IntegerField(widget=forms.HiddenInput)
+
+    class Meta:
+        model = SeparacaoCarga
+        fields = [
+            "conferente", "separadores", "ot", "box",
+            "resumo_conf", "resumo_motorista", "etiquetas_cds", "carga_gerada",
+        ]
+        labels = {
+            "ot": "OT",
+            "resumo_conf": "Resumo Conferente",
+            "resumo_motorista": "Resumo Motorista",
+            "etiquetas_cds": "Etiquetas CDs",
+            "carga_gerada": "Carga Gerada",
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["versao"].initial = self.instance.versao
+
+    @property
+    def campos_alterados(self):
+        return [campo for campo in self.changed_data if campo != "versao"]
+
+
+class BaseSeparacaoCargaFormSet(forms.BaseModelFormSet):
+
+    def alteracoes(self):
+        """
+        Instâncias com o que mudou em relação às linhas atuais (e a versão
+        lida no formulário) e a união dos campos alterados, para um UPDATE só
+        """
+        alteradas, campos = [], set()
+        for form in self.forms:
+            if form.campos_alterados:
+                carga = form.save(commit=False)
+                carga.versao = form.cleaned_data["versao"]
+                alteradas.append(carga)
+                campos.update(form.campos_alterados)
+        return alteradas, sorted(campos)
+
+
+SeparacaoCargaFormSet = modelformset_factory(
+    SeparacaoCarga,
+    form=SeparacaoCargaForm,
+    formset=BaseSeparacaoCargaFormSet,
+    extra=0,
+    # A grade edita as cargas existentes: não cria linhas
+    edit_only=True,
+)
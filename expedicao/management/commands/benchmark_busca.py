@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core.search import filtrar_texto
+from expedicao.models import ControleSeparacao
+from transport.models import Lecom
+
+
+# (nome, queryset base, caminho) dos filtros de texto das views de cenário
+CASOS = [
+    ("Lecom", Lecom.objects.all(), "lecom"),
+    ("Destino", Lecom.objects.all(), "destino"),
+    ("Carga", Lecom.objects.all(), "cargas__carga"),
+    ("Separação: Lecom", ControleSeparacao.objects.all(), "lecom__lecom"),
+    ("Separação: transporte", ControleSeparacao.objects.all(), "cargas__numero_transporte"),
+]
+
+
+def medir(queryset, repeticoes):
+    """
+    Menor tempo (ms) de `repeticoes` execuções da primeira página
+    """
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        list(queryset.order_by("-pk").values_list("pk", flat=True)[:25])
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return min(tempos), len(list(queryset.values_list("pk", flat=True)))
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara o tempo dos filtros de texto das views com o índice do banco "
+        "(filtrar_texto) e com o __icontains original."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("termos", nargs="+", help="Termos buscados (ex.: 1234 campinas).")
+        parser.add_argument(
+            "--repeticoes", type=int, default=5,
+            help="Execuções por consulta; vale o menor tempo (padrão: 5).",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Banco: {connection.vendor}")
+        for termo in options["termos"]:
+            self.stdout.write(f"\n== {termo!r} ==")
+            for nome, base, caminho in CASOS:
+                indice, achados = medir(filtrar_texto(base, caminho, termo), options["repeticoes"])
+                original = base.filter(**{f"{caminho}__icontains": termo})
+                if caminho.startswith("cargas__"):
+                    original = original.distinct()
+                icontains, esperados = medir(original, options["repeticoes"])
+
+                linha = f"{nome:<24} índice {indice:8.2f} ms   icontains {icontains:8.2f} ms   {achados} linha(s)"
+                if achados != esperados:
+                    self.stdout.write(self.style.ERROR(f"{linha}  ≠ {esperados} no icontains"))
+                else:
+                    self.stdout.write(linha)
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from expedicao.ao_vivo import limpar_eventos
+
+
+class Command(BaseCommand):
+    help = (
+        "Apaga os eventos do painel ao vivo mais antigos que a retenção "
+        "(SSE_RETENCAO_HORAS). Agende periodicamente (cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--horas", type=int, default=None,
+            help="Retenção em horas (padrão: SSE_RETENCAO_HORAS).",
+        )
+
+    def handle(self, *args, **options):
+        if options["horas"] is not None and options["horas"] < 0:
+            raise CommandError("--horas não pode ser negativo.")
+
+        apagados = limpar_eventos(options["horas"])
+        if options["verbosity"] >= 1:
+            self.stdout.write(f"{apagados} eventos apagados.")
@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from expedicao.services import atraso_outbox, processar_outbox
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker do outbox: sincroniza com a expedição os Lecoms alterados, "
+        "em lotes, usando o próprio banco como fila."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--lote", type=int, default=500,
+            help="Pendências lidas por lote (padrão: 500).",
+        )
+        parser.add_argument(
+            "--intervalo", type=float, default=2.0,
+            help="Segundos de espera quando a fila está vazia (padrão: 2).",
+        )
+        parser.add_argument(
+            "--uma-vez", action="store_true",
+            help="Esvazia as pendências vencidas e termina.",
+        )
+
+    def handle(self, *args, **options):
+        if options["lote"] < 1:
+            raise CommandError("--lote deve ser maior que zero.")
+
+        verbosidade = options["verbosity"]
+        try:
+            while True:
+                relatorio = processar_outbox(tamanho_lote=options["lote"])
+
+                if relatorio.pendencias and verbosidade >= 1:
+                    self.stdout.write(
+                        f"{relatorio.pendencias} pendências → {relatorio.lecoms} lecoms "
+                        f"sincronizados, {relatorio.falhas} falhas "
+                        f"(atraso da fila: {atraso_outbox()}s)"
+                    )
+                if relatorio.falhas:
+                    self.stdout.write(self.style.WARNING(
+                        f"{relatorio.falhas} lecoms voltaram para a fila com backoff."
+                    ))
+
+                if relatorio.pendencias == options["lote"]:
+                    continue  # ainda há fila: segue sem esperar
+                if options["uma_vez"]:
+                    break
+                time.sleep(options["intervalo"])
+        except KeyboardInterrupt:
+            self.stdout.write("Worker encerrado.")
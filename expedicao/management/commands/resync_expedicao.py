@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from transport.models import Lecom
+from expedicao.services import ressincronizar_lecoms
+
+
+class Command(BaseCommand):
+    help = (
+        "Ressincroniza ControleSeparacao/SeparacaoCarga a partir de "
+        "Lecom/Carga, em lotes e com operações em bulk."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--lecom", type=int, action="append", dest="lecoms",
+            help="ID do Lecom a ressincronizar (pode repetir).",
+        )
+        parser.add_argument("--desde", help="Data inicial (AAAA-MM-DD).")
+        parser.add_argument("--ate", help="Data final (AAAA-MM-DD).")
+        parser.add_argument(
+            "--lote", type=int, default=500,
+            help="Quantidade de Lecoms por lote (padrão: 500).",
+        )
+        parser.add_argument(
+            "--workers", type=int, default=1,
+            help="Lotes processados em paralelo (padrão: 1).",
+        )
+        parser.add_argument(
+            "--pool", choices=["thread", "process"], default="thread",
+            help="Tipo de pool usado quando --workers > 1.",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Apenas relata o que seria alterado, sem gravar.",
+        )
+
+    def handle(self, *args, **options):
+        datas = {}
+        for opcao, chave in (("desde", "data_inicio"), ("ate", "data_fim")):
+            if options[opcao]:
+                datas[chave] = parse_date(options[opcao])
+                if datas[chave] is None:
+                    raise CommandError(f"Data inválida em --{opcao}: {options[opcao]}")
+
+        if options["lote"] < 1 or options["workers"] < 1:
+            raise CommandError("--lote e --workers devem ser maiores que zero.")
+
+        queryset = Lecom.objects.all()
+        if options["lecoms"]:
+            queryset = queryset.filter(pk__in=options["lecoms"])
+
+        verbosidade = options["verbosity"]
+
+        def ao_concluir_lote(parcial, total):
+            if verbosidade >= 2:
+                self.stdout.write(
+                    f"Lote com {parcial.lecoms} lecoms concluído "
+                    f"({total.lecoms} no total)."
+                )
+
+        relatorio = ressincronizar_lecoms(
+            queryset=queryset,
+            tamanho_lote=options["lote"],
+            dry_run=options["dry_run"],
+            workers=options["workers"],
+            pool=options["pool"],
+            ao_concluir_lote=ao_concluir_lote,
+            **datas,
+        )
+
+        titulo = "Dry-run (nada foi gravado)" if options["dry_run"] else "Ressincronização concluída"
+        self.stdout.write(self.style.SUCCESS(titulo))
+        for campo, valor in relatorio.como_dict().items():
+            self.stdout.write(f"  {campo}: {valor}")
@@ -0,0 +1,141 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.utils import timezone
+
+from core.pagination import consulta_da_pagina
+from expedicao.estados import fila_de_cargas
+from expedicao.views import (
+    CenarioCarregamentoView, CenarioExpedicaoView, CenarioSeparacaoView,
+)
+from receipt.views import ReceiptListView
+from transport.views import CenarioTransporteView
+
+
+def consultas_das_views():
+    """
+    (nome, queryset, índice esperado) da primeira página de cada view, com
+    os filtros mais usados. O queryset é montado pela própria view, como
+    numa requisição.
+    """
+    hoje = timezone.localdate().isoformat()
+    casos = [
+        ("Cenário Transporte", CenarioTransporteView, {}, None),
+        ("Cenário Transporte (status + data)", CenarioTransporteView,
+         {"status": "LIBERADO", "data": hoje}, "lecom_status_data_idx"),
+        ("Cenário Transporte (carga)", CenarioTransporteView, {"carga": "1234"}, None),
+        ("Cenário Expedição", CenarioExpedicaoView, {}, None),
+        ("Cenário Expedição (data)", CenarioExpedicaoView, {"data": hoje}, None),
+        ("Cenário Separação", CenarioSeparacaoView, {}, "controle_ativos_idx"),
+        ("Cenário Separação (status)", CenarioSeparacaoView, {"status": "Aguardando"}, None),
+        ("Cenário Carregamento", CenarioCarregamentoView, {}, None),
+        ("Controle de Notas", ReceiptListView, {}, None),
+        ("Controle de Notas (data + UN + turno)", ReceiptListView,
+         {"data": hoje, "un_origem": "UN10", "turno": "1"}, "nf_data_un_turno_idx"),
+    ]
+
+    fabrica = RequestFactory()
+    for nome, view_class, params, indice in casos:
+        view = view_class()
+        view.setup(fabrica.get("/", params))
+        queryset = consulta_da_pagina(
+            view.get_queryset(), view.keyset_ordering, view.paginate_by
+        )
+        yield nome, queryset, indice
+
+    yield "Fila de separação", fila_de_cargas(), "sepcarga_ativas_idx"
+
+
+def tabelas_varridas(plano, vendor):
+    """
+    Tabelas lidas por varredura sequencial no plano do EXPLAIN
+    """
+    if vendor == "postgresql":
+        return set(re.findall(r"Seq Scan on (\w+)", plano))
+
+    if vendor == "sqlite":
+        tabelas = set()
+        linhas = plano.splitlines()
+        # O laço externo lido na ordem do rowid (sem B-tree temporária para
+        # o ORDER BY) para no LIMIT da página: não é varredura completa.
+        ordena_na_memoria = "USE TEMP B-TREE FOR ORDER BY" in plano
+        for posicao, linha in enumerate(linhas):
+            achado = re.search(r"\bSCAN (\w+)(.*)", linha)
+            if not achado or "USING" in achado.group(2) or "VIRTUAL TABLE" in achado.group(2):
+                continue
+            if posicao == 0 and not ordena_na_memoria:
+                continue
+            tabelas.add(achado.group(1))
+        return tabelas
+
+    return set()
+
+
+def tamanho_estimado(tabela, vendor):
+    with connection.cursor() as cursor:
+        if vendor == "postgresql":
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [tabela])
+        elif vendor == "sqlite":
+            cursor.execute(f'SELECT MAX(rowid) FROM "{tabela}"')
+        else:
+            cursor.execute(f"SELECT COUNT(*) FROM {connection.ops.quote_name(tabela)}")
+        linha = cursor.fetchone()
+    return (linha[0] if linha else 0) or 0
+
+
+def atualizar_estatisticas():
+    """
+    ANALYZE: sem estatísticas o planejador do SQLite não sabe que os
+    índices parciais cobrem poucas linhas e prefere os índices de status
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+
+
+class Command(BaseCommand):
+    help = (
+        "Roda EXPLAIN nas consultas das views de cenário e falha se houver "
+        "varredura sequencial em tabela grande. Avisa quando o índice "
+        "esperado para a consulta não aparece no plano."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--min-linhas", type=int, default=10000,
+            help="Tamanho a partir do qual a tabela é considerada grande (padrão: 10000).",
+        )
+        parser.add_argument(
+            "--analisar", action="store_true",
+            help="Roda ANALYZE antes, para o plano refletir o volume atual das tabelas.",
+        )
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        problemas = []
+        if options["analisar"]:
+            atualizar_estatisticas()
+
+        for nome, queryset, indice in consultas_das_views():
+            plano = queryset.explain()
+            if options["verbosity"] >= 2:
+                self.stdout.write(f"\n== {nome} ==\n{plano}")
+
+            grandes = [
+                tabela for tabela in sorted(tabelas_varridas(plano, vendor))
+                if tamanho_estimado(tabela, vendor) >= options["min_linhas"]
+            ]
+            if grandes:
+                problemas.append(f"{nome}: varredura sequencial em {', '.join(grandes)}")
+                self.stdout.write(self.style.ERROR(f"✗ {nome}"))
+            elif indice and vendor in ("postgresql", "sqlite") and indice not in plano:
+                # Depende das estatísticas (e da proporção de linhas ativas):
+                # só avisa
+                self.stdout.write(self.style.WARNING(f"! {nome}: índice {indice} não usado"))
+            else:
+                rotulo = f"{nome} ({indice})" if indice else nome
+                self.stdout.write(self.style.SUCCESS(f"✓ {rotulo}"))
+
+        if problemas:
+            raise CommandError("\n".join(problemas))
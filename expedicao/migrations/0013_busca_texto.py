@@ -0,0 +1,28 @@
+from django.db import migrations
+
+from core.search import instalar_indices_texto, remover_indices_texto
+
+
+TABELAS = {"expedicao_separacaocarga"}
+
+
+def criar_indices(apps, schema_editor):
+    instalar_indices_texto(schema_editor, TABELAS)
+
+
+def remover_indices(apps, schema_editor):
+    remover_indices_texto(schema_editor, TABELAS)
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY (PostgreSQL) não roda dentro de transação
+    atomic = False
+
+    dependencies = [
+        ("expedicao", "0012_alter_separacaocarga_box"),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_indices, remover_indices),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.3 on 2026-10-18 10:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expedicao', '0013_busca_texto'),
+        ('transport', '0014_indices_filtros'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='controleseparacao',
+            index=models.Index(fields=['status'], name='controle_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='controleseparacao',
+            index=models.Index(condition=models.Q(('status__in', ['Aguardando', 'Em Andamento'])), fields=['lecom'], name='controle_ativos_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='separacaocarga',
+            index=models.Index(fields=['status', '-inicio_separacao', 'id'], name='sepcarga_status_inicio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='separacaocarga',
+            index=models.Index(condition=models.Q(('status__in', ['Aguardando', 'Em Andamento'])), fields=['status', 'controle'], name='sepcarga_ativas_idx'),
+        ),
+    ]
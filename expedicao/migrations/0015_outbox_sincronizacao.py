@@ -0,0 +1,30 @@
+# Generated by Django 5.2.3 on 2026-10-18 10:46
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expedicao', '0014_indices_filtros'),
+        ('transport', '0015_marcador_alteracao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendenciaSincronizacao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('criado_em', models.DateTimeField(default=django.utils.timezone.now)),
+                ('tentativas', models.PositiveIntegerField(default=0)),
+                ('proxima_tentativa', models.DateTimeField(default=django.utils.timezone.now)),
+                ('erro', models.TextField(blank=True, default='')),
+                ('lecom', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pendencias_sincronizacao', to='transport.lecom')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['proxima_tentativa', 'id'], name='pendencia_fila_idx')],
+            },
+        ),
+    ]
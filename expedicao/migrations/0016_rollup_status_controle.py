@@ -0,0 +1,23 @@
+from django.db import migrations
+
+from expedicao.rollup import instalar_rollup, recalcular_todos, remover_rollup
+
+
+def criar_triggers(apps, schema_editor):
+    instalar_rollup(schema_editor)
+    recalcular_todos(schema_editor)
+
+
+def remover_triggers(apps, schema_editor):
+    remover_rollup(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("expedicao", "0015_outbox_sincronizacao"),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_triggers, remover_triggers),
+    ]
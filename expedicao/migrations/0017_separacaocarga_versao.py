@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 10:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expedicao', '0016_rollup_status_controle'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='separacaocarga',
+            name='versao',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
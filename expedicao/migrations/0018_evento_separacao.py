@@ -0,0 +1,26 @@
+# Generated by Django 5.2.3 on 2026-10-18 11:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expedicao', '0017_separacaocarga_versao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoSeparacao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('criado_em', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('controle', models.PositiveBigIntegerField()),
+                ('carga', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('status', models.CharField(blank=True, default='', max_length=20)),
+                ('status_controle', models.CharField(max_length=20)),
+                ('conferente', models.CharField(blank=True, default='', max_length=50)),
+            ],
+        ),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations
+
+from expedicao.rollup import instalar_rollup, remover_rollup
+
+
+def recriar_triggers(apps, schema_editor):
+    # Os triggers da 0016 desmarcavam finalizado; no SQLite o CREATE
+    # TRIGGER IF NOT EXISTS não troca o corpo, então remove e cria de novo
+    remover_rollup(schema_editor)
+    instalar_rollup(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("expedicao", "0018_evento_separacao"),
+    ]
+
+    operations = [
+        migrations.RunPython(recriar_triggers, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,28 @@
 from django.db import models
+from django.db.models.lookups import In
 from transport.models import Lecom, Carga
 from django.utils import timezone
 
 
+class EmLiterais(In):
+    """
+    IN com os valores escritos no SQL, não como parâmetros. O SQLite só
+    usa um índice parcial quando o WHERE da consulta repete a condição do
+    índice com os mesmos literais.
+    """
+
+    lookup_name = "em_literais"
+
+    def process_rhs(self, compiler, connection):
+        valores = ", ".join("'%s'" % str(valor).replace("'", "''") for valor in self.rhs)
+        return f"({valores})", []
+
+
+# Status em separação: condição dos índices parciais de controles e
+# cargas. Filtre com status__em_literais=STATUS_ATIVOS para o índice valer.
+STATUS_ATIVOS = ["Aguardando", "Em Andamento"]
+
+
 
 class ControleSeparacao(models.Model):
     lecom = models.OneToOneField(
@@ -52,16 +72,23 @@ class ControleSeparacao(models.Model):
 
     class Meta:
         ordering = ["-criado_em"]
+        indexes = [
+            models.Index(fields=["status"], name="controle_status_idx"),
+            # Conjunto quente do cenário de separação (Aguardando / Em Andamento)
+            models.Index(
+                fields=["lecom"],
+                name="controle_ativos_idx",
+                condition=models.Q(status__in=STATUS_ATIVOS),
+            ),
+        ]
 
     def liberar_separacao(self):
-        self.liberada = True
-        self.status = self.STATUS_AGUARDANDO
-        self.save()
+        from .estados import transicionar_controle
+        transicionar_controle(self, "liberar")
 
     def finalizar_separacao(self):
-        self.finalizado = True
-        self.status = self.STATUS_CONCLUIDO
-        self.save()
+        from .estados import transicionar_controle
+        transicionar_controle(self, "finalizar")
 
     def __str__(self):
         return f"Separação Lecom {self.lecom.lecom}"
@@ -113,30 +140,88 @@ class SeparacaoCarga(models.Model):
     carga_gerada = models.BooleanField(default=False)
     inicio_separacao = models.DateTimeField(null=True,blank=True,) 
 
+    # Controle otimista de concorrência (core.concorrencia)
+    versao = models.PositiveIntegerField(default=1, editable=False)
+
     class Meta:
         ordering = ["seq"]
         unique_together = ("controle", "seq")
+        indexes = [
+            models.Index(
+                fields=["status", "-inicio_separacao", "id"],
+                name="sepcarga_status_inicio_idx",
+            ),
+            # Cargas ainda em separação, consultadas o dia todo
+            models.Index(
+                fields=["status", "controle"],
+                name="sepcarga_ativas_idx",
+                condition=models.Q(status__in=STATUS_ATIVOS),
+            ),
+        ]
 
     def iniciar(self):
-        self.status = self.STATUS_EM_ANDAMENTO
-        self.atribuida = True
-        self.save()
-        
-        # Atualiza status da model ControleSeparação
-        controle = self.controle
-        controle.status = ControleSeparacao.STATUS_EM_ANDAMENTO
-        controle.inicio_separacao = timezone.now()
-        controle.save()
-        
+        from .estados import transicionar_carga
+        transicionar_carga(self, "iniciar")
+
     def concluir(self):
-        self.status = self.STATUS_CONCLUIDO
-        self.finalizada = True
-        self.save()
+        from .estados import transicionar_carga
+        transicionar_carga(self, "concluir")
+
+    def __str__(self):
+        return f"SEQ {self.seq} | Carga {self.numero_transporte}"
 
-        controle = self.controle
-        if not controle.cargas.exclude(status=self.STATUS_CONCLUIDO).exists():
-            controle.finalizar_separacao()
 
+class PendenciaSincronizacao(models.Model):
+    """
+    Outbox: alteração de Lecom a sincronizar com a expedição. Gravada na
+    mesma transação da alteração e consumida pelo processar_outbox.
+    """
+
+    lecom = models.ForeignKey(
+        Lecom,
+        on_delete=models.CASCADE,
+        related_name="pendencias_sincronizacao"
+    )
+    criado_em = models.DateTimeField(default=timezone.now)
+    tentativas = models.PositiveIntegerField(default=0)
+    proxima_tentativa = models.DateTimeField(default=timezone.now)
+    erro = models.TextField(blank=True, default="")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["proxima_tentativa", "id"], name="pendencia_fila_idx"),
+        ]
 
     def __str__(self):
-        return f"SEQ {self.seq} | Carga {self.numero_transporte}"
+        return f"Sincronizar Lecom {self.lecom_id} (tentativas: {self.tentativas})"
+
+
+class EventoSeparacao(models.Model):
+    """
+    Mudança de status publicada para os painéis ao vivo (SSE). O id é o
+    cursor dos clientes (Last-Event-ID) e do polling entre workers.
+    """
+
+    criado_em = models.DateTimeField(default=timezone.now, db_index=True)
+    controle = models.PositiveBigIntegerField()
+    carga = models.PositiveBigIntegerField(blank=True, null=True)
+    status = models.CharField(max_length=20, blank=True, default="")
+    status_controle = models.CharField(max_length=20)
+    conferente = models.CharField(max_length=50, blank=True, default="")
+
+    def como_dict(self):
+        return {
+            "id": self.pk,
+            "controle": self.controle,
+            "carga": self.carga,
+            "status": self.status,
+            "status_controle": self.status_controle,
+            "conferente": self.conferente,
+        }
+
+    def __str__(self):
+        return f"Evento {self.pk}: controle {self.controle} / carga {self.carga} → {self.status or self.status_controle}"
+
+
+ControleSeparacao._meta.get_field("status").register_lookup(EmLiterais)
+SeparacaoCarga._meta.get_field("status").register_lookup(EmLiterais)
@@ -0,0 +1,151 @@
+from django.db import connections
+
+
+# Rollup do status do controle mantido pelo banco: triggers na tabela de
+# cargas recalculam o controle a cada INSERT/UPDATE/DELETE. Mesmas regras
+# de estados.recalcular_status_controle, que segue como fallback nos
+# bancos sem suporte aqui. No PostgreSQL pede a versão 11+ (EXECUTE
+# FUNCTION com tabelas de transição).
+BANCOS_COM_TRIGGER = ("postgresql", "sqlite")
+
+CARGAS = "expedicao_separacaocarga"
+CONTROLES = "expedicao_controleseparacao"
+
+TRIGGERS_SQLITE = ("expedicao_rollup_ai", "expedicao_rollup_au", "expedicao_rollup_ad")
+TRIGGERS_POSTGRESQL = ("expedicao_rollup_ai", "expedicao_rollup_au", "expedicao_rollup_ad")
+
+
+def rollup_no_banco(alias="default"):
+    return connections[alias].vendor in BANCOS_COM_TRIGGER
+
+
+def _sql_rollup(filtro, agora):
+    """
+    UPDATE dos controles selecionados por `filtro` (SQL sobre lecom_id)
+    """
+    cargas = f'SELECT 1 FROM "{CARGAS}" s WHERE s.controle_id = "{CONTROLES}".lecom_id'
+    todas_concluidas = (
+        f"(EXISTS ({cargas}) AND NOT EXISTS ({cargas} AND s.status <> 'Concluido'))"
+    )
+    alguma_iniciada = f"EXISTS ({cargas} AND s.status <> 'Aguardando')"
+    primeiro_inicio = (
+        f'SELECT MIN(s.inicio_separacao) FROM "{CARGAS}" s '
+        f'WHERE s.controle_id = "{CONTROLES}".lecom_id'
+    )
+    return (
+        f'UPDATE "{CONTROLES}" SET '
+        f"status = CASE WHEN {todas_concluidas} THEN 'Concluido' "
+        f"WHEN {alguma_iniciada} THEN 'Em Andamento' ELSE status END, "
+        # Só marca: um controle finalizado à mão continua finalizado
+        f"finalizado = CASE WHEN {todas_concluidas} THEN TRUE ELSE finalizado END, "
+        f"inicio_separacao = CASE WHEN {alguma_iniciada} "
+        f"THEN COALESCE(inicio_separacao, ({primeiro_inicio}), {agora}) "
+        f"ELSE inicio_separacao END "
+        f"WHERE lecom_id IN ({filtro})"
+    )
+
+
+def _sql_sqlite():
+    # Mesmo formato de texto que o Django grava em DateTimeField (UTC)
+    agora = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+    ai, au, ad = TRIGGERS_SQLITE
+    return [
+        f'CREATE TRIGGER IF NOT EXISTS "{ai}" AFTER INSERT ON "{CARGAS}" '
+        f"BEGIN {_sql_rollup('NEW.controle_id', agora)}; END",
+        f'CREATE TRIGGER IF NOT EXISTS "{au}" AFTER UPDATE OF status, controle_id ON "{CARGAS}" '
+        f"WHEN OLD.status IS NOT NEW.status OR OLD.controle_id IS NOT NEW.controle_id "
+        f"BEGIN {_sql_rollup('NEW.controle_id, OLD.controle_id', agora)}; END",
+        f'CREATE TRIGGER IF NOT EXISTS "{ad}" AFTER DELETE ON "{CARGAS}" '
+        f"BEGIN {_sql_rollup('OLD.controle_id', agora)}; END",
+    ]
+
+
+def _sql_postgresql():
+    # Triggers por comando com tabelas de transição: um UPDATE de rollup
+    # por comando, não por linha (bulk_create/bulk_update incluídos).
+    # DROP + CREATE: CREATE OR REPLACE TRIGGER só existe no PostgreSQL 14+
+    agora = "now()"
+    alterados = (
+        "SELECT n.controle_id FROM novas n JOIN antigas o ON o.id = n.id "
+        "WHERE n.status IS DISTINCT FROM o.status OR n.controle_id <> o.controle_id "
+        "UNION SELECT o.controle_id FROM novas n JOIN antigas o ON o.id = n.id "
+        "WHERE n.controle_id <> o.controle_id"
+    )
+    ai, au, ad = TRIGGERS_POSTGRESQL
+    return [
+        f"""
+        CREATE OR REPLACE FUNCTION expedicao_rollup_controle() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                {_sql_rollup('SELECT controle_id FROM novas', agora)};
+            ELSIF TG_OP = 'UPDATE' THEN
+                {_sql_rollup(alterados, agora)};
+            ELSE
+                {_sql_rollup('SELECT controle_id FROM antigas', agora)};
+            END IF;
+            RETURN NULL;
+        END
+        $$
+        """,
+        *[f'DROP TRIGGER IF EXISTS "{nome}" ON "{CARGAS}"' for nome in TRIGGERS_POSTGRESQL],
+        f'CREATE TRIGGER "{ai}" AFTER INSERT ON "{CARGAS}" '
+        f"REFERENCING NEW TABLE AS novas "
+        f"FOR EACH STATEMENT EXECUTE FUNCTION expedicao_rollup_controle()",
+        f'CREATE TRIGGER "{au}" AFTER UPDATE ON "{CARGAS}" '
+        f"REFERENCING OLD TABLE AS antigas NEW TABLE AS novas "
+        f"FOR EACH STATEMENT EXECUTE FUNCTION expedicao_rollup_controle()",
+        f'CREATE TRIGGER "{ad}" AFTER DELETE ON "{CARGAS}" '
+        f"REFERENCING OLD TABLE AS antigas "
+        f"FOR EACH STATEMENT EXECUTE FUNCTION expedicao_rollup_controle()",
+    ]
+
+
+def instalar_rollup(schema_editor):
+    """
+    Cria (ou recria) os triggers de rollup. Idempotente.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        comandos = _sql_postgresql()
+    elif vendor == "sqlite":
+        comandos = _sql_sqlite()
+    else:
+        return
+    for sql in comandos:
+        schema_editor.execute(sql)
+
+
+def remover_rollup(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        for nome in TRIGGERS_POSTGRESQL:
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS "{nome}" ON "{CARGAS}"')
+        schema_editor.execute("DROP FUNCTION IF EXISTS expedicao_rollup_controle()")
+    elif vendor == "sqlite":
+        for nome in TRIGGERS_SQLITE:
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS "{nome}"')
+
+
+def recalcular_todos(schema_editor):
+    """
+    Acerta o status de todos os controles (dados anteriores aos triggers)
+    """
+    agora = "now()" if schema_editor.connection.vendor == "postgresql" else (
+        "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+    )
+    schema_editor.execute(_sql_rollup(f'SELECT lecom_id FROM "{CONTROLES}"', agora))
+
+
+def reinstalar_rollup_sqlite(using="default", **kwargs):
+    """
+    Handler de post_migrate: o SQLite perde os triggers quando uma
+    migração recria a tabela de cargas
+    """
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        return
+    if CARGAS not in connection.introspection.table_names():
+        return
+    with connection.schema_editor() as schema_editor:
+        instalar_rollup(schema_editor)
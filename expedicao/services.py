@@ -1,9 +1,145 @@
-from expedicao.models import ControleSeparacao, SeparacaoCarga
+from concurrent.futures import (
+    FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait,
+)
 
+from datetime import timedelta
+import multiprocessing
 
-def sincronizar_expedicao(lecom):
+import django
+from django.conf import settings
+from django.db import connections, transaction
+
+from django.db.models import Min, Prefetch, Q
+from django.utils import timezone
+
+from transport.models import Carga, Lecom
+from transport.services import registrar_alteracao
+from expedicao.models import ControleSeparacao, PendenciaSincronizacao, SeparacaoCarga
+
+
+# Campos da SeparacaoCarga que espelham a Carga do transporte
+CAMPOS_SINCRONIZADOS = ("numero_transporte", "seq", "entregas", "mod")
+
+
+def valores_da_carga(carga):
+    """
+    Valores que a SeparacaoCarga deve ter para refletir a Carga
+    """
+    return {
+        "numero_transporte": carga.carga,
+        "seq": carga.seq or 1,
+        "entregas": carga.total_entregas,
+        "mod": carga.mod,
+    }
+
+
+class PlanoSincronizacao:
+    """
+    Diferença entre as cargas do transporte e as separações existentes
+    de um controle: o que criar, o que atualizar e o que remover.
+    """
+
+    def __init__(self, controle):
+        self.controle = controle
+        self.criar = []
+        self.atualizar = []
+        self.remover = []
+        self.campos_alterados = set()
+        self.maior_seq = 0
+
+    @property
+    def vazio(self):
+        return not (self.criar or self.atualizar or self.remover)
+
+
+def planejar_sincronizacao(controle, cargas, existentes):
+    """
+    Compara em memória as cargas do Lecom com as SeparacaoCarga já
+    gravadas do controle. Não faz nenhuma consulta ao banco.
+    """
+    plano = PlanoSincronizacao(controle)
+    por_carga = {sep.carga_id: sep for sep in existentes}
+    plano.maior_seq = max((sep.seq for sep in existentes), default=0)
+
+    for carga in cargas:
+        valores = valores_da_carga(carga)
+        plano.maior_seq = max(plano.maior_seq, valores["seq"])
+        sep = por_carga.pop(carga.id, None)
+
+        if sep is None:
+            plano.criar.append(
+                SeparacaoCarga(controle=controle, carga=carga, **valores)
+            )
+            continue
+
+        alterados = [
+            campo for campo, valor in valores.items()
+            if getattr(sep, campo) != valor
+        ]
+        if alterados:
+            for campo in alterados:
+                setattr(sep, campo, valores[campo])
+            plano.atualizar.append(sep)
+            plano.campos_alterados.update(alterados)
+
+    # O que sobrou não existe mais no transporte
+    plano.remover = list(por_carga.values())
+    return plano
+
+
+def aplicar_planos(planos, batch_size=500):
+    """
+    Grava vários planos com um delete, um bulk_update e um bulk_create,
+    independente da quantidade de cargas.
+
+    A ordem (remove → atualiza → cria) evita colisões na unique
+    (controle, seq). Quando alguma seq muda, as linhas atualizadas passam
+    antes por uma seq temporária acima de qualquer valor em uso, o que
+    permite trocar a ordem de duas cargas sem violar a constraint.
+    """
+    remover = [sep.pk for plano in planos for sep in plano.remover]
+    atualizar = [sep for plano in planos for sep in plano.atualizar]
+    criar = [sep for plano in planos for sep in plano.criar]
+    campos = set().union(*(plano.campos_alterados for plano in planos))
+
+    with transaction.atomic():
+        if remover:
+            SeparacaoCarga.objects.filter(pk__in=remover).delete()
+
+        if atualizar:
+            if "seq" in campos:
+                deslocamento = max(plano.maior_seq for plano in planos) + 1
+                seqs_finais = [sep.seq for sep in atualizar]
+                for sep in atualizar:
+                    sep.seq += deslocamento
+                SeparacaoCarga.objects.bulk_update(
+                    atualizar, ["seq"], batch_size=batch_size
+                )
+                for sep, seq in zip(atualizar, seqs_finais):
+                    sep.seq = seq
+
+            SeparacaoCarga.objects.bulk_update(
+                atualizar,
+                [campo for campo in CAMPOS_SINCRONIZADOS if campo in campos],
+                batch_size=batch_size,
+            )
+
+        if criar:
+            SeparacaoCarga.objects.bulk_create(criar, batch_size=batch_size)
+
+        # Bulk não dispara signals; com linhas removidas ou criadas o
+        # rollup (trigger) pode ter mudado também o status dos controles
+        if remover or criar:
+            registrar_alteracao(SeparacaoCarga, ControleSeparacao)
+        elif atualizar:
+            registrar_alteracao(SeparacaoCarga)
+
+
+def sincronizar_expedicao(lecom, cargas=None):
     """
     Sincroniza o cenário de expedição com o transporte (Lecom)
+
+    `cargas` evita reler as cargas quando quem chama acabou de gravá-las.
     """
 
     # 🔒 BLOQUEADO → remove da expedição
@@ -17,23 +153,368 @@ def sincronizar_expedicao(lecom):
         defaults={"status": "Pendente"}
     )
 
-    cargas_validas = []
-
-    for carga in lecom.cargas.all():
-        obj, _ = SeparacaoCarga.objects.update_or_create(
-            controle=controle,
-            carga=carga,
-            defaults={
-                "numero_transporte": carga.carga,
-                "seq": carga.seq,
-                "entregas": carga.total_entregas,
-                "mod": carga.mod,
-            }
+    if cargas is None:
+        cargas = list(lecom.cargas.all())
+    existentes = list(SeparacaoCarga.objects.filter(controle=controle))
+
+    plano = planejar_sincronizacao(controle, cargas, existentes)
+    if not plano.vazio:
+        aplicar_planos([plano])
+
+
+# =================== RESSINCRONIZAÇÃO EM LOTE ===================
+
+class RelatorioSincronizacao:
+    """
+    Contadores de uma ressincronização (real ou dry-run)
+    """
+
+    CAMPOS = (
+        "lecoms",
+        "controles_criados",
+        "controles_removidos",
+        "cargas_criadas",
+        "cargas_atualizadas",
+        "cargas_removidas",
+    )
+
+    def __init__(self, **valores):
+        for campo in self.CAMPOS:
+            setattr(self, campo, valores.get(campo, 0))
+
+    def somar(self, outro):
+        for campo in self.CAMPOS:
+            setattr(self, campo, getattr(self, campo) + getattr(outro, campo))
+        return self
+
+    def como_dict(self):
+        return {campo: getattr(self, campo) for campo in self.CAMPOS}
+
+
+def sincronizar_lote(lecom_ids, dry_run=False, batch_size=500):
+    """
+    Sincroniza vários Lecoms de uma vez: busca lecoms, cargas, controles
+    e separações do lote em quatro consultas e grava tudo em bulk.
+    """
+    relatorio = RelatorioSincronizacao()
+
+    lecoms = list(
+        Lecom.objects.filter(pk__in=lecom_ids).prefetch_related("cargas")
+    )
+    controles = {
+        controle.pk: controle
+        for controle in ControleSeparacao.objects.filter(lecom_id__in=lecom_ids)
+    }
+    existentes = {}
+    for sep in SeparacaoCarga.objects.filter(controle_id__in=lecom_ids):
+        existentes.setdefault(sep.controle_id, []).append(sep)
+
+    relatorio.lecoms = len(lecoms)
+
+    remover_controles = []
+    criar_controles = []
+    planos = []
+
+    for lecom in lecoms:
+        controle = controles.get(lecom.pk)
+
+        # 🔒 BLOQUEADO → remove da expedição
+        if lecom.status == "BLOQUEADO":
+            if controle is not None:
+                remover_controles.append(controle.pk)
+                relatorio.cargas_removidas += len(existentes.get(controle.pk, []))
+            continue
+
+        # 🔓 LIBERADO → cria/atualiza
+        if controle is None:
+            controle = ControleSeparacao(lecom=lecom, status="Pendente")
+            criar_controles.append(controle)
+
+        plano = planejar_sincronizacao(
+            controle, lecom.cargas.all(), existentes.get(lecom.pk, [])
         )
-        cargas_validas.append(carga.id)
+        relatorio.cargas_criadas += len(plano.criar)
+        relatorio.cargas_atualizadas += len(plano.atualizar)
+        relatorio.cargas_removidas += len(plano.remover)
+        if not plano.vazio:
+            planos.append(plano)
 
-    # 🧹 Remove cargas que não existem mais
-    SeparacaoCarga.objects.filter(
-        controle=controle
-    ).exclude(carga_id__in=cargas_validas).delete()
+    relatorio.controles_criados = len(criar_controles)
+    relatorio.controles_removidos = len(remover_controles)
+
+    if dry_run:
+        return relatorio
+
+    with transaction.atomic():
+        if remover_controles:
+            ControleSeparacao.objects.filter(pk__in=remover_controles).delete()
+        if criar_controles:
+            ControleSeparacao.objects.bulk_create(
+                criar_controles, batch_size=batch_size
+            )
+        if planos:
+            aplicar_planos(planos, batch_size=batch_size)
+        if criar_controles:
+            # bulk_create não dispara post_save
+            registrar_alteracao(ControleSeparacao)
+
+    return relatorio
+
+
+def lotes_de_lecoms(queryset, tamanho_lote):
+    """
+    Percorre os ids do queryset em lotes ordenados por id (keyset),
+    sem OFFSET e sem carregar a tabela inteira na memória.
+    """
+    ultimo_id = 0
+    while True:
+        ids = list(
+            queryset.filter(pk__gt=ultimo_id)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:tamanho_lote]
+        )
+        if not ids:
+            return
+        yield ids
+        ultimo_id = ids[-1]
 
+
+def _sincronizar_lote_em_thread(lecom_ids, dry_run):
+    try:
+        return sincronizar_lote(lecom_ids, dry_run=dry_run)
+    finally:
+        # Cada thread abre a própria conexão; fecha ao terminar o lote
+        connections.close_all()
+
+
+# Conexões do pai herdadas pelo fork: só referenciadas, nunca usadas
+_conexoes_herdadas = []
+
+
+def _inicializar_processo():
+    django.setup()
+    # No fork o filho herda as conexões abertas do pai (o gerador de
+    # lotes consulta de novo depois do close_all). Fechar aqui mandaria o
+    # encerramento da sessão pelo socket compartilhado: o filho só
+    # esquece a conexão (a referência evita que o coletor a feche) e abre
+    # a sua na primeira consulta.
+    for conexao in connections.all(initialized_only=True):
+        if conexao.connection is not None:
+            _conexoes_herdadas.append(conexao.connection)
+            conexao.connection = None
+
+
+def ressincronizar_lecoms(
+    queryset=None,
+    tamanho_lote=500,
+    dry_run=False,
+    data_inicio=None,
+    data_fim=None,
+    workers=1,
+    pool="thread",
+    ao_concluir_lote=None,
+):
+    """
+    Ressincroniza o cenário inteiro (ou o queryset informado) em lotes.
+
+    Com workers > 1 os lotes rodam em paralelo num pool de threads ou
+    de processos. No SQLite prefira workers=1: o banco aceita apenas um
+    escritor por vez.
+    """
+    if queryset is None:
+        queryset = Lecom.objects.all()
+    if data_inicio:
+        queryset = queryset.filter(data__gte=data_inicio)
+    if data_fim:
+        queryset = queryset.filter(data__lte=data_fim)
+
+    relatorio = RelatorioSincronizacao()
+    lotes = lotes_de_lecoms(queryset, tamanho_lote)
+
+    def concluir(parcial):
+        relatorio.somar(parcial)
+        if ao_concluir_lote:
+            ao_concluir_lote(parcial, relatorio)
+
+    if workers <= 1:
+        for ids in lotes:
+            concluir(sincronizar_lote(ids, dry_run=dry_run))
+        return relatorio
+
+    if pool == "process":
+        # Fecha antes dos primeiros forks; as conexões reabertas depois
+        # (gerador de lotes) são descartadas em _inicializar_processo
+        connections.close_all()
+        # fork: o filho herda settings e apps prontos (o 3.14 passa a usar
+        # forkserver por padrão no Linux)
+        contexto = (
+            multiprocessing.get_context("fork")
+            if "fork" in multiprocessing.get_all_start_methods() else None
+        )
+        executor = ProcessPoolExecutor(
+            max_workers=workers, initializer=_inicializar_processo, mp_context=contexto,
+        )
+        tarefa = sincronizar_lote
+    else:
+        executor = ThreadPoolExecutor(max_workers=workers)
+        tarefa = _sincronizar_lote_em_thread
+
+    with executor:
+        pendentes = set()
+        for ids in lotes:
+            pendentes.add(executor.submit(tarefa, ids, dry_run))
+            # Limita os lotes em voo para não enfileirar o banco inteiro
+            if len(pendentes) >= workers * 2:
+                prontos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+                for futuro in prontos:
+                    concluir(futuro.result())
+        for futuro in pendentes:
+            concluir(futuro.result())
+
+    return relatorio
+
+
+# =================== OUTBOX (SINCRONIZAÇÃO EM SEGUNDO PLANO) ===================
+
+# Espera entre tentativas: 5s, 10s, 20s... até 1 hora
+BACKOFF_BASE = 5
+BACKOFF_MAXIMO = 3600
+
+
+def agendar_sincronizacao(lecom, cargas=None):
+    """
+    Registra o Lecom para o worker sincronizar (processar_outbox).
+
+    Chame dentro da transação que alterou o Lecom: a pendência só é
+    gravada junto com a alteração. Com SINCRONIZACAO_EM_SEGUNDO_PLANO
+    desligado, sincroniza na hora, como antes (`cargas` como em
+    sincronizar_expedicao).
+    """
+    if not settings.SINCRONIZACAO_EM_SEGUNDO_PLANO:
+        sincronizar_expedicao(lecom, cargas=cargas)
+        return
+    PendenciaSincronizacao.objects.create(lecom=lecom)
+
+
+def espera_backoff(tentativas):
+    return timedelta(seconds=min(BACKOFF_BASE * 2 ** (tentativas - 1), BACKOFF_MAXIMO))
+
+
+class RelatorioOutbox(RelatorioSincronizacao):
+    CAMPOS = ("pendencias", "lecoms", "falhas")
+
+
+def processar_outbox(tamanho_lote=500):
+    """
+    Consome um lote de pendências vencidas. Várias pendências do mesmo
+    LECOM viram uma sincronização só (o worker lê o estado atual).
+
+    As pendências ficam travadas (FOR UPDATE SKIP LOCKED no PostgreSQL)
+    até o fim do lote, então vários workers podem rodar juntos. Se o lote
+    falhar, cada LECOM é tentado sozinho e só os que falharem voltam para
+    a fila, com backoff exponencial.
+    """
+    relatorio = RelatorioOutbox()
+    agora = timezone.now()
+
+    with transaction.atomic():
+        pendencias = list(
+            PendenciaSincronizacao.objects
+            .select_for_update(skip_locked=True)
+            .filter(proxima_tentativa__lte=agora)
+            .order_by("proxima_tentativa", "id")[:tamanho_lote]
+        )
+        if not pendencias:
+            return relatorio
+
+        lecom_ids = sorted({pendencia.lecom_id for pendencia in pendencias})
+        falhas = {}
+        try:
+            with transaction.atomic():
+                sincronizar_lote(lecom_ids)
+        except Exception:
+            # Isola o LECOM com problema para não travar o lote todo
+            for lecom_id in lecom_ids:
+                try:
+                    with transaction.atomic():
+                        sincronizar_lote([lecom_id])
+                except Exception as exc:
+                    falhas[lecom_id] = f"{type(exc).__name__}: {exc}"
+
+        concluidas = [p.pk for p in pendencias if p.lecom_id not in falhas]
+        concluidos = [lecom_id for lecom_id in lecom_ids if lecom_id not in falhas]
+        # Pendências já tentadas do mesmo LECOM ficam resolvidas também
+        PendenciaSincronizacao.objects.filter(
+            Q(pk__in=concluidas) | Q(lecom_id__in=concluidos, tentativas__gt=0)
+        ).delete()
+
+        repetir = [p for p in pendencias if p.lecom_id in falhas]
+        for pendencia in repetir:
+            pendencia.tentativas += 1
+            pendencia.proxima_tentativa = agora + espera_backoff(pendencia.tentativas)
+            pendencia.erro = falhas[pendencia.lecom_id]
+        if repetir:
+            PendenciaSincronizacao.objects.bulk_update(
+                repetir, ["tentativas", "proxima_tentativa", "erro"]
+            )
+
+    relatorio.pendencias = len(pendencias)
+    relatorio.lecoms = len(lecom_ids)
+    relatorio.falhas = len(falhas)
+    return relatorio
+
+
+def atraso_outbox():
+    """
+    Segundos desde a pendência mais antiga ainda na fila (0 se vazia)
+    """
+    mais_antiga = PendenciaSincronizacao.objects.aggregate(
+        criado_em=Min("criado_em")
+    )["criado_em"]
+    if mais_antiga is None:
+        return 0
+    return round((timezone.now() - mais_antiga).total_seconds(), 1)
+
+
+def pendencias_outbox():
+    return PendenciaSincronizacao.objects.count()
+
+
+def pendencias_com_erro_outbox():
+    return PendenciaSincronizacao.objects.filter(tentativas__gt=0).count()
+
+
+# =================== LEITURA DOS CENÁRIOS ===================
+
+def prefetch_cargas_transporte():
+    """
+    Cargas do Lecom já ordenadas por seq, num único prefetch
+    """
+    return Prefetch("cargas", queryset=Carga.objects.order_by("seq"))
+
+
+def prefetch_cargas_separacao(ordem="-seq"):
+    """
+    Separações do controle já ordenadas e com a Carga do transporte
+    """
+    return Prefetch(
+        "cargas",
+        queryset=SeparacaoCarga.objects.select_related("carga").order_by(ordem),
+    )
+
+
+def agrupar_cenario(grupos, extras=None):
+    """
+    Monta a lista {"grupo", "cargas"} usada pelos templates de cenário.
+
+    Lê as cargas do cache do prefetch (sem order_by/count, que disparariam
+    uma consulta por grupo). `extras` recebe o grupo e devolve chaves
+    adicionais para o item.
+    """
+    itens = []
+    for grupo in grupos:
+        item = {"grupo": grupo, "cargas": list(grupo.cargas.all())}
+        if extras:
+            item.update(extras(grupo))
+        itens.append(item)
+    return itens
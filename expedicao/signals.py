@@ -0,0 +1,50 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.metricas import incrementar
+from transport.services import registrar_alteracao
+
+from .ao_vivo import publicar_transicao
+from .estados import transicao_realizada
+from .models import ControleSeparacao, SeparacaoCarga
+
+
+@receiver(post_save, sender=ControleSeparacao)
+@receiver(post_delete, sender=ControleSeparacao)
+def marcar_alteracao(sender, **kwargs):
+    """
+    O status da separação aparece na API de LECOMs
+    """
+    if kwargs.get("raw"):
+        return
+    registrar_alteracao(sender)
+
+
+@receiver(post_save, sender=SeparacaoCarga)
+def marcar_alteracao_carga(sender, **kwargs):
+    """
+    Marcador da tela de edição da separação. Só post_save: um post_delete
+    impediria o fast-delete das cargas nas sincronizações em bulk, que já
+    registram a alteração por conta própria.
+    """
+    if kwargs.get("raw"):
+        return
+    registrar_alteracao(sender)
+
+
+@receiver(transicao_realizada)
+def contar_transicao(sender, transicao, quantidade, **kwargs):
+    """
+    Contador por transição (ex.: transicoes.separacaocarga.concluir) e
+    marcadores: a transição e o rollup gravam via UPDATE
+    """
+    incrementar(f"transicoes.{sender._meta.model_name}.{transicao}", quantidade)
+    registrar_alteracao(sender, ControleSeparacao)
+
+
+@receiver(transicao_realizada)
+def publicar_no_painel(sender, pks, **kwargs):
+    """
+    Painéis de separação / carregamento ao vivo (SSE)
+    """
+    publicar_transicao(sender, pks)
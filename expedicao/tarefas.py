@@ -0,0 +1,51 @@
+from django.utils.dateparse import parse_date
+
+from jobs.services import tarefa
+from transport.models import Lecom
+
+from .ao_vivo import limpar_eventos
+from .services import processar_outbox, ressincronizar_lecoms
+
+
+@tarefa("expedicao.ressincronizar")
+def ressincronizar(job, desde=None, ate=None, tamanho_lote=500):
+    """
+    Ressincronização completa do cenário, com progresso por lote
+    """
+    queryset = Lecom.objects.all()
+    if desde:
+        queryset = queryset.filter(data__gte=parse_date(desde))
+    if ate:
+        queryset = queryset.filter(data__lte=parse_date(ate))
+
+    job.atualizar_progresso(0, total=queryset.count(), mensagem="Ressincronizando")
+
+    def ao_concluir_lote(parcial, total):
+        job.atualizar_progresso(total.lecoms, mensagem=f"{total.lecoms} lecoms sincronizados")
+
+    relatorio = ressincronizar_lecoms(
+        queryset=queryset, tamanho_lote=tamanho_lote, ao_concluir_lote=ao_concluir_lote,
+    )
+    return relatorio.como_dict()
+
+
+@tarefa("expedicao.processar_outbox")
+def esvaziar_outbox(job, tamanho_lote=500):
+    """
+    Processa todas as pendências vencidas do outbox de sincronização
+    """
+    total = None
+    while True:
+        relatorio = processar_outbox(tamanho_lote=tamanho_lote)
+        total = relatorio if total is None else total.somar(relatorio)
+        job.atualizar_progresso(total.pendencias, mensagem=f"{total.lecoms} lecoms sincronizados")
+        if relatorio.pendencias < tamanho_lote:
+            return total.como_dict()
+
+
+@tarefa("expedicao.limpar_eventos")
+def limpar_eventos_do_painel(job, horas=None):
+    """
+    Apaga os eventos do painel ao vivo fora da retenção
+    """
+    return {"apagados": limpar_eventos(horas)}
@@ -1,3 +1,649 @@
-from django.test import TestCase
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.contrib.messages import get_messages
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.models import F
+from django.db.models.query import QuerySet
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from expedicao.estados import (
+    TransicaoInvalida, fila_de_cargas, recalcular_status_controle, reservar_proxima_carga,
+    transicao_realizada, transicionar_carga, transicionar_cargas, transicionar_controle,
+)
+from expedicao.ao_vivo import (
+    formatar_evento, fluxo_de_eventos, limpar_eventos, publicar_transicao, transmissor,
+)
+from expedicao.models import ControleSeparacao, EventoSeparacao, PendenciaSincronizacao, SeparacaoCarga
+from expedicao.services import (
+    agrupar_cenario, prefetch_cargas_separacao, prefetch_cargas_transporte,
+    _inicializar_processo, processar_outbox, ressincronizar_lecoms, sincronizar_expedicao,
+    sincronizar_lote,
+)
+from transport.models import Carga, Lecom
+from transport.services import registrar_alteracao
+
+
+def criar_lecom(numero, cargas, status="Liberado"):
+    """
+    Lecom com `cargas` cargas (seq 1..n), sem passar pelos signals
+    """
+    lecom = Lecom.objects.create(
+        lecom=str(numero), destino="Destino", uf="SP", data=date(2026, 10, 18), status=status,
+    )
+    Carga.objects.bulk_create([
+        Carga(lecom=lecom, carga=f"{numero % 10000}{seq:03d}"[-10:], seq=seq)
+        for seq in range(1, cargas + 1)
+    ])
+    return lecom
+
+
+def criar_lecoms(quantidade, cargas_por_lecom=2, status="LIBERADO"):
+    """
+    `quantidade` Lecoms com as cargas, em dois bulk_create
+    """
+    lecoms = Lecom.objects.bulk_create([
+        Lecom(lecom=f"L{numero}", destino="Destino", uf="SP", data=date(2026, 10, 18), status=status)
+        for numero in range(quantidade)
+    ])
+    Carga.objects.bulk_create([
+        Carga(lecom=lecom, carga=f"{lecom.pk}-{seq}"[-10:], seq=seq)
+        for lecom in lecoms
+        for seq in range(1, cargas_por_lecom + 1)
+    ])
+    return lecoms
+
+
+class SincronizacaoTests(TestCase):
+    """
+    Sincronização Carga → SeparacaoCarga (planejar_sincronizacao /
+    aplicar_planos)
+    """
+
+    def consultas_da_sincronizacao(self, lecom):
+        with CaptureQueriesContext(connection) as consultas:
+            sincronizar_expedicao(lecom)
+        return len(consultas)
+
+    def test_consultas_nao_crescem_com_as_cargas(self):
+        # Primeira sincronização cria os marcadores de alteração
+        sincronizar_expedicao(criar_lecom(9, 1))
+        pequeno, grande = criar_lecom(1, 5), criar_lecom(2, 40)
+
+        # Criação
+        self.assertEqual(
+            self.consultas_da_sincronizacao(pequeno), self.consultas_da_sincronizacao(grande)
+        )
+        # Atualização de todas as cargas
+        for lecom in (pequeno, grande):
+            lecom.cargas.update(mod="X")
+        self.assertEqual(
+            self.consultas_da_sincronizacao(pequeno), self.consultas_da_sincronizacao(grande)
+        )
+        self.assertEqual(SeparacaoCarga.objects.filter(controle_id=grande.pk, mod="X").count(), 40)
+
+    def test_troca_de_seq_passa_pela_seq_temporaria(self):
+        lecom = criar_lecom(3, 3)
+        sincronizar_expedicao(lecom)
+        primeira, segunda, terceira = lecom.cargas.order_by("seq")
+
+        Carga.objects.filter(pk=primeira.pk).update(seq=2)
+        Carga.objects.filter(pk=segunda.pk).update(seq=1)
+
+        # get_or_create, cargas, separações, savepoint, UPDATE para a seq
+        # temporária, UPDATE final, marcador e release
+        with self.assertNumQueries(8):
+            sincronizar_expedicao(lecom)
+
+        self.assertEqual(
+            list(SeparacaoCarga.objects.filter(controle_id=lecom.pk).values_list("carga_id", "seq")),
+            [(segunda.pk, 1), (primeira.pk, 2), (terceira.pk, 3)],
+        )
+        self.assertEqual(ControleSeparacao.objects.count(), 1)
+
+
+class LoteDeLecomsTests(TestCase):
+    """
+    1.000 LECOMs: leitura em quantidade fixa de consultas e escrita em
+    bulk (sem consulta por LECOM ou por carga)
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.lecoms = criar_lecoms(1000)
+        cls.ids = [lecom.pk for lecom in cls.lecoms]
+        # Marcadores já existentes, como em produção
+        registrar_alteracao(ControleSeparacao, SeparacaoCarga)
+
+    # O SQLite limita cada INSERT a 999 parâmetros, então os bulk_create
+    # de 1.000 controles e 2.000 separações saem em lotes (~47 linhas por
+    # INSERT de separação). Os números abaixo são para 1.000 LECOMs com 2
+    # cargas; nenhum cresce com consultas por linha.
+
+    def test_sincronizar_lote(self):
+        # 4 leituras, 10 INSERTs de controles, 43 de separações, 2 UPDATEs
+        # de marcadores e 4 savepoints / releases
+        with self.assertNumQueries(63):
+            relatorio = sincronizar_lote(self.ids)
+
+        self.assertEqual(relatorio.controles_criados, 1000)
+        self.assertEqual(relatorio.cargas_criadas, 2000)
+        self.assertEqual(SeparacaoCarga.objects.count(), 2000)
+
+        # Sem alterações: só as 4 leituras e a transação vazia
+        with self.assertNumQueries(6):
+            relatorio = sincronizar_lote(self.ids)
+        self.assertEqual(relatorio.cargas_criadas + relatorio.cargas_atualizadas, 0)
+
+    def test_processar_outbox(self):
+        PendenciaSincronizacao.objects.bulk_create(
+            [PendenciaSincronizacao(lecom=lecom) for lecom in self.lecoms]
+            + [PendenciaSincronizacao(lecom=lecom) for lecom in self.lecoms[:100]]
+        )
+
+        # Leitura das pendências, os 63 do sincronizar_lote, um DELETE das
+        # pendências e 4 savepoints / releases
+        with self.assertNumQueries(69):
+            relatorio = processar_outbox(tamanho_lote=1100)
+
+        self.assertEqual(relatorio.pendencias, 1100)
+        self.assertEqual(relatorio.lecoms, 1000)
+        self.assertEqual(relatorio.falhas, 0)
+        self.assertFalse(PendenciaSincronizacao.objects.exists())
+
+    def test_agrupar_cenario_sem_n_mais_1(self):
+        with self.assertNumQueries(2):
+            grupos = agrupar_cenario(
+                Lecom.objects.order_by("-id").prefetch_related(prefetch_cargas_transporte())
+            )
+        self.assertEqual(len(grupos), 1000)
+        self.assertEqual([carga.seq for carga in grupos[0]["cargas"]], [1, 2])
+
+        sincronizar_lote(self.ids)
+        with self.assertNumQueries(2):
+            grupos = agrupar_cenario(
+                ControleSeparacao.objects.select_related("lecom")
+                .prefetch_related(prefetch_cargas_separacao("-seq"))
+            )
+        self.assertEqual(sum(len(grupo["cargas"]) for grupo in grupos), 2000)
+
+
+class TransicoesTests(TestCase):
+    """
+    Máquina de estados: UPDATE condicional ao status de origem e rollup
+    do controle
+    """
+
+    def setUp(self):
+        lecom = criar_lecom(4, 2)
+        sincronizar_expedicao(lecom)
+        self.controle = ControleSeparacao.objects.get(pk=lecom.pk)
+        self.primeira, self.segunda = SeparacaoCarga.objects.filter(controle=self.controle)
+
+    def test_iniciar_grava_a_carga_e_o_rollup(self):
+        transicionar_carga(self.primeira, "iniciar", conferente="Ana")
+
+        self.primeira.refresh_from_db()
+        self.controle.refresh_from_db()
+        self.assertEqual(self.primeira.status, SeparacaoCarga.STATUS_EM_ANDAMENTO)
+        self.assertEqual(self.primeira.conferente, "Ana")
+        self.assertIsNotNone(self.primeira.inicio_separacao)
+        self.assertEqual(self.controle.status, ControleSeparacao.STATUS_EM_ANDAMENTO)
+        self.assertIsNotNone(self.controle.inicio_separacao)
+
+    def test_transicao_fora_da_origem_nao_grava(self):
+        transicionar_carga(self.primeira, "concluir")
+        concorrente = SeparacaoCarga.objects.get(pk=self.primeira.pk)
+        concorrente.status = SeparacaoCarga.STATUS_AGUARDANDO  # leitura antiga
+
+        with self.assertRaises(TransicaoInvalida):
+            transicionar_carga(concorrente, "iniciar")
+        concorrente.refresh_from_db()
+        self.assertEqual(concorrente.status, SeparacaoCarga.STATUS_CONCLUIDO)
+
+    def test_lote_so_altera_as_cargas_na_origem(self):
+        transicionar_carga(self.primeira, "concluir")
+        self.assertEqual(transicionar_cargas([self.primeira.pk, self.segunda.pk], "iniciar"), 1)
+
+    def test_concluir_todas_conclui_o_controle(self):
+        transicionar_cargas([self.primeira.pk, self.segunda.pk], "concluir")
+
+        self.controle.refresh_from_db()
+        self.assertEqual(self.controle.status, ControleSeparacao.STATUS_CONCLUIDO)
+        self.assertTrue(self.controle.finalizado)
+
+    def test_rollup_nao_desmarca_finalizado(self):
+        transicionar_controle(self.controle, "finalizar")
+        transicionar_carga(self.primeira, "iniciar")
+
+        self.controle.refresh_from_db()
+        self.assertTrue(self.controle.finalizado)
+
+        # Fallback dos bancos sem trigger: mesma regra
+        recalcular_status_controle([self.controle.pk])
+        self.controle.refresh_from_db()
+        self.assertTrue(self.controle.finalizado)
+
+    def test_dois_comandos_e_aviso_apos_o_commit(self):
+        recebidos = []
+
+        def receber(sender, **kwargs):
+            recebidos.append((sender, kwargs["pks"], kwargs["transicao"], kwargs["destino"]))
+
+        transicao_realizada.connect(receber)
+        self.addCleanup(transicao_realizada.disconnect, receber)
+
+        # Savepoint, SELECT ... FOR UPDATE dos controles, UPDATE, release
+        with self.captureOnCommitCallbacks() as callbacks, self.assertNumQueries(4):
+            transicionar_carga(self.primeira, "iniciar")
+        self.assertEqual(recebidos, [])
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(
+            recebidos,
+            [(SeparacaoCarga, [self.primeira.pk], "iniciar", SeparacaoCarga.STATUS_EM_ANDAMENTO)],
+        )
+    def test_erro_no_receiver_nao_derruba_a_transicao(self):
+        def quebrar(sender, **kwargs):
+            raise RuntimeError("painel fora do ar")
+
+        transicao_realizada.connect(quebrar)
+        self.addCleanup(transicao_realizada.disconnect, quebrar)
+
+        with self.assertLogs("django", "ERROR"), self.captureOnCommitCallbacks(execute=True):
+            transicionar_carga(self.primeira, "iniciar")
+        self.primeira.refresh_from_db()
+        self.assertEqual(self.primeira.status, SeparacaoCarga.STATUS_EM_ANDAMENTO)
+
+
+class PainelAoVivoTests(TestCase):
+    """
+    Eventos do painel: gravados após a transição, apagados só pela
+    limpeza periódica
+    """
+
+    def setUp(self):
+        lecom = criar_lecom(5, 1)
+        sincronizar_expedicao(lecom)
+        self.carga = SeparacaoCarga.objects.get(controle_id=lecom.pk)
+        self.antigo = EventoSeparacao.objects.create(
+            controle=lecom.pk, criado_em=timezone.now() - timedelta(hours=48),
+        )
+
+    def test_publicar_nao_apaga_eventos(self):
+        with self.assertNumQueries(2):  # leitura das cargas e INSERT
+            publicar_transicao(SeparacaoCarga, [self.carga.pk])
+        self.assertEqual(EventoSeparacao.objects.count(), 2)
+        self.assertTrue(EventoSeparacao.objects.filter(pk=self.antigo.pk).exists())
+
+    def test_limpeza_apaga_so_os_antigos(self):
+        publicar_transicao(SeparacaoCarga, [self.carga.pk])
+
+        self.assertEqual(limpar_eventos(), 1)
+        self.assertFalse(EventoSeparacao.objects.filter(pk=self.antigo.pk).exists())
+        self.assertEqual(EventoSeparacao.objects.count(), 1)
+
+        saida = StringIO()
+        call_command("limpar_eventos_separacao", horas=0, stdout=saida)
+        self.assertEqual(saida.getvalue().strip(), "1 eventos apagados.")
+
+
+def _conexao_descartada():
+    return connections["default"].connection is None
+
+
+class ReservaDeCargaTests(TestCase):
+    """
+    Fila dos coletores: ordem de doca (data / hora, vazias por último) e
+    seq, filtros de turno e box, e reserva sem repetir carga
+    """
+
+    def setUp(self):
+        self.cargas = {}
+        for numero, cargas, data, hora, turno in (
+            (1, 2, date(2026, 10, 19), time(8, 0), ControleSeparacao.TURNO_MANHA),
+            (2, 2, date(2026, 10, 18), time(14, 0), ControleSeparacao.TURNO_TARDE),
+            (3, 1, None, None, ControleSeparacao.TURNO_MANHA),
+        ):
+            lecom = criar_lecom(numero, cargas)
+            sincronizar_expedicao(lecom)
+            ControleSeparacao.objects.filter(pk=lecom.pk).update(
+                status=ControleSeparacao.STATUS_AGUARDANDO,
+                data_carregamento=data, hora_carregamento=hora, turno=turno,
+            )
+            for carga in SeparacaoCarga.objects.filter(controle_id=lecom.pk):
+                self.cargas[(numero, carga.seq)] = carga.pk
+        SeparacaoCarga.objects.filter(pk=self.cargas[(1, 2)]).update(box="B7")
+
+    def reservadas(self, **filtros):
+        pks = []
+        while (carga := reservar_proxima_carga("Ana", **filtros)) is not None:
+            pks.append(carga.pk)
+        return pks
+
+    def test_ordem_da_fila_e_reservas_seguidas(self):
+        primeira = reservar_proxima_carga("Ana")
+        self.assertEqual(primeira.status, SeparacaoCarga.STATUS_EM_ANDAMENTO)
+        self.assertEqual(primeira.conferente, "Ana")
+        self.assertIsNotNone(primeira.inicio_separacao)
+
+        self.assertEqual([primeira.pk] + self.reservadas(), [
+            self.cargas[chave] for chave in ((2, 1), (2, 2), (1, 1), (1, 2), (3, 1))
+        ])
+        self.assertIsNone(reservar_proxima_carga("Ana"))
+
+    def test_filtros_de_turno_e_box(self):
+        self.assertEqual(self.reservadas(box="B7"), [self.cargas[(1, 2)]])
+        self.assertEqual(
+            self.reservadas(turno=ControleSeparacao.TURNO_MANHA),
+            [self.cargas[(1, 1)], self.cargas[(3, 1)]],
+        )
+
+    def test_controle_pendente_fica_fora_da_fila(self):
+        ControleSeparacao.objects.update(status=ControleSeparacao.STATUS_PENDENTE)
+        self.assertIsNone(reservar_proxima_carga("Ana"))
+
+    def test_caminho_skip_locked(self):
+        # No SQLite o FOR UPDATE é omitido; o que se testa é o fluxo
+        with mock.patch.object(connection.features, "has_select_for_update_skip_locked", True):
+            self.assertEqual(reservar_proxima_carga("Ana").pk, self.cargas[(2, 1)])
+
+    def test_pula_a_carga_que_outro_coletor_iniciou(self):
+        original = QuerySet.first
+        concorrente = []
+
+        def first(queryset):
+            # Outro coletor inicia a carga entre a leitura e a transição
+            carga = original(queryset)
+            if carga is not None and queryset.model is SeparacaoCarga and not concorrente:
+                transicionar_carga(carga, "iniciar", conferente="Bia")
+                concorrente.append(carga.pk)
+            return carga
+
+        with mock.patch.object(QuerySet, "first", first):
+            carga = reservar_proxima_carga("Ana")
+
+        self.assertEqual(carga.pk, self.cargas[(2, 2)])
+        self.assertEqual(SeparacaoCarga.objects.get(pk=self.cargas[(2, 1)]).conferente, "Bia")
+
+    def test_view(self):
+        url = reverse("expedicao:reservar_carga")
+        self.assertEqual(self.client.post(url).status_code, 302)
+
+        self.client.force_login(User.objects.create_user("coletor", first_name="Ana", last_name="Lima"))
+        primeira = self.client.post(url).json()
+        segunda = self.client.post(url, {"conferente": "Bia"}).json()
+
+        self.assertEqual((primeira["id"], primeira["conferente"]), (self.cargas[(2, 1)], "Ana Lima"))
+        self.assertEqual((segunda["id"], segunda["conferente"]), (self.cargas[(2, 2)], "Bia"))
+        self.assertEqual(primeira["editar_url"], reverse("expedicao:editar_carga", args=[primeira["controle"]]))
+
+        resposta = self.client.post(url, {"turno": ControleSeparacao.TURNO_TARDE})
+        self.assertEqual(resposta.status_code, 404)
+        self.assertEqual(resposta.json(), {"erro": "Nenhuma carga aguardando separação."})
+        self.assertEqual(self.client.post(url, {"box": "B7"}).json()["id"], self.cargas[(1, 2)])
+
+
+class AcoesEmLoteViewTests(TestCase):
+    """
+    POST das ações em lote do cenário de separação: validação, contagem
+    de alteradas / ignoradas e mensagens
+    """
+
+    def setUp(self):
+        lecom = criar_lecom(6, 3)
+        sincronizar_expedicao(lecom)
+        self.cargas = list(SeparacaoCarga.objects.filter(controle_id=lecom.pk).order_by("seq"))
+        self.ids = [str(carga.pk) for carga in self.cargas]
+        self.url = reverse("expedicao:acoes_separacao")
+        self.cenario = reverse("expedicao:cenario_separacao")
+        self.client.force_login(User.objects.create_user("planejador"))
+
+    def enviar(self, **dados):
+        resposta = self.client.post(self.url, dados)
+        mensagens = [(mensagem.level_tag, mensagem.message) for mensagem in get_messages(resposta.wsgi_request)]
+        return resposta, mensagens
+
+    def test_acao_invalida(self):
+        resposta, mensagens = self.enviar(acao="apagar", carga_id=self.ids)
+        self.assertRedirects(resposta, self.cenario, fetch_redirect_response=False)
+        self.assertEqual(mensagens, [("danger", "Selecione ao menos uma carga e uma ação.")])
+        self.assertFalse(SeparacaoCarga.objects.exclude(status=SeparacaoCarga.STATUS_AGUARDANDO).exists())
+
+    def test_sem_cargas_selecionadas(self):
+        _, mensagens = self.enviar(acao="iniciar", carga_id=["", "abc"])
+        self.assertEqual(mensagens, [("danger", "Selecione ao menos uma carga e uma ação.")])
+
+    def test_atribuir_sem_campos(self):
+        _, mensagens = self.enviar(acao="atribuir", carga_id=self.ids)
+        self.assertEqual(mensagens, [("danger", "Informe conferente, separadores ou box para atribuir.")])
+
+    def test_transicao_parcial_conta_as_ignoradas(self):
+        transicionar_carga(self.cargas[0], "concluir")
+        resposta, mensagens = self.enviar(
+            acao="iniciar", carga_id=self.ids, Conferente="Ana", next="/expedicao/separacao/?page=2",
+        )
+
+        self.assertRedirects(resposta, "/expedicao/separacao/?page=2", fetch_redirect_response=False)
+        self.assertEqual(mensagens, [
+            ("success", "2 carga(s) atualizada(s)."),
+            ("warning", "1 carga(s) ignorada(s): já estavam em outro status."),
+        ])
+        self.assertEqual(
+            list(SeparacaoCarga.objects.filter(conferente="Ana").values_list("pk", flat=True).order_by("pk")),
+            [carga.pk for carga in self.cargas[1:]],
+        )
+
+    def test_atribuir_grava_so_os_campos_preenchidos(self):
+        SeparacaoCarga.objects.filter(pk=self.cargas[0].pk).update(conferente="Bia")
+        resposta, mensagens = self.enviar(
+            acao="atribuir", carga_id=self.ids[:1], BOX="B2", Conferente=" ", next="https://externo.com/",
+        )
+
+        self.assertRedirects(resposta, self.cenario, fetch_redirect_response=False)
+        self.assertEqual(mensagens, [("success", "1 carga(s) atualizada(s).")])
+        carga = SeparacaoCarga.objects.get(pk=self.cargas[0].pk)
+        self.assertEqual((carga.box, carga.conferente, carga.versao), ("B2", "Bia", self.cargas[0].versao + 1))
+
+
+class EditarSeparacaoViewTests(TestCase):
+    """
+    Grade de edição: login, ETag / If-None-Match, gravação só do que
+    mudou e a grade devolvida no conflito de versão
+    """
+
+    def setUp(self):
+        lecom = criar_lecom(7, 2)
+        sincronizar_expedicao(lecom)
+        self.primeira, self.segunda = SeparacaoCarga.objects.filter(controle_id=lecom.pk).order_by("seq")
+        self.url = reverse("expedicao:editar_carga", args=[lecom.pk])
+        self.client.force_login(User.objects.create_user("conferente"))
+
+    def dados_da_grade(self, resposta, **alteracoes):
+        """
+        POST com os valores da grade renderizada; `alteracoes` por
+        (índice da linha, campo)
+        """
+        formset = resposta.context["formset"]
+        dados = {campo.html_name: campo.value() for campo in formset.management_form}
+        for indice, form in enumerate(formset.forms):
+            for campo in form:
+                valor = alteracoes.get(f"{campo.name}_{indice}", campo.value())
+                if valor is True:
+                    dados[campo.html_name] = "on"
+                elif valor not in (False, None):
+                    dados[campo.html_name] = valor
+        return dados
+
+    def test_exige_login(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+        self.assertEqual(self.client.post(self.url, {}).status_code, 302)
+
+    def test_etag_e_if_none_match(self):
+        self.client.get(self.url)  # cookie CSRF, que entra na ETag
+        resposta = self.client.get(self.url)
+        etag = resposta["ETag"]
+
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        registrar_alteracao(SeparacaoCarga)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_grava_so_a_linha_alterada(self):
+        dados = self.dados_da_grade(self.client.get(self.url), conferente_0="Ana", resumo_conf_0=True)
+        resposta = self.client.post(self.url, dados)
+
+        self.assertRedirects(resposta, reverse("expedicao:cenario_separacao"), fetch_redirect_response=False)
+        primeira = SeparacaoCarga.objects.get(pk=self.primeira.pk)
+        segunda = SeparacaoCarga.objects.get(pk=self.segunda.pk)
+        self.assertEqual((primeira.conferente, primeira.resumo_conf), ("Ana", True))
+        self.assertEqual(primeira.versao, self.primeira.versao + 1)
+        self.assertEqual(segunda.versao, self.segunda.versao)
+
+    def test_acao_da_linha(self):
+        dados = self.dados_da_grade(self.client.get(self.url))
+        dados["acao"] = f"iniciar:{self.segunda.pk}"
+        self.client.post(self.url, dados)
+
+        self.assertEqual(SeparacaoCarga.objects.get(pk=self.segunda.pk).status, SeparacaoCarga.STATUS_EM_ANDAMENTO)
+
+    def test_conflito_devolve_a_grade_e_salvar_de_novo_confirma(self):
+        dados = self.dados_da_grade(self.client.get(self.url), conferente_0="Ana")
+        # Outro usuário grava a mesma linha depois do GET
+        SeparacaoCarga.objects.filter(pk=self.primeira.pk).update(conferente="Bia", versao=F("versao") + 1)
+
+        resposta = self.client.post(self.url, dados)
+
+        self.assertEqual(resposta.status_code, 200)
+        conflito, = resposta.context["conflitos"]
+        self.assertEqual(conflito.diferencas, [("conferente", "Ana", "Bia")])
+        form = resposta.context["formset"].forms[0]
+        self.assertEqual(form["conferente"].value(), "Ana")
+        self.assertEqual(int(form["versao"].value()), self.primeira.versao + 1)
+        self.assertEqual(SeparacaoCarga.objects.get(pk=self.primeira.pk).conferente, "Bia")
+
+        self.client.post(self.url, self.dados_da_grade(resposta))
+        self.assertEqual(SeparacaoCarga.objects.get(pk=self.primeira.pk).conferente, "Ana")
+
+
+class PoolDeProcessosTests(TransactionTestCase):
+    """
+    ressincronizar_lecoms(pool="process"): os filhos do fork não usam a
+    conexão herdada do pai
+    """
+
+    @skipUnless("fork" in multiprocessing.get_all_start_methods(), "sem fork nesta plataforma")
+    def test_filho_descarta_a_conexao_herdada(self):
+        connection.ensure_connection()
+        with ProcessPoolExecutor(
+            max_workers=1, initializer=_inicializar_processo,
+            mp_context=multiprocessing.get_context("fork"),
+        ) as executor:
+            self.assertTrue(executor.submit(_conexao_descartada).result())
+        # A do pai continua aberta e utilizável
+        self.assertEqual(Lecom.objects.count(), 0)
+
+    def test_ressincroniza_em_processos(self):
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            self.skipTest("banco de teste em memória não é visto pelos processos filhos")
+        lecoms = criar_lecoms(6, cargas_por_lecom=2)
+        relatorio = ressincronizar_lecoms(tamanho_lote=2, workers=2, pool="process")
+
+        self.assertEqual(relatorio.lecoms, 6)
+        self.assertEqual(relatorio.cargas_criadas, 12)
+        self.assertEqual(
+            SeparacaoCarga.objects.filter(controle_id__in=[lecom.pk for lecom in lecoms]).count(), 12
+        )
+
+
+class FluxoDeEventosTests(TestCase):
+    """
+    SSE com transmissor e polling juntos: o polling avança sobre o que
+    já saiu pelo transmissor e entrega o que outros workers gravaram
+    """
+
+    def gravar(self, quantidade):
+        return [
+            evento.como_dict()
+            for evento in EventoSeparacao.objects.bulk_create(
+                [EventoSeparacao(controle=1) for _ in range(quantidade)]
+            )
+        ]
+
+    @override_settings(SSE_INTERVALO_POLLING=0.01)
+    async def test_eventos_locais_acima_do_limite_e_de_outro_worker(self):
+        fluxo = fluxo_de_eventos(0)
+        await anext(fluxo)  # retry + id inicial
+        self.assertEqual(await anext(fluxo), ": heartbeat\n\n")
+
+        # Mais eventos locais que o limite de uma leitura do polling
+        locais = await sync_to_async(self.gravar)(600)
+        transmissor.publicar(locais)
+        entregues = [await anext(fluxo) for _ in range(600)]
+
+        # Gravado por outro worker: só o polling vê
+        remoto, = await sync_to_async(self.gravar)(1)
+        for _ in range(5):
+            saida = await anext(fluxo)
+            if not saida.startswith(":"):
+                break
+        await fluxo.aclose()
+
+        self.assertEqual(entregues, [formatar_evento(evento) for evento in locais])
+        self.assertEqual(saida, formatar_evento(remoto))
+
+
+class PlanosTests(TestCase):
+    """
+    Índices parciais e compostos usados pelas consultas quentes, com a
+    proporção de produção: muito histórico concluído e poucos ativos
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        lecoms = criar_lecoms(600, cargas_por_lecom=3)
+        sincronizar_lote([lecom.pk for lecom in lecoms])
+        inicio = datetime(2026, 10, 1, tzinfo=dt_timezone.utc)
+        concluidas = list(SeparacaoCarga.objects.filter(controle_id__in=[lecom.pk for lecom in lecoms[:560]]))
+        for posicao, carga in enumerate(concluidas):
+            carga.status = SeparacaoCarga.STATUS_CONCLUIDO
+            carga.inicio_separacao = inicio + timedelta(minutes=posicao)
+        SeparacaoCarga.objects.bulk_update(concluidas, ["status", "inicio_separacao"])
+        SeparacaoCarga.objects.filter(controle_id__in=[lecom.pk for lecom in lecoms[560:580]]).update(
+            status=SeparacaoCarga.STATUS_EM_ANDAMENTO, inicio_separacao=inicio,
+        )
+        ControleSeparacao.objects.filter(status=ControleSeparacao.STATUS_PENDENTE).update(
+            status=ControleSeparacao.STATUS_AGUARDANDO
+        )
+
+    def test_condicao_literal_do_indice_parcial(self):
+        sql = str(fila_de_cargas().query)
+        self.assertIn("IN ('Aguardando', 'Em Andamento')", sql)
+        self.assertEqual(fila_de_cargas().count(), 20 * 3)
+
+    def test_indices_parciais_no_plano(self):
+        saida = StringIO()
+        call_command("verificar_planos", analisar=True, stdout=saida, no_color=True)
+
+        self.assertIn("✓ Cenário Separação (controle_ativos_idx)", saida.getvalue())
+        self.assertIn("✓ Fila de separação (sepcarga_ativas_idx)", saida.getvalue())
+
+    def test_indice_de_status_e_inicio_dispensa_a_ordenacao(self):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        plano = (
+            SeparacaoCarga.objects.filter(status=SeparacaoCarga.STATUS_CONCLUIDO)
+            .order_by("-inicio_separacao", "id")[:60].explain()
+        )
+        self.assertIn("sepcarga_status_inicio_idx", plano)
+        self.assertNotIn("TEMP B-TREE", plano)
@@ -1,7 +1,9 @@
 from django.urls import path
 from .views import (CenarioExpedicaoView, DetalheCardView, 
                     CenarioSeparacaoView, CenarioCarregamentoView, 
-                    EditarSeparacaoView)
+                    EditarSeparacaoView, ExportarSeparacaoView,
+                    AcoesEmLoteSeparacaoView, ReservarCargaView,
+                    PainelAoVivoView)
 
 app_name = "expedicao"
 
@@ -9,6 +11,10 @@ urlpatterns = [
     path('cenario_expedicao/', CenarioExpedicaoView.as_view(), name="cenario_expedicao"),
     path('detalhe/<int:pk>/', DetalheCardView.as_view(), name="detalhe_card"),
     path("separacao/", CenarioSeparacaoView.as_view(), name="cenario_separacao"),
+    path("separacao/acoes/", AcoesEmLoteSeparacaoView.as_view(), name="acoes_separacao"),
+    path("separacao/reservar/", ReservarCargaView.as_view(), name="reservar_carga"),
+    path("separacao/eventos/", PainelAoVivoView.as_view(), name="eventos_separacao"),
+    path("separacao/exportar/<str:formato>/", ExportarSeparacaoView.as_view(), name="exportar_separacao"),
     path('cenario/carregamento/<int:controle_id>/', CenarioCarregamentoView.as_view(), name='cenario_carregamento'),
     path("separacao/editar/<int:pk>/", EditarSeparacaoView.as_view(), name="editar_carga"),
     path("carregamento/", CenarioCarregamentoView.as_view(), name="cenario_carregamento")
@@ -1,19 +1,47 @@
-from django.utils import timezone
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
+from django.utils.decorators import method_decorator
+from django.utils.http import url_has_allowed_host_and_scheme
 from django.views import View
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 from django.views.generic import ListView
-from transport.models import Lecom, Veiculo
-from expedicao.models import ControleSeparacao, SeparacaoCarga
+from transport.models import Carga, Lecom, Veiculo
+from transport.services import estado_das_tabelas, registrar_alteracao
+from expedicao.ao_vivo import (
+    RECONEXAO_MS, eventos_desde, fluxo_de_eventos, formatar_evento, ultimo_evento,
+)
+from expedicao.forms import SeparacaoCargaFormSet
+from expedicao.models import STATUS_ATIVOS, ControleSeparacao, SeparacaoCarga
+from expedicao.estados import (
+    TRANSICOES_CARGA, TransicaoInvalida, reservar_proxima_carga, transicionar_carga,
+    transicionar_cargas,
+)
+from expedicao.services import (
+    agrupar_cenario, prefetch_cargas_separacao, prefetch_cargas_transporte,
+)
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
 from django.db import transaction
+from django.db.models import F, Prefetch, Sum
+from core.concorrencia import ConflitoDeVersao, gravar_com_versao
+from core.exportacao import ExportacaoMixin
+from core.pagination import KeysetPaginationMixin, paginar_keyset
+from core.search import filtrar_texto
 
 
-class CenarioExpedicaoView(LoginRequiredMixin, ListView):
+class CenarioExpedicaoView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = Lecom
     template_name = "expedicao/cenario_expedicao.html"
     context_object_name = "lecoms"
     ordering = ["-id"]
+    keyset_ordering = ("-id",)
     login_url = "/accounts/login/"
 
     def get_queryset(self):
@@ -25,7 +53,7 @@ class CenarioExpedicaoView(LoginRequiredMixin, ListView):
                 "veiculo",
                 "controle_separacao",
             )
-            .prefetch_related("cargas")
+            .prefetch_related(prefetch_cargas_transporte())
         )
 
         data = self.request.GET.get("data")
@@ -42,17 +70,16 @@ class CenarioExpedicaoView(LoginRequiredMixin, ListView):
             queryset = queryset.filter(data=data)
 
         if lecom:
-            queryset = queryset.filter(lecom__icontains=lecom)
+            queryset = filtrar_texto(queryset, "lecom", lecom)
 
         if destino:
-            queryset = queryset.filter(destino__icontains=destino)
+            queryset = filtrar_texto(queryset, "destino", destino)
 
         if veiculo:
             queryset = queryset.filter(veiculo__tipo_veiculo=veiculo)
 
         if carga:
-            queryset = queryset.filter(
-                cargas__carga__icontains=carga).distinct()
+            queryset = filtrar_texto(queryset, "cargas__carga", carga)
 
         return queryset
 
@@ -60,33 +87,26 @@ class CenarioExpedicaoView(LoginRequiredMixin, ListView):
         context = super().get_context_data(**kwargs)
 
         context["veiculos"] = Veiculo.TIPO_VEICULO_CHOICES
-        context["grupo_cargas"] = [
-            {
-                "grupo": lecom,
-                "cargas": lecom.cargas.all().order_by("seq"),
-            }
-            for lecom in context["lecoms"]
-        ]
-        context["total_lecoms"] = context["lecoms"].count()
+        context["grupo_cargas"] = agrupar_cenario(context["lecoms"])
+        context["total_lecoms"] = len(context["grupo_cargas"])
         context["filtro_data"] = self.request.GET.get("data", "")
 
         return context
 
 
-class CenarioSeparacaoView(LoginRequiredMixin, ListView):
+class CenarioSeparacaoView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     template_name = "expedicao/cenario_separacao.html"
     context_object_name = "grupo_cargas"
+    keyset_ordering = ("lecom_id",)
+    paginate_by = 40
     login_url = "/accounts/login/"
 
     def get_queryset(self):
         queryset = (
             ControleSeparacao.objects
             .select_related("lecom", "lecom__veiculo")
-            .prefetch_related("cargas")
-            .filter(status__in=[
-                ControleSeparacao.STATUS_AGUARDANDO,
-                ControleSeparacao.STATUS_EM_ANDAMENTO,
-            ])
+            .prefetch_related(prefetch_cargas_separacao("-seq"))
+            .filter(status__em_literais=STATUS_ATIVOS)  # índice parcial controle_ativos_idx
             .order_by("lecom_id")
         )
 
@@ -107,18 +127,18 @@ class CenarioSeparacaoView(LoginRequiredMixin, ListView):
             queryset = queryset.filter(lecom__data=filtros["data"])
 
         if filtros["lecom"]:
-            queryset = queryset.filter(lecom__lecom__icontains=filtros["lecom"])
+            queryset = filtrar_texto(queryset, "lecom__lecom", filtros["lecom"])
 
         if filtros["destino"]:
-            queryset = queryset.filter(lecom__destino__icontains=filtros["destino"])
+            queryset = filtrar_texto(queryset, "lecom__destino", filtros["destino"])
 
         if filtros["veiculo"]:
             queryset = queryset.filter(lecom__veiculo__tipo_veiculo=filtros["veiculo"])
 
         if filtros["carga"]:
-            queryset = queryset.filter(
-                cargas__numero_transporte__icontains=filtros["carga"]
-            ).distinct()
+            queryset = filtrar_texto(
+                queryset, "cargas__numero_transporte", filtros["carga"]
+            )
 
         if filtros["status"]:
             queryset = queryset.filter(status=filtros["status"])
@@ -128,27 +148,149 @@ class CenarioSeparacaoView(LoginRequiredMixin, ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        grupo_cargas = []
-        for controle in context["grupo_cargas"]:
-            cargas = controle.cargas.all().order_by("-seq")
-
-            grupo_cargas.append({
-                "grupo": controle,
-                "cargas": cargas,
+        grupo_cargas = agrupar_cenario(
+            context["grupo_cargas"],
+            extras=lambda controle: {
                 "total_peso": controle.lecom.peso,  # pega do Lecom
                 "total_m3": controle.lecom.m3,      # pega do Lecom
-            })
+            },
+        )
 
         context["grupo_cargas"] = grupo_cargas
         context["veiculos"] = Veiculo.TIPO_VEICULO_CHOICES
 
-        # totais gerais do cenário
-        context["peso_total_cenario"] = sum(item["total_peso"] for item in grupo_cargas)
-        context["m3_total_cenario"] = sum(item["total_m3"] for item in grupo_cargas)
+        # totais gerais do cenário (todas as páginas, numa agregação só)
+        totais = self.object_list.aggregate(
+            peso=Sum("lecom__peso"),
+            m3=Sum("lecom__m3"),
+        )
+        context["peso_total_cenario"] = totais["peso"] or 0
+        context["m3_total_cenario"] = totais["m3"] or 0
+
+        # Painel ao vivo começa daqui: nada se perde entre o render e o SSE
+        context["evento_inicial"] = ultimo_evento()
 
         return context
 
 
+class ExportarSeparacaoView(ExportacaoMixin, CenarioSeparacaoView):
+    """
+    Cenário de separação em CSV/XLSX: uma linha por carga em separação
+    """
+
+    nome_exportacao = "cenario_separacao"
+    ordenacao_exportacao = ("lecom_id", "cargas__seq")
+    colunas_exportacao = [
+        ("LECOM", "lecom__lecom"),
+        ("Destino", "lecom__destino"),
+        ("Data", "lecom__data"),
+        ("Veículo", "lecom__veiculo__tipo_veiculo"),
+        ("Status separação", "status"),
+        ("Turno", "turno"),
+        ("Peso", "lecom__peso"),
+        ("M³", "lecom__m3"),
+        ("SEQ", "cargas__seq"),
+        ("Carga", "cargas__numero_transporte"),
+        ("Status carga", "cargas__status"),
+        ("Entregas", "cargas__entregas"),
+        ("MOD", "cargas__mod"),
+        ("OT", "cargas__ot"),
+        ("Box", "cargas__box"),
+        ("Conferente", "cargas__conferente"),
+        ("Separadores", "cargas__separadores"),
+        ("Início separação", "cargas__inicio_separacao"),
+    ]
+
+
+class AcoesEmLoteSeparacaoView(LoginRequiredMixin, View):
+    """
+    Ações em várias cargas do cenário de separação de uma vez:
+    iniciar, concluir ou atribuir conferente / separadores / box.
+    Cada ação é um UPDATE só, numa transação.
+    """
+
+    ACOES = ("iniciar", "concluir", "atribuir")
+
+    def post(self, request):
+        acao = request.POST.get("acao")
+        carga_ids = [int(i) for i in request.POST.getlist("carga_id") if i.isdigit()]
+        voltar = request.POST.get("next") or reverse("expedicao:cenario_separacao")
+        if not url_has_allowed_host_and_scheme(voltar, allowed_hosts={request.get_host()}):
+            voltar = reverse("expedicao:cenario_separacao")
+
+        # Só os campos preenchidos são gravados
+        campos = {
+            campo: request.POST.get(nome, "").strip()
+            for campo, nome in (("conferente", "Conferente"), ("separadores", "Separadores"), ("box", "BOX"))
+            if request.POST.get(nome, "").strip()
+        }
+
+        if acao not in self.ACOES or not carga_ids:
+            messages.error(request, "Selecione ao menos uma carga e uma ação.")
+            return redirect(voltar)
+        if acao == "atribuir" and not campos:
+            messages.error(request, "Informe conferente, separadores ou box para atribuir.")
+            return redirect(voltar)
+
+        try:
+            with transaction.atomic():
+                if acao == "atribuir":
+                    alteradas = SeparacaoCarga.objects.filter(pk__in=carga_ids).update(
+                        versao=F("versao") + 1, **campos
+                    )
+                    registrar_alteracao(SeparacaoCarga)
+                else:
+                    alteradas = transicionar_cargas(carga_ids, acao, **campos)
+        except Exception as e:
+            messages.error(request, f"Erro ao atualizar as cargas: {e}")
+            return redirect(voltar)
+
+        ignoradas = len(carga_ids) - alteradas
+        if alteradas:
+            messages.success(request, f"{alteradas} carga(s) atualizada(s).")
+        if ignoradas:
+            messages.warning(
+                request,
+                f"{ignoradas} carga(s) ignorada(s): já estavam em outro status.",
+            )
+        return redirect(voltar)
+
+
+class ReservarCargaView(LoginRequiredMixin, View):
+    """
+    Fila de trabalho dos coletores: POST entrega a próxima carga
+    aguardando (opcionalmente do turno / box informados) já iniciada em
+    nome do conferente. Dois coletores nunca recebem a mesma carga.
+    """
+
+    def post(self, request):
+        conferente = (
+            request.POST.get("conferente", "").strip()
+            or request.user.get_full_name()
+            or request.user.get_username()
+        )
+        carga = reservar_proxima_carga(
+            conferente[:50],
+            turno=request.POST.get("turno") or None,
+            box=request.POST.get("box") or None,
+        )
+        if carga is None:
+            return JsonResponse({"erro": "Nenhuma carga aguardando separação."}, status=404)
+
+        return JsonResponse({
+            "id": carga.pk,
+            "controle": carga.controle_id,
+            "carga": carga.numero_transporte,
+            "seq": carga.seq,
+            "box": carga.box,
+            "ot": carga.ot,
+            "conferente": carga.conferente,
+            "status": carga.status,
+            "inicio_separacao": carga.inicio_separacao,
+            "editar_url": reverse("expedicao:editar_carga", args=[carga.controle_id]),
+        })
+
+
 class DetalheCardView(LoginRequiredMixin, View):
     model = Lecom
     template_name = "expedicao/analise_carga.html"
@@ -163,10 +305,7 @@ class DetalheCardView(LoginRequiredMixin, View):
         total_m3_transporte = lecom.m3 or 0
 
         transportes_cenario = ControleSeparacao.objects.filter(
-            status__in=[
-                ControleSeparacao.STATUS_AGUARDANDO,
-                ControleSeparacao.STATUS_EM_ANDAMENTO
-            ]
+            status__em_literais=STATUS_ATIVOS
         ).exclude(lecom=lecom).select_related("lecom")
 
         total_peso_cenario = sum(t.lecom.peso or 0 for t in transportes_cenario)
@@ -220,6 +359,7 @@ class DetalheCardView(LoginRequiredMixin, View):
             SeparacaoCarga.objects.filter(controle=controle).update(
                 status=SeparacaoCarga.STATUS_AGUARDANDO
             )
+            registrar_alteracao(SeparacaoCarga)
 
             messages.success(request, f"Separação {lecom} liberada.")
 
@@ -238,88 +378,201 @@ class DetalheCardView(LoginRequiredMixin, View):
 
 class CenarioCarregamentoView(LoginRequiredMixin, View):
     template_name = "expedicao/cenario_carregamento.html"
+    paginate_by = 60
+    keyset_ordering = ("-inicio_separacao", "id")  # mais recentes primeiro
 
-    def get(self, request):
-        # Pega todas as cargas concluídas ou em andamento
-        cargas = SeparacaoCarga.objects.filter(
+    def get_queryset(self):
+        # Pega as cargas concluídas ou em andamento
+        return SeparacaoCarga.objects.filter(
             status__in=[
                 SeparacaoCarga.STATUS_EM_ANDAMENTO,
                 SeparacaoCarga.STATUS_CONCLUIDO,
             ]
-        ).order_by('-inicio_separacao')  # mais recentes primeiro
+        ).select_related("controle__lecom")
 
-        return render(request, self.template_name, {"cargas": cargas})
+    def get(self, request):
+        page_obj = paginar_keyset(
+            request, self.get_queryset(), self.keyset_ordering, self.paginate_by
+        )
 
+        return render(request, self.template_name, {
+            "cargas": page_obj.object_list,
+            "page_obj": page_obj,
+            "evento_inicial": ultimo_evento(),
+        })
+
+
+class PainelAoVivoView(View):
+    """
+    Server-Sent Events com as mudanças de status das cargas e controles,
+    para os cenários de separação e carregamento atualizarem os cards sem
+    recarregar a página.
 
-class EditarSeparacaoView(View):
+    No ASGI a conexão fica aberta. No WSGI cada requisição devolve o que
+    houver desde o Last-Event-ID e o navegador reconecta em seguida.
+    """
+
+    async def get(self, request):
+        usuario = await request.auser()
+        if not usuario.is_authenticated:
+            return HttpResponse(status=401)
+
+        try:
+            cursor = int(request.headers.get("Last-Event-ID") or request.GET["desde"])
+        except (KeyError, ValueError):
+            cursor = await sync_to_async(ultimo_evento)()
+
+        if not isinstance(request, ASGIRequest):
+            eventos = await sync_to_async(eventos_desde)(cursor)
+            corpo = f"retry: {RECONEXAO_MS}\nid: {cursor}\n\n" + "".join(map(formatar_evento, eventos))
+            return HttpResponse(corpo, content_type="text/event-stream")
+
+        resposta = StreamingHttpResponse(fluxo_de_eventos(cursor), content_type="text/event-stream")
+        resposta["Cache-Control"] = "no-cache"
+        resposta["X-Accel-Buffering"] = "no"  # nginx: não segurar o stream
+        return resposta
+
+
+# Tabelas exibidas na edição da separação
+MODELOS_EDICAO = (Lecom, Carga, Veiculo, ControleSeparacao, SeparacaoCarga)
+
+
+def etag_editar_separacao(request, pk):
+    """
+    ETag da tela de edição: marcadores das tabelas + usuário + token CSRF
+    (a página tem o formulário). Sem ETag quando há mensagens pendentes,
+    para que elas não se percam num 304.
+    """
+    if len(messages.get_messages(request)):
+        return None
+    versoes, _ = estado_das_tabelas(*MODELOS_EDICAO)
+    chave = "%s|%s|%s|%s" % (
+        "-".join(map(str, versoes)), pk, request.user.pk,
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ""),
+    )
+    return hashlib.md5(chave.encode()).hexdigest()
+
+
+class EditarSeparacaoView(LoginRequiredMixin, View):
+    """
+    Grade com todas as cargas do controle num POST só: grava apenas os
+    campos alterados (um bulk_update) e devolve os erros por campo na
+    própria grade. Os botões Iniciar / Finalizar de cada linha enviam a
+    grade junto, como "iniciar:<id>" / "concluir:<id>".
+    """
     template_name = "expedicao/editar_separacao.html"
+    prefixo = "cargas"
 
-    def get(self, request, pk):
-        lecom = get_object_or_404(Lecom, pk=pk)
-        controle, _ = ControleSeparacao.objects.get_or_create(lecom=lecom)
-        cargas = controle.cargas.all()  # todas as cargas do controle
+    def buscar_controle(self, pk):
+        # Controle + lecom + veículo num JOIN; cargas (com a carga do
+        # transporte) numa segunda consulta, reaproveitada pelo formset
+        return (
+            ControleSeparacao.objects
+            .select_related("lecom__veiculo")
+            .prefetch_related(
+                Prefetch("cargas", queryset=SeparacaoCarga.objects.select_related("carga"))
+            )
+            .filter(pk=pk)
+            .first()
+        )
+
+    def renderizar(self, request, controle, formset, conflitos=None):
         return render(request, self.template_name, {
             "controle": controle,
-            "lecom": lecom,
-            "cargas": cargas,
+            "lecom": controle.lecom,
+            "formset": formset,
+            "conflitos": conflitos,
         })
 
+    def renderizar_conflito(self, request, controle, formset, conflito):
+        """
+        Nada foi gravado. A grade volta com os valores enviados e a versão
+        atual das linhas em conflito: salvar de novo confirma os valores
+        do usuário sobre os do outro.
+        """
+        dados = request.POST.copy()
+        prefixos = {form.instance.pk: form.prefix for form in formset.forms}
+        for item in conflito.conflitos:
+            if not item.removida:
+                dados[f"{prefixos[item.enviada.pk]}-versao"] = item.atual.versao
+        formset = SeparacaoCargaFormSet(
+            dados, queryset=controle.cargas.all(), prefix=self.prefixo
+        )
+        messages.warning(
+            request,
+            "Outro usuário alterou estas cargas enquanto você editava. "
+            "Confira as diferenças e salve novamente para manter os seus valores.",
+        )
+        return self.renderizar(request, controle, formset, conflito.conflitos)
+
+    # Só leitura: o controle é criado pela liberação em detalhe_card.
+    # Com If-None-Match, responde 304 consultando só os marcadores.
+    @method_decorator(cache_control(private=True, no_cache=True))
+    @method_decorator(condition(etag_func=etag_editar_separacao))
+    def get(self, request, pk):
+        controle = self.buscar_controle(pk)
+        if controle is None:
+            messages.info(request, "Transporte ainda sem separação: libere-o para editar as cargas.")
+            return redirect("expedicao:detalhe_card", pk=pk)
+        formset = SeparacaoCargaFormSet(queryset=controle.cargas.all(), prefix=self.prefixo)
+        return self.renderizar(request, controle, formset)
+
     def post(self, request, pk):
-        lecom = get_object_or_404(Lecom, pk=pk)
-        controle = get_object_or_404(ControleSeparacao, lecom=lecom)
-        carga_id = request.POST.get("carga_id")
-        carga = get_object_or_404(SeparacaoCarga, id=carga_id, controle=controle)
-        acao = request.POST.get("acao")
+        controle = self.buscar_controle(pk)
+        if controle is None:
+            raise Http404("Controle de separação não encontrado.")
+        formset = SeparacaoCargaFormSet(
+            request.POST, queryset=controle.cargas.all(), prefix=self.prefixo
+        )
+
+        # =================== AÇÃO DA LINHA ===================
+        nome, _, carga_id = request.POST.get("acao", "").partition(":")
+        transicao = TRANSICOES_CARGA.get(nome)
+
+        if not formset.is_valid():
+            messages.error(request, "Corrija os campos destacados.")
+            return self.renderizar(request, controle, formset)
+
+        alteradas, campos = formset.alteracoes()
 
         try:
             with transaction.atomic():
-                # =================== ATUALIZA CAMPOS DO FORMULÁRIO ===================
-                carga.conferente = request.POST.get("Conferente", "").strip()
-                carga.separadores = request.POST.get("Separadores", "").strip()
-                carga.ot = request.POST.get("OT", "").strip()
-                carga.box = request.POST.get("BOX", "").strip()
-                carga.resumo_conf = bool(request.POST.get("resumo_conf"))
-                carga.resumo_motorista = bool(request.POST.get("resumo_motorista"))
-                carga.etiquetas_cds = bool(request.POST.get("etiquetas_cds"))
-                carga.carga_gerada = bool(request.POST.get("carga_gerada"))
-
-                # =================== INICIAR CARGA ===================
-                if acao == "iniciar" and carga.status == carga.STATUS_AGUARDANDO:
-                    carga.status = carga.STATUS_EM_ANDAMENTO
-                    controle.status = controle.STATUS_EM_ANDAMENTO
-                    if not carga.inicio_separacao:
-                        carga.inicio_separacao = timezone.now()
-                    carga.save()
-                    controle.save()
-
-                    # Atualiza controle se ainda estiver pendente
-                    if controle.status == controle.STATUS_AGUARDANDO:
-                        controle.status = controle.STATUS_EM_ANDAMENTO
-                        if not controle.inicio_separacao:
-                            controle.inicio_separacao = timezone.now()
-                        controle.save()
-
-                # =================== CONCLUIR CARGA ===================
-                elif acao == "concluir" and carga.status != carga.STATUS_CONCLUIDO:
-                    carga.status = carga.STATUS_CONCLUIDO
-                    controle.STATUS_AGUARDANDO = controle.STATUS_CONCLUIDO
-                    carga.finalizada = True
-                    carga.save()
-
-                    # Se todas as cargas estiverem concluídas, finaliza o controle
-                    cargas_pendentes = controle.cargas.filter(status__in=[SeparacaoCarga.STATUS_EM_ANDAMENTO,
-                                    SeparacaoCarga.STATUS_EM_ANDAMENTO]
+                # =================== CAMPOS DO FORMULÁRIO ===================
+                # Só as linhas e colunas que mudaram, num UPDATE só,
+                # condicionado à versão lida de cada linha
+                if alteradas:
+                    gravar_com_versao(alteradas, campos)
+                    registrar_alteracao(SeparacaoCarga)
+
+                # =================== INICIAR / CONCLUIR CARGA ===================
+                # UPDATE condicional ao status + rollup do controle
+                if transicao:
+                    carga = next(
+                        (f.instance for f in formset.forms if str(f.instance.pk) == carga_id),
+                        None,
                     )
-                    if not cargas_pendentes.exists():
-                        controle.finalizar_separacao()
+                    if carga is None:
+                        raise SeparacaoCarga.DoesNotExist(f"Carga {carga_id} não pertence ao controle.")
+                    transicionar_carga(carga, nome)
 
-                else:
-                    # Apenas salva alterações de campos (atualização sem iniciar/concluir)
-                    carga.save()
+        except ConflitoDeVersao as conflito:
+            return self.renderizar_conflito(request, controle, formset, conflito)
+
+        except TransicaoInvalida:
+            messages.warning(
+                request,
+                f"{carga} foi alterada por outro usuário. Confira o status e tente novamente.",
+            )
+            return redirect("expedicao:editar_carga", pk=pk)
 
         except Exception as e:
-            messages.error(request, f"Erro ao atualizar carga: {e}")
-            return redirect("expedicao:editar_carga", pk=lecom.pk)
+            messages.error(request, f"Erro ao atualizar cargas: {e}")
+            return redirect("expedicao:editar_carga", pk=pk)
 
-        messages.success(request, f"{carga} atualizada com sucesso.")
+        if transicao:
+            messages.success(request, f"{carga} atualizada com sucesso.")
+        elif alteradas:
+            messages.success(request, f"{len(alteradas)} carga(s) atualizada(s) com sucesso.")
+        else:
+            messages.info(request, "Nenhuma alteração para salvar.")
         return redirect("expedicao:cenario_separacao")
@@ -0,0 +1,9 @@
+from django.contrib import admin
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("id", "tipo", "status", "progresso_atual", "progresso_total", "criado_em")
+    list_filter = ("status", "tipo")
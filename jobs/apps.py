@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class JobsConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "jobs"
+
+    def ready(self):
+        # Carrega os módulos tarefas.py dos apps (registram as tarefas)
+        from django.utils.module_loading import autodiscover_modules
+
+        autodiscover_modules("tarefas")
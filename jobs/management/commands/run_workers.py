@@ -0,0 +1,112 @@
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import timedelta
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from jobs.services import (
+    executar, nome_do_worker, recuperar_travados, reservar_proximo,
+    tarefas_registradas,
+)
+
+
+def _laco_worker(intervalo, uma_vez, tipos, parar=None):
+    """
+    Reserva e executa jobs até a fila esvaziar (uma_vez) ou até `parar`
+    """
+    executados = 0
+    try:
+        while parar is None or not parar.is_set():
+            job = reservar_proximo(nome_do_worker(), tipos=tipos)
+            if job is None:
+                if uma_vez:
+                    break
+                if parar is not None:
+                    parar.wait(intervalo)
+                else:
+                    time.sleep(intervalo)
+                continue
+            executar(job)
+            executados += 1
+    finally:
+        connections.close_all()
+    return executados
+
+
+def _inicializar_processo():
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = (
+        "Executa os jobs pendentes (tabela jobs_job) num pool de threads "
+        "ou de processos. Não precisa de Redis nem Celery."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int, default=2,
+            help="Quantidade de workers (padrão: 2).",
+        )
+        parser.add_argument(
+            "--pool", choices=["thread", "process"], default="thread",
+            help="Threads para jobs de banco; processos para jobs de CPU.",
+        )
+        parser.add_argument(
+            "--intervalo", type=float, default=2.0,
+            help="Segundos de espera quando a fila está vazia (padrão: 2).",
+        )
+        parser.add_argument(
+            "--tipo", action="append", dest="tipos",
+            help="Executa só jobs deste tipo (pode repetir).",
+        )
+        parser.add_argument(
+            "--travado-apos", type=int, default=30,
+            help="Minutos sem progresso para devolver um job à fila (padrão: 30).",
+        )
+        parser.add_argument(
+            "--uma-vez", action="store_true",
+            help="Esvazia a fila e termina.",
+        )
+
+    def handle(self, *args, **options):
+        workers = options["workers"]
+        if workers < 1:
+            raise CommandError("--workers deve ser maior que zero.")
+
+        recuperados = recuperar_travados(timedelta(minutes=options["travado_apos"]))
+        if recuperados:
+            self.stdout.write(self.style.WARNING(f"{recuperados} jobs travados voltaram para a fila."))
+
+        self.stdout.write(
+            f"{workers} workers ({options['pool']}) para: "
+            f"{', '.join(options['tipos'] or tarefas_registradas())}"
+        )
+
+        argumentos = (options["intervalo"], options["uma_vez"], options["tipos"])
+        if options["pool"] == "process":
+            # Conexões abertas não podem ser herdadas pelos processos filhos
+            connections.close_all()
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=_inicializar_processo)
+            parar = None
+        else:
+            executor = ThreadPoolExecutor(max_workers=workers)
+            parar = threading.Event()
+            argumentos += (parar,)
+
+        futuros = [executor.submit(_laco_worker, *argumentos) for _ in range(workers)]
+        try:
+            total = sum(futuro.result() for futuro in futuros)
+        except KeyboardInterrupt:
+            # Os jobs em execução terminam; nenhum job novo é reservado
+            if parar is not None:
+                parar.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+            self.stdout.write("Workers encerrados.")
+            return
+        executor.shutdown()
+
+        self.stdout.write(self.style.SUCCESS(f"{total} jobs executados."))
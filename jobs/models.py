@@ -0,0 +1,84 @@
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """
+    Operação pesada executada fora da requisição pelo run_workers.
+    A fila é a própria tabela: os workers reservam os jobs pendentes.
+    """
+
+    STATUS_PENDENTE = "Pendente"
+    STATUS_EXECUTANDO = "Executando"
+    STATUS_CONCLUIDO = "Concluido"
+    STATUS_FALHOU = "Falhou"
+
+    STATUS_CHOICES = [
+        (STATUS_PENDENTE, "Pendente"),
+        (STATUS_EXECUTANDO, "Executando"),
+        (STATUS_CONCLUIDO, "Concluído"),
+        (STATUS_FALHOU, "Falhou"),
+    ]
+
+    tipo = models.CharField(max_length=100)
+    parametros = models.JSONField(default=dict, blank=True)
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDENTE
+    )
+
+    progresso_atual = models.PositiveIntegerField(default=0)
+    progresso_total = models.PositiveIntegerField(default=0)
+    mensagem = models.CharField(max_length=255, blank=True, default="")
+    resultado = models.JSONField(blank=True, null=True)
+    erro = models.TextField(blank=True, default="")
+
+    worker = models.CharField(max_length=100, blank=True, default="")
+    criado_por = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name="jobs"
+    )
+    criado_em = models.DateTimeField(default=timezone.now)
+    iniciado_em = models.DateTimeField(blank=True, null=True)
+    concluido_em = models.DateTimeField(blank=True, null=True)
+    atualizado_em = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # Fila: só os pendentes, na ordem de chegada
+            models.Index(
+                fields=["id"],
+                name="job_pendentes_idx",
+                condition=models.Q(status="Pendente"),
+            ),
+        ]
+
+    @property
+    def percentual(self):
+        if not self.progresso_total:
+            return 100 if self.status == self.STATUS_CONCLUIDO else 0
+        return min(100, round(self.progresso_atual * 100 / self.progresso_total))
+
+    @property
+    def finalizado(self):
+        return self.status in (self.STATUS_CONCLUIDO, self.STATUS_FALHOU)
+
+    def atualizar_progresso(self, atual, total=None, mensagem=None):
+        """
+        Grava o progresso (só esses campos) para as views acompanharem
+        """
+        self.progresso_atual = atual
+        campos = {"progresso_atual": atual, "atualizado_em": timezone.now()}
+        if total is not None:
+            self.progresso_total = campos["progresso_total"] = total
+        if mensagem is not None:
+            self.mensagem = campos["mensagem"] = mensagem[:255]
+        Job.objects.filter(pk=self.pk).update(**campos)
+
+    def __str__(self):
+        return f"Job {self.pk} - {self.tipo} ({self.status})"
@@ -0,0 +1,126 @@
+import os
+import socket
+import threading
+import traceback
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Job
+
+
+# Tarefas registradas: tipo → função(job, **parametros)
+_tarefas = {}
+
+
+def tarefa(tipo):
+    """
+    Registra uma função como tarefa de job. Use em um módulo tarefas.py:
+
+        @tarefa("expedicao.ressincronizar")
+        def ressincronizar(job, desde=None):
+            ...
+
+    O retorno (serializável em JSON) vira o `resultado` do job.
+    """
+    def registrar(funcao):
+        _tarefas[tipo] = funcao
+        return funcao
+    return registrar
+
+
+def tarefas_registradas():
+    return sorted(_tarefas)
+
+
+def enfileirar(tipo, criado_por=None, **parametros):
+    """
+    Cria um job pendente. Os parâmetros precisam ser serializáveis em JSON.
+    """
+    if tipo not in _tarefas:
+        raise ValueError(f"Tarefa não registrada: {tipo}")
+    return Job.objects.create(tipo=tipo, parametros=parametros, criado_por=criado_por)
+
+
+def nome_do_worker():
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+def reservar_proximo(worker, tipos=None):
+    """
+    Reserva o job pendente mais antigo para `worker`, ou None se a fila
+    estiver vazia.
+
+    No PostgreSQL usa SELECT ... FOR UPDATE SKIP LOCKED: workers
+    concorrentes pulam as linhas já travadas, sem esperar. Nos demais
+    bancos, a reserva é um UPDATE condicional (status ainda pendente); se
+    outro worker chegou antes, tenta o próximo.
+    """
+    pendentes = Job.objects.filter(status=Job.STATUS_PENDENTE).order_by("id")
+    if tipos:
+        pendentes = pendentes.filter(tipo__in=tipos)
+    agora = timezone.now()
+    reserva = {
+        "status": Job.STATUS_EXECUTANDO,
+        "worker": worker,
+        "iniciado_em": agora,
+        "atualizado_em": agora,
+    }
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            job = pendentes.select_for_update(skip_locked=True).first()
+            if job is None:
+                return None
+            Job.objects.filter(pk=job.pk).update(**reserva)
+    else:
+        while True:
+            job = pendentes.first()
+            if job is None:
+                return None
+            if Job.objects.filter(pk=job.pk, status=Job.STATUS_PENDENTE).update(**reserva):
+                break
+
+    for campo, valor in reserva.items():
+        setattr(job, campo, valor)
+    return job
+
+
+def executar(job):
+    """
+    Roda a tarefa do job e grava o resultado ou o erro
+    """
+    funcao = _tarefas.get(job.tipo)
+    try:
+        if funcao is None:
+            raise LookupError(f"Tarefa não registrada: {job.tipo}")
+        resultado = funcao(job, **job.parametros)
+    except Exception as exc:
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.STATUS_FALHOU,
+            erro=f"{type(exc).__name__}: {exc}\n\n{traceback.format_exc()}",
+            mensagem=str(exc)[:255],
+            concluido_em=timezone.now(),
+            atualizado_em=timezone.now(),
+        )
+        return False
+
+    Job.objects.filter(pk=job.pk).update(
+        status=Job.STATUS_CONCLUIDO,
+        resultado=resultado,
+        concluido_em=timezone.now(),
+        atualizado_em=timezone.now(),
+    )
+    return True
+
+
+def recuperar_travados(limite=timedelta(minutes=30)):
+    """
+    Devolve à fila jobs em execução sem progresso há mais que `limite`
+    (worker que morreu no meio do job).
+    """
+    return Job.objects.filter(
+        status=Job.STATUS_EXECUTANDO,
+        atualizado_em__lt=timezone.now() - limite,
+    ).update(status=Job.STATUS_PENDENTE, worker="", atualizado_em=timezone.now())
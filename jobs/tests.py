@@ -0,0 +1,198 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.db.models.query import QuerySet
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.services import enfileirar, executar, recuperar_travados, reservar_proximo, tarefa
+
+
+@tarefa("jobs.teste")
+def tarefa_de_teste(job, total=3, falhar=False):
+    for atual in range(1, total + 1):
+        job.atualizar_progresso(atual, total=total, mensagem=f"Passo {atual}")
+    if falhar:
+        raise RuntimeError("falhou de propósito")
+    return {"passos": total}
+
+
+@tarefa("jobs.outro")
+def outra_tarefa(job):
+    return None
+
+
+class ReservaTests(TestCase):
+    """
+    reservar_proximo: SKIP LOCKED (PostgreSQL) e UPDATE condicional
+    """
+
+    def setUp(self):
+        self.jobs = [enfileirar("jobs.teste") for _ in range(3)]
+
+    def test_reserva_o_mais_antigo_e_depois_o_seguinte(self):
+        primeiro = reservar_proximo("w1")
+        segundo = reservar_proximo("w2")
+
+        self.assertEqual((primeiro.pk, segundo.pk), (self.jobs[0].pk, self.jobs[1].pk))
+        primeiro.refresh_from_db()
+        self.assertEqual((primeiro.status, primeiro.worker), (Job.STATUS_EXECUTANDO, "w1"))
+        self.assertIsNotNone(primeiro.iniciado_em)
+
+    def test_fila_vazia(self):
+        for _ in self.jobs:
+            reservar_proximo("w1")
+        self.assertIsNone(reservar_proximo("w1"))
+
+    def test_filtra_por_tipo(self):
+        outro = enfileirar("jobs.outro")
+        self.assertEqual(reservar_proximo("w1", tipos=["jobs.outro"]).pk, outro.pk)
+        self.assertIsNone(reservar_proximo("w1", tipos=["jobs.outro"]))
+
+    def test_caminho_skip_locked(self):
+        # No SQLite o FOR UPDATE é omitido; o que se testa é o fluxo
+        with mock.patch.object(connection.features, "has_select_for_update_skip_locked", True):
+            job = reservar_proximo("w1")
+            self.assertEqual(job.pk, self.jobs[0].pk)
+            self.assertEqual(Job.objects.get(pk=job.pk).worker, "w1")
+
+    def test_update_condicional_pula_o_job_que_outro_worker_reservou(self):
+        original = QuerySet.first
+        concorrente = []
+
+        def first(queryset):
+            # Outro worker reserva o job entre o SELECT e o UPDATE
+            job = original(queryset)
+            if job is not None and queryset.model is Job and not concorrente:
+                Job.objects.filter(pk=job.pk).update(status=Job.STATUS_EXECUTANDO, worker="outro")
+                concorrente.append(job.pk)
+            return job
+
+        with mock.patch.object(connection.features, "has_select_for_update_skip_locked", False), \
+                mock.patch.object(QuerySet, "first", first):
+            job = reservar_proximo("w1")
+
+        self.assertEqual(job.pk, self.jobs[1].pk)
+        self.assertEqual(Job.objects.get(pk=self.jobs[0].pk).worker, "outro")
+
+
+class ExecucaoTests(TestCase):
+    """
+    executar, progresso e recuperação de jobs travados
+    """
+
+    def test_progresso_e_resultado(self):
+        enfileirar("jobs.teste", total=4)
+        job = reservar_proximo("w1")
+        self.assertTrue(executar(job))
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_CONCLUIDO)
+        self.assertEqual((job.progresso_atual, job.progresso_total, job.percentual), (4, 4, 100))
+        self.assertEqual(job.mensagem, "Passo 4")
+        self.assertEqual(job.resultado, {"passos": 4})
+
+    def test_percentual_parcial_e_mensagem_truncada(self):
+        job = enfileirar("jobs.teste")
+        job.atualizar_progresso(1, total=3, mensagem="x" * 300)
+
+        job.refresh_from_db()
+        self.assertEqual(job.percentual, 33)
+        self.assertEqual(len(job.mensagem), 255)
+
+    def test_falha_grava_o_erro(self):
+        job = enfileirar("jobs.teste", falhar=True)
+        self.assertFalse(executar(job))
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_FALHOU)
+        self.assertEqual(job.mensagem, "falhou de propósito")
+        self.assertIn("RuntimeError", job.erro)
+        self.assertTrue(job.finalizado)
+
+    def test_tipo_desconhecido_falha(self):
+        job = Job.objects.create(tipo="nao.existe")
+        self.assertFalse(executar(job))
+        self.assertIn("LookupError", Job.objects.get(pk=job.pk).erro)
+
+    def test_enfileirar_tipo_desconhecido(self):
+        with self.assertRaises(ValueError):
+            enfileirar("nao.existe")
+
+    def test_recuperar_travados_devolve_so_os_sem_progresso(self):
+        travado = enfileirar("jobs.teste")
+        ativo = enfileirar("jobs.teste")
+        Job.objects.filter(pk__in=[travado.pk, ativo.pk]).update(
+            status=Job.STATUS_EXECUTANDO, worker="w1",
+        )
+        Job.objects.filter(pk=travado.pk).update(atualizado_em=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(recuperar_travados(timedelta(minutes=30)), 1)
+        travado.refresh_from_db()
+        ativo.refresh_from_db()
+        self.assertEqual((travado.status, travado.worker), (Job.STATUS_PENDENTE, ""))
+        self.assertEqual(ativo.status, Job.STATUS_EXECUTANDO)
+        self.assertEqual(reservar_proximo("w2").pk, travado.pk)
+
+
+class RunWorkersTests(TransactionTestCase):
+    """
+    run_workers --uma-vez: esvazia a fila com o pool de threads (um
+    worker: o SQLite em memória dos testes trava com escritores paralelos)
+    """
+
+    def test_executa_a_fila_e_recupera_travados(self):
+        jobs = [enfileirar("jobs.teste", total=2) for _ in range(3)]
+        Job.objects.filter(pk=jobs[0].pk).update(
+            status=Job.STATUS_EXECUTANDO, atualizado_em=timezone.now() - timedelta(hours=2),
+        )
+        enfileirar("jobs.outro")
+
+        saida = StringIO()
+        call_command("run_workers", workers=1, uma_vez=True, tipos=["jobs.teste"], stdout=saida)
+
+        self.assertIn("1 jobs travados voltaram para a fila.", saida.getvalue())
+        self.assertIn("3 jobs executados.", saida.getvalue())
+        self.assertEqual(
+            list(Job.objects.filter(tipo="jobs.teste").values_list("status", flat=True).distinct()),
+            [Job.STATUS_CONCLUIDO],
+        )
+        self.assertEqual(Job.objects.get(tipo="jobs.outro").status, Job.STATUS_PENDENTE)
+
+
+class JobViewsTests(TestCase):
+    """
+    Status e detalhe: só quem criou o job (ou staff)
+    """
+
+    def setUp(self):
+        self.dono = User.objects.create_user("dono")
+        self.job = enfileirar("jobs.teste", criado_por=self.dono, total=2)
+
+    def urls(self):
+        return [reverse("jobs:detalhe", args=[self.job.pk]), reverse("jobs:status", args=[self.job.pk])]
+
+    def test_dono_e_staff_acompanham(self):
+        for usuario in (self.dono, User.objects.create_user("chefe", is_staff=True)):
+            self.client.force_login(usuario)
+            for url in self.urls():
+                self.assertEqual(self.client.get(url).status_code, 200, (usuario, url))
+
+        resposta = self.client.get(reverse("jobs:status", args=[self.job.pk]))
+        self.assertEqual(resposta.json()["status"], Job.STATUS_PENDENTE)
+        self.assertNotIn("parametros", resposta.json())
+
+    def test_outro_usuario_recebe_404(self):
+        self.client.force_login(User.objects.create_user("outro"))
+        for url in self.urls():
+            self.assertEqual(self.client.get(url).status_code, 404, url)
+
+    def test_anonimo_vai_para_o_login(self):
+        for url in self.urls():
+            self.assertEqual(self.client.get(url).status_code, 302, url)
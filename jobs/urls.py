@@ -0,0 +1,9 @@
+from django.urls import path
+from .views import JobDetalheView, JobStatusView
+
+app_name = "jobs"
+
+urlpatterns = [
+    path("<int:pk>/", JobDetalheView.as_view(), name="detalhe"),
+    path("<int:pk>/status/", JobStatusView.as_view(), name="status"),
+]
@@ -0,0 +1,51 @@
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404, render
+from django.views import View
+
+from .models import Job
+
+
+def job_como_dict(job):
+    return {
+        "id": job.id,
+        "tipo": job.tipo,
+        "status": job.status,
+        "finalizado": job.finalizado,
+        "progresso_atual": job.progresso_atual,
+        "progresso_total": job.progresso_total,
+        "percentual": job.percentual,
+        "mensagem": job.mensagem,
+        "resultado": job.resultado,
+        "criado_em": job.criado_em,
+        "iniciado_em": job.iniciado_em,
+        "concluido_em": job.concluido_em,
+    }
+
+
+def jobs_visiveis(usuario):
+    """
+    Jobs que o usuário pode acompanhar: os que ele criou (staff vê todos).
+    Os demais respondem 404, sem revelar que existem.
+    """
+    if usuario.is_staff:
+        return Job.objects.all()
+    return Job.objects.filter(criado_por=usuario)
+
+
+class JobStatusView(LoginRequiredMixin, View):
+    """
+    Progresso do job em JSON, para a tela consultar periodicamente
+    """
+
+    def get(self, request, pk):
+        job = get_object_or_404(jobs_visiveis(request.user).defer("erro", "parametros"), pk=pk)
+        return JsonResponse(job_como_dict(job))
+
+
+class JobDetalheView(LoginRequiredMixin, View):
+    template_name = "jobs/job_detalhe.html"
+
+    def get(self, request, pk):
+        job = get_object_or_404(jobs_visiveis(request.user), pk=pk)
+        return render(request, self.template_name, {"job": job})
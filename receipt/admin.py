@@ -2,10 +2,26 @@ from django.contrib import admin
 
 # Register your models here.
 from django.contrib import admin
-from .models import NotaFiscal
+from .models import NotaFiscal, ResumoDiarioNotas, UnidadeNegocio
+
+@admin.register(UnidadeNegocio)
+class UnidadeNegocioAdmin(admin.ModelAdmin):
+    list_display = ('codigo', 'nome', 'ativa')
+    list_filter = ('ativa',)
+    search_fields = ('codigo', 'nome')
+
 
 @admin.register(NotaFiscal)
 class NotaFiscalAdmin(admin.ModelAdmin):
     list_display = ('nf', 'data', 'turno', 'un_origem', 'qnt_pallet', 'tipo_veiculo', 'peso_nota')
-    list_filter = ('turno', 'data')
-    search_fields = ('nf', 'un_origem', 'tipo_veiculo')
+    list_filter = ('turno', 'data', 'un_origem')
+    list_select_related = ('un_origem',)
+    search_fields = ('nf', 'un_origem__codigo', 'tipo_veiculo')
+
+
+@admin.register(ResumoDiarioNotas)
+class ResumoDiarioNotasAdmin(admin.ModelAdmin):
+    list_display = ('data', 'turno', 'un_origem', 'notas', 'pallets', 'peso')
+    list_filter = ('turno', 'un_origem')
+    list_select_related = ('un_origem',)
+    date_hierarchy = 'data'
@@ -0,0 +1,42 @@
+from django import forms
+
+from .models import NotaFiscal, UnidadeNegocio
+
+
+class VariosArquivosInput(forms.ClearableFileInput):
+    allow_multiple_selected = True
+
+
+class VariosArquivosField(forms.FileField):
+    """
+    FileField que aceita vários arquivos no mesmo campo
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("widget", VariosArquivosInput(attrs={"multiple": True, "accept": ".xml,.zip"}))
+        super().__init__(*args, **kwargs)
+
+    def clean(self, data, initial=None):
+        if isinstance(data, (list, tuple)):
+            return [super(VariosArquivosField, self).clean(arquivo, initial) for arquivo in data]
+        return [super().clean(data, initial)]
+
+
+class ImportacaoNotasForm(forms.Form):
+    """
+    Remessa de NF-e: os XML trazem número, data, peso e volumes; UN,
+    turno e veículo valem para todas as notas da remessa
+    """
+
+    arquivos = VariosArquivosField(
+        label="Arquivos XML ou ZIP",
+        help_text="Para remessas grandes, envie um .zip com os XML.",
+    )
+    un_origem = forms.ModelChoiceField(
+        queryset=UnidadeNegocio.objects.filter(ativa=True), label="UN de Origem"
+    )
+    turno = forms.TypedChoiceField(choices=NotaFiscal.TURNO_CHOICES, coerce=int, label="Turno")
+    tipo_veiculo = forms.CharField(
+        max_length=NotaFiscal._meta.get_field("tipo_veiculo").max_length,
+        label="Tipo de Veículo",
+    )
@@ -0,0 +1,315 @@
+import codecs
+import io
+import os
+import re
+import tempfile
+import zipfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils.dateparse import parse_date
+
+from dashboard.services import invalidar_kpis
+
+from .models import NotaFiscal
+from .services import aplicar_notas
+
+
+# Importação em lote de NF-e (XML do fornecedor) para NotaFiscal.
+# A leitura dos XML não toca o banco; o comando importar_nfes a distribui
+# em processos nas remessas grandes (a tela enfileira um job, que lê num
+# processo só). A gravação é um IN por lote para achar as notas já
+# lançadas e um bulk_create com as novas.
+
+# A partir de quantos arquivos a leitura vai para o pool de processos
+MIN_ARQUIVOS_PROCESSOS = 200
+
+# Notas consultadas / gravadas por vez
+TAMANHO_LOTE = 1000
+
+# XML de NF-e tem dezenas de KB; acima disso é outra coisa (ou zip bomb)
+MAX_TAMANHO_XML = 5 * 1024 * 1024
+
+# Espécies de volume (transp/vol/esp) contadas como pallet
+ESPECIES_PALLET = ("PALLET", "PALETE", "PLT")
+
+MAX_DIGITOS_PESO = NotaFiscal._meta.get_field("peso_nota").max_digits
+MAX_PALLETS = 32767
+
+
+class ResultadoImportacao:
+    """
+    Relatório por arquivo: notas gravadas, já existentes e com erro
+    """
+
+    def __init__(self):
+        self.importadas = []
+        self.existentes = []
+        self.erros = []
+
+    @property
+    def total(self):
+        return len(self.importadas) + len(self.existentes) + len(self.erros)
+
+    def como_dict(self):
+        return {
+            "importadas": len(self.importadas),
+            "existentes": [{"arquivo": arquivo, "nf": nf} for arquivo, nf in self.existentes],
+            "erros": [{"arquivo": arquivo, "erro": erro} for arquivo, erro in self.erros],
+        }
+
+
+# =================== LEITURA DOS ARQUIVOS ===================
+
+def expandir_arquivos(arquivos):
+    """
+    (nome, conteúdo) de cada XML, abrindo os .zip. Itens inválidos saem
+    como (nome, None, erro) para entrar no relatório.
+    """
+    for nome, conteudo in arquivos:
+        if nome.lower().endswith(".zip"):
+            try:
+                with zipfile.ZipFile(io.BytesIO(conteudo)) as pacote:
+                    for item in pacote.infolist():
+                        if item.is_dir() or not item.filename.lower().endswith(".xml"):
+                            continue
+                        caminho = f"{nome}/{item.filename}"
+                        # Lê no máximo o limite + 1 byte: o file_size do
+                        # cabeçalho é declarado por quem montou o zip
+                        try:
+                            with pacote.open(item) as leitura:
+                                xml = leitura.read(MAX_TAMANHO_XML + 1)
+                        except (RuntimeError, NotImplementedError):
+                            yield caminho, None, "Item do zip criptografado ou com compressão não suportada."
+                            continue
+                        if len(xml) > MAX_TAMANHO_XML:
+                            yield caminho, None, "Arquivo grande demais para uma NF-e."
+                            continue
+                        yield caminho, xml, None
+            except zipfile.BadZipFile:
+                yield nome, None, "Zip inválido."
+        elif nome.lower().endswith(".xml"):
+            if len(conteudo) > MAX_TAMANHO_XML:
+                yield nome, None, "Arquivo grande demais para uma NF-e."
+            else:
+                yield nome, conteudo, None
+        else:
+            yield nome, None, "Formato não suportado (envie .xml ou .zip)."
+
+
+# Prólogo: declaração XML / instruções de processamento e comentários,
+# com espaços entre eles
+_ITEM_DO_PROLOGO = re.compile(rb"\s*(?:<\?.*?\?>|<!--.*?-->)", re.S)
+
+
+def _fim_do_prologo(conteudo):
+    """
+    Posição do que vem depois do prólogo (em um XML válido, o elemento
+    raiz ou um DOCTYPE), percorrendo o prólogo inteiro: comentários ou
+    espaços longos não escondem o DOCTYPE
+    """
+    posicao = len(codecs.BOM_UTF8) if conteudo.startswith(codecs.BOM_UTF8) else 0
+    while item := _ITEM_DO_PROLOGO.match(conteudo, posicao):
+        posicao = item.end()
+    while posicao < len(conteudo) and conteudo[posicao:posicao + 1].isspace():
+        posicao += 1
+    return posicao
+
+
+def _sem_namespace(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def _decimal(texto):
+    return Decimal((texto or "0").strip() or "0")
+
+
+def ler_nfe(nome, conteudo):
+    """
+    Extrai número, data de emissão, peso bruto e pallets de um XML de
+    NF-e com iterparse: os itens são descartados à medida que são lidos e
+    a leitura para no fim de transp. Retorna {"arquivo", "nf", "data",
+    "peso", "pallets"} ou {"arquivo", "erro"}.
+
+    Roda nos processos do pool: não pode usar o banco.
+    """
+    inicio = _fim_do_prologo(conteudo)
+    if conteudo[inicio:inicio + 2] == b"<!":
+        return {"arquivo": nome, "erro": "XML com DOCTYPE não é aceito."}
+    if conteudo[inicio:inicio + 1] != b"<":
+        # Outra codificação (UTF-16) esconderia o DOCTYPE desta verificação
+        return {"arquivo": nome, "erro": "XML inválido: a NF-e deve estar em UTF-8."}
+
+    nf = emissao = None
+    peso = Decimal("0")
+    volumes = pallets = 0
+    try:
+        for _, elemento in ET.iterparse(io.BytesIO(conteudo)):
+            tag = _sem_namespace(elemento.tag)
+            if tag == "ide":
+                # Só os filhos diretos: NFref também tem nNF
+                campos = {_sem_namespace(filho.tag): filho.text for filho in elemento}
+                nf = (campos.get("nNF") or "").strip()
+                emissao = (campos.get("dhEmi") or campos.get("dEmi") or "").strip()[:10]
+            elif tag == "transp":
+                for vol in elemento:
+                    if _sem_namespace(vol.tag) != "vol":
+                        continue
+                    campos = {_sem_namespace(filho.tag): filho.text for filho in vol}
+                    quantidade = int(_decimal(campos.get("qVol")))
+                    volumes += quantidade
+                    if (campos.get("esp") or "").strip().upper().startswith(ESPECIES_PALLET):
+                        pallets += quantidade
+                    peso += _decimal(campos.get("pesoB") or campos.get("pesoL"))
+                # O resto (cobrança, informações adicionais, assinatura) não interessa
+                break
+            elif tag == "det":
+                elemento.clear()
+    except ET.ParseError as erro:
+        return {"arquivo": nome, "erro": f"XML inválido: {erro}"}
+    except (InvalidOperation, ValueError):
+        return {"arquivo": nome, "erro": "Volume ou peso com valor inválido."}
+
+    data = parse_date(emissao) if emissao else None
+    if not nf or not nf.isdigit() or len(nf) > NotaFiscal._meta.get_field("nf").max_length:
+        return {"arquivo": nome, "erro": "Número da nota (ide/nNF) ausente ou inválido."}
+    if data is None:
+        return {"arquivo": nome, "erro": "Data de emissão (ide/dhEmi) ausente ou inválida."}
+    peso = peso.quantize(Decimal("0.01"))
+    if peso <= 0 or len(peso.as_tuple().digits) > MAX_DIGITOS_PESO:
+        return {"arquivo": nome, "erro": "Peso bruto (transp/vol/pesoB) ausente ou inválido."}
+
+    # Sem espécie de pallet informada, cada volume conta como um pallet
+    pallets = pallets or volumes
+    if pallets > MAX_PALLETS:
+        return {"arquivo": nome, "erro": "Quantidade de volumes inválida."}
+
+    return {"arquivo": nome, "nf": nf, "data": data, "peso": peso, "pallets": pallets}
+
+
+def _ler_bloco(bloco):
+    return [ler_nfe(nome, conteudo) for nome, conteudo in bloco]
+
+
+def ler_nfes(arquivos, processos=1):
+    """
+    Lê os XML na ordem recebida. Com `processos` > 1 e
+    MIN_ARQUIVOS_PROCESSOS arquivos ou mais, em blocos distribuídos num
+    pool de processos (só no comando: não abra um pool dentro de um
+    worker web ou de jobs).
+    """
+    arquivos = list(arquivos)
+    if processos <= 1 or len(arquivos) < MIN_ARQUIVOS_PROCESSOS:
+        return _ler_bloco(arquivos)
+
+    tamanho = max(50, len(arquivos) // (processos * 4))
+    blocos = [arquivos[inicio:inicio + tamanho] for inicio in range(0, len(arquivos), tamanho)]
+    with ProcessPoolExecutor(max_workers=processos) as pool:
+        return [nota for lidas in pool.map(_ler_bloco, blocos) for nota in lidas]
+
+
+# =================== GRAVAÇÃO ===================
+
+def _gravar_lote(lote, un_origem, turno, tipo_veiculo, resultado):
+    """
+    Um IN para achar as notas já lançadas e um bulk_create com as novas,
+    na mesma transação que atualiza o resumo diário
+    """
+    for tentativa in range(2):
+        existentes = set(
+            NotaFiscal.objects.filter(nf__in=[nota["nf"] for nota in lote])
+            .values_list("nf", flat=True)
+        )
+        novas = [
+            NotaFiscal(
+                data=nota["data"], turno=turno, nf=nota["nf"], un_origem=un_origem,
+                qnt_pallet=nota["pallets"], tipo_veiculo=tipo_veiculo, peso_nota=nota["peso"],
+            )
+            for nota in lote if nota["nf"] not in existentes
+        ]
+        try:
+            with transaction.atomic():
+                NotaFiscal.objects.bulk_create(novas)
+                # bulk_create não dispara os signals do resumo
+                aplicar_notas(novas)
+            break
+        except IntegrityError:
+            # Outra importação gravou alguma dessas notas entre o IN e o
+            # INSERT: refaz o lote com a lista atualizada
+            if tentativa:
+                raise
+
+    for nota in lote:
+        if nota["nf"] in existentes:
+            resultado.existentes.append((nota["arquivo"], nota["nf"]))
+        else:
+            resultado.importadas.append((nota["arquivo"], nota["nf"]))
+    return {nota.data for nota in novas}
+
+
+def importar_nfes(arquivos, un_origem, turno, tipo_veiculo, processos=1, tamanho_lote=TAMANHO_LOTE):
+    """
+    Importa NF-e de `arquivos` ((nome, bytes) de .xml ou .zip) como
+    NotaFiscal da UN / turno / tipo de veículo informados. Notas cujo
+    número já existe não são regravadas. Retorna o ResultadoImportacao.
+    `processos`: ver ler_nfes.
+    """
+    resultado = ResultadoImportacao()
+
+    legiveis = []
+    for nome, conteudo, erro in expandir_arquivos(arquivos):
+        if erro:
+            resultado.erros.append((nome, erro))
+        else:
+            legiveis.append((nome, conteudo))
+
+    validas, vistas = [], {}
+    for nota in ler_nfes(legiveis, processos):
+        if "erro" in nota:
+            resultado.erros.append((nota["arquivo"], nota["erro"]))
+        elif nota["nf"] in vistas:
+            resultado.erros.append(
+                (nota["arquivo"], f"Nota {nota['nf']} repetida na remessa ({vistas[nota['nf']]}).")
+            )
+        else:
+            vistas[nota["nf"]] = nota["arquivo"]
+            validas.append(nota)
+
+    datas = set()
+    for inicio in range(0, len(validas), tamanho_lote):
+        datas |= _gravar_lote(validas[inicio:inicio + tamanho_lote], un_origem, turno, tipo_veiculo, resultado)
+    if datas:
+        invalidar_kpis(*datas)
+    return resultado
+
+
+# =================== REMESSAS DA TELA (JOB) ===================
+
+def guardar_remessa(arquivos):
+    """
+    Grava os uploads numa pasta nova em IMPORTACAO_NFE_DIR, em blocos, e
+    devolve (pasta, [[nome original, caminho], ...]) para os parâmetros
+    do job. A pasta precisa ser visível para o worker de jobs.
+    """
+    os.makedirs(settings.IMPORTACAO_NFE_DIR, exist_ok=True)
+    pasta = tempfile.mkdtemp(prefix="remessa-", dir=settings.IMPORTACAO_NFE_DIR)
+    itens = []
+    for indice, arquivo in enumerate(arquivos):
+        caminho = os.path.join(pasta, f"{indice:05d}")
+        with open(caminho, "wb") as destino:
+            for bloco in arquivo.chunks():
+                destino.write(bloco)
+        itens.append([arquivo.name, caminho])
+    return pasta, itens
+
+
+def ler_remessa(itens):
+    """
+    (nome, bytes) dos arquivos guardados por guardar_remessa, um por vez
+    """
+    for nome, caminho in itens:
+        with open(caminho, "rb") as origem:
+            yield nome, origem.read()
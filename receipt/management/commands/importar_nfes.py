@@ -0,0 +1,70 @@
+import os
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from receipt.importacao import TAMANHO_LOTE, importar_nfes
+from receipt.models import NotaFiscal
+from receipt.services import buscar_unidade
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa XML de NF-e (arquivos, pastas ou .zip) como NotaFiscal. "
+        "Notas já lançadas são ignoradas; termina com erro se algum arquivo falhar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("caminhos", nargs="+", help="Arquivos .xml / .zip ou pastas com eles.")
+        parser.add_argument("--un", required=True, help="UN de origem (ex.: UN10).")
+        parser.add_argument("--turno", required=True, type=int, choices=[t for t, _ in NotaFiscal.TURNO_CHOICES])
+        parser.add_argument("--tipo-veiculo", required=True, help="Tipo de veículo da remessa.")
+        parser.add_argument(
+            "--processos", type=int, default=None,
+            help="Processos para ler os XML (padrão: um por CPU; 1 desliga o pool).",
+        )
+        parser.add_argument("--lote", type=int, default=TAMANHO_LOTE, help="Notas gravadas por vez.")
+
+    def _arquivos(self, caminhos):
+        for caminho in map(Path, caminhos):
+            if caminho.is_dir():
+                encontrados = sorted(
+                    item for item in caminho.rglob("*")
+                    if item.is_file() and item.suffix.lower() in (".xml", ".zip")
+                )
+            elif caminho.is_file():
+                encontrados = [caminho]
+            else:
+                raise CommandError(f"Caminho não encontrado: {caminho}")
+            for arquivo in encontrados:
+                yield str(arquivo), arquivo.read_bytes()
+
+    def handle(self, *args, **options):
+        unidade = buscar_unidade(options["un"])
+        if unidade is None:
+            raise CommandError(f"UN desconhecida ou inativa: {options['un']}")
+
+        inicio = time.monotonic()
+        resultado = importar_nfes(
+            self._arquivos(options["caminhos"]),
+            un_origem=unidade,
+            turno=options["turno"],
+            tipo_veiculo=options["tipo_veiculo"],
+            processos=options["processos"] or os.cpu_count() or 1,
+            tamanho_lote=options["lote"],
+        )
+        duracao = time.monotonic() - inicio
+
+        for arquivo, erro in resultado.erros:
+            self.stderr.write(f"{arquivo}: {erro}")
+        if options["verbosity"] > 1:
+            for arquivo, nf in resultado.existentes:
+                self.stdout.write(f"{arquivo}: nota {nf} já lançada")
+
+        self.stdout.write(
+            f"{len(resultado.importadas)} importada(s), {len(resultado.existentes)} já lançada(s), "
+            f"{len(resultado.erros)} com erro em {duracao:.1f}s."
+        )
+        if resultado.erros:
+            raise CommandError(f"{len(resultado.erros)} arquivo(s) com erro.")
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from receipt.models import UnidadeNegocio
+from receipt.services import divergencias_do_resumo, reconstruir_resumo
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstrói (backfill) ou verifica o resumo diário de notas "
+        "(ResumoDiarioNotas) a partir de NotaFiscal."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--desde", help="Data inicial (AAAA-MM-DD).")
+        parser.add_argument("--ate", help="Data final (AAAA-MM-DD).")
+        parser.add_argument(
+            "--verificar", action="store_true",
+            help="Apenas compara o resumo com as notas; termina com erro se divergir.",
+        )
+
+    def handle(self, *args, **options):
+        datas = {}
+        for opcao in ("desde", "ate"):
+            if options[opcao]:
+                datas[opcao] = parse_date(options[opcao])
+                if datas[opcao] is None:
+                    raise CommandError(f"Data inválida em --{opcao}: {options[opcao]}")
+
+        if options["verificar"]:
+            divergencias = divergencias_do_resumo(**datas)
+            codigos = dict(UnidadeNegocio.objects.values_list("pk", "codigo"))
+            for (data, turno, un_origem), esperado, gravado in divergencias:
+                self.stdout.write(
+                    f"{data} turno {turno} UN {codigos.get(un_origem, un_origem)}: "
+                    f"notas {esperado or '—'} / resumo {gravado or '—'}"
+                )
+            if divergencias:
+                raise CommandError(
+                    f"{len(divergencias)} linha(s) divergente(s). "
+                    "Rode sem --verificar para reconstruir o período."
+                )
+            self.stdout.write(self.style.SUCCESS("Resumo confere com as notas."))
+            return
+
+        linhas = reconstruir_resumo(**datas)
+        self.stdout.write(self.style.SUCCESS(f"Resumo reconstruído: {linhas} linha(s)."))
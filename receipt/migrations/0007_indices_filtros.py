@@ -0,0 +1,17 @@
+# Generated by Django 5.2.3 on 2026-10-18 10:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('receipt', '0006_alter_notafiscal_data'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notafiscal',
+            index=models.Index(fields=['data', 'un_origem', 'turno'], name='nf_data_un_turno_idx'),
+        ),
+    ]
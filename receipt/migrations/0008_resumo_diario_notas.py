@@ -0,0 +1,43 @@
+# Generated by Django 5.2.3 on 2026-10-18 11:03
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def preencher_resumo(apps, schema_editor):
+    NotaFiscal = apps.get_model("receipt", "NotaFiscal")
+    ResumoDiarioNotas = apps.get_model("receipt", "ResumoDiarioNotas")
+    linhas = (
+        NotaFiscal.objects.values("data", "turno", "un_origem")
+        .annotate(notas=Count("pk"), pallets=Sum("qnt_pallet"), peso=Sum("peso_nota"))
+        .order_by()
+    )
+    ResumoDiarioNotas.objects.bulk_create(
+        [ResumoDiarioNotas(**linha) for linha in linhas], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('receipt', '0007_indices_filtros'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumoDiarioNotas',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField(verbose_name='Data')),
+                ('turno', models.IntegerField(choices=[(1, 'Turno 1'), (2, 'Turno 2'), (3, 'Turno 3')], verbose_name='Turno')),
+                ('un_origem', models.CharField(max_length=4, verbose_name='UN Origem')),
+                ('notas', models.PositiveIntegerField(default=0, verbose_name='Notas')),
+                ('pallets', models.PositiveIntegerField(default=0, verbose_name='Pallets')),
+                ('peso', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Peso (kg)')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('data', 'turno', 'un_origem'), name='resumo_notas_chave_uniq')],
+            },
+        ),
+        migrations.RunPython(preencher_resumo, migrations.RunPython.noop),
+    ]
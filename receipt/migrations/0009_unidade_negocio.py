@@ -0,0 +1,39 @@
+# Generated by Django 5.2.3 on 2026-10-18 14:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('receipt', '0008_resumo_diario_notas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnidadeNegocio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('codigo', models.CharField(max_length=10, unique=True, verbose_name='Código')),
+                ('nome', models.CharField(blank=True, max_length=100, verbose_name='Nome')),
+                ('ativa', models.BooleanField(default=True, verbose_name='Ativa')),
+            ],
+            options={
+                'verbose_name': 'Unidade de Negócio',
+                'verbose_name_plural': 'Unidades de Negócio',
+                'ordering': ['codigo'],
+            },
+        ),
+        # Coluna provisória: o texto antigo só sai depois da conversão (0010)
+        migrations.AddField(
+            model_name='notafiscal',
+            name='unidade',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='receipt.unidadenegocio'),
+        ),
+        migrations.AddField(
+            model_name='resumodiarionotas',
+            name='unidade',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='receipt.unidadenegocio'),
+        ),
+    ]
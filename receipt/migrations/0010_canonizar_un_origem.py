@@ -0,0 +1,82 @@
+import re
+
+from django.db import migrations
+
+
+# Cópia congelada de receipt.services.canonizar_un (a migração não pode
+# depender do código atual)
+def canonizar(valor):
+    codigo = re.sub(r"[^0-9A-Z]", "", (valor or "").upper())
+    if not codigo:
+        return "OUTRO"
+    if codigo.isdigit():
+        return f"UN{codigo}"
+    return codigo
+
+
+UNIDADES_INICIAIS = ["UN10", "UN20", "UN40", "UN50", "CD09"]
+
+
+def converter_un_origem(apps, schema_editor):
+    """
+    Cria as unidades (as conhecidas ativas; as que só aparecem no
+    histórico, inativas) e aponta cada nota para a sua
+    """
+    UnidadeNegocio = apps.get_model("receipt", "UnidadeNegocio")
+    NotaFiscal = apps.get_model("receipt", "NotaFiscal")
+    ResumoDiarioNotas = apps.get_model("receipt", "ResumoDiarioNotas")
+
+    existentes = NotaFiscal.objects.values_list("un_origem", flat=True).distinct().order_by()
+    por_valor = {valor: canonizar(valor) for valor in existentes}
+
+    unidades = {codigo: True for codigo in UNIDADES_INICIAIS}
+    for codigo in por_valor.values():
+        unidades.setdefault(codigo, False)
+    UnidadeNegocio.objects.bulk_create(
+        [UnidadeNegocio(codigo=codigo, ativa=ativa) for codigo, ativa in unidades.items()]
+    )
+    ids = dict(UnidadeNegocio.objects.values_list("codigo", "pk"))
+
+    for valor, codigo in por_valor.items():
+        NotaFiscal.objects.filter(un_origem=valor).update(unidade_id=ids[codigo])
+
+    # "un10" e "UN10" viram a mesma linha: o resumo é refeito na 0011
+    ResumoDiarioNotas.objects.all().delete()
+
+
+def descanonizar(codigo):
+    """
+    Texto de até 4 caracteres (a coluna antiga) que canonizar leva de
+    volta ao mesmo código. A grafia original ("un 10", "Un10") não foi
+    guardada; volta a forma canônica. Os códigos que não cabem em 4
+    caracteres têm forma curta equivalente: OUTRO → "" e UN + 3 ou 4
+    dígitos → só os dígitos ("UN100" → "100"). Só uma unidade cadastrada
+    depois da migração com código de letras maior que 4 (ex.: "DEPOSITO")
+    é truncada e perde a identidade.
+    """
+    if codigo == "OUTRO":
+        return ""
+    if len(codigo) > 4 and codigo.startswith("UN") and codigo[2:].isdigit() and len(codigo) <= 6:
+        return codigo[2:]
+    return codigo[:4]
+
+
+def reverter_un_origem(apps, schema_editor):
+    NotaFiscal = apps.get_model("receipt", "NotaFiscal")
+    UnidadeNegocio = apps.get_model("receipt", "UnidadeNegocio")
+    for pk, codigo in UnidadeNegocio.objects.values_list("pk", "codigo"):
+        NotaFiscal.objects.filter(unidade_id=pk).update(un_origem=descanonizar(codigo))
+    apps.get_model("receipt", "ResumoDiarioNotas").objects.all().delete()
+    NotaFiscal.objects.update(unidade=None)
+    UnidadeNegocio.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('receipt', '0009_unidade_negocio'),
+    ]
+
+    operations = [
+        migrations.RunPython(converter_un_origem, reverter_un_origem),
+    ]
@@ -0,0 +1,93 @@
+# Generated by Django 5.2.3 on 2026-10-18 14:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def preencher_resumo(apps, schema_editor):
+    NotaFiscal = apps.get_model("receipt", "NotaFiscal")
+    ResumoDiarioNotas = apps.get_model("receipt", "ResumoDiarioNotas")
+    ResumoDiarioNotas.objects.all().delete()
+    linhas = (
+        NotaFiscal.objects.values("data", "turno", "un_origem")
+        .annotate(notas=Count("pk"), pallets=Sum("qnt_pallet"), peso=Sum("peso_nota"))
+        .order_by()
+    )
+    ResumoDiarioNotas.objects.bulk_create(
+        [
+            ResumoDiarioNotas(
+                data=linha["data"], turno=linha["turno"], un_origem_id=linha["un_origem"],
+                notas=linha["notas"], pallets=linha["pallets"], peso=linha["peso"],
+            )
+            for linha in linhas
+        ],
+        batch_size=1000,
+    )
+
+
+def esvaziar_resumo(apps, schema_editor):
+    # Na volta o resumo é refeito a partir do texto antigo
+    apps.get_model("receipt", "ResumoDiarioNotas").objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('receipt', '0010_canonizar_un_origem'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, esvaziar_resumo),
+        migrations.RemoveIndex(
+            model_name='notafiscal',
+            name='nf_data_un_turno_idx',
+        ),
+        migrations.RemoveConstraint(
+            model_name='resumodiarionotas',
+            name='resumo_notas_chave_uniq',
+        ),
+        # Default só para a volta da migração recriar a coluna de texto
+        migrations.AlterField(
+            model_name='notafiscal',
+            name='un_origem',
+            field=models.CharField(default='', max_length=4, verbose_name='UN Origem'),
+        ),
+        migrations.RemoveField(
+            model_name='notafiscal',
+            name='un_origem',
+        ),
+        migrations.RemoveField(
+            model_name='resumodiarionotas',
+            name='un_origem',
+        ),
+        migrations.RenameField(
+            model_name='notafiscal',
+            old_name='unidade',
+            new_name='un_origem',
+        ),
+        migrations.RenameField(
+            model_name='resumodiarionotas',
+            old_name='unidade',
+            new_name='un_origem',
+        ),
+        migrations.AlterField(
+            model_name='notafiscal',
+            name='un_origem',
+            field=models.ForeignKey(limit_choices_to={'ativa': True}, on_delete=django.db.models.deletion.PROTECT, related_name='notas', to='receipt.unidadenegocio', verbose_name='UN Origem'),
+        ),
+        migrations.AlterField(
+            model_name='resumodiarionotas',
+            name='un_origem',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='receipt.unidadenegocio', verbose_name='UN Origem'),
+        ),
+        migrations.AddIndex(
+            model_name='notafiscal',
+            index=models.Index(fields=['data', 'un_origem', 'turno'], name='nf_data_un_turno_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='resumodiarionotas',
+            constraint=models.UniqueConstraint(fields=('data', 'turno', 'un_origem'), name='resumo_notas_chave_uniq'),
+        ),
+        migrations.RunPython(preencher_resumo, esvaziar_resumo),
+    ]
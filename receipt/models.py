@@ -1,6 +1,25 @@
 from django.db import models
 from django.utils import timezone
 
+class UnidadeNegocio(models.Model):
+    """
+    UN de origem das notas (UN10, UN20, CD09...). O código é sempre o
+    canônico: maiúsculo, sem espaços, "UN" + número para as unidades.
+    """
+
+    codigo = models.CharField(max_length=10, unique=True, verbose_name="Código")
+    nome = models.CharField(max_length=100, blank=True, verbose_name="Nome")
+    ativa = models.BooleanField(default=True, verbose_name="Ativa")
+
+    class Meta:
+        ordering = ["codigo"]
+        verbose_name = "Unidade de Negócio"
+        verbose_name_plural = "Unidades de Negócio"
+
+    def __str__(self):
+        return self.codigo
+
+
 class NotaFiscal(models.Model):
     TURNO_CHOICES = [
         (1, "Turno 1"),
@@ -11,11 +30,22 @@ class NotaFiscal(models.Model):
     data = models.DateField(default=timezone.localdate, verbose_name="Data")
     turno = models.IntegerField(choices=TURNO_CHOICES, verbose_name="Turno")
     nf = models.CharField(max_length=10, unique=True, verbose_name="Número da Nota")
-    un_origem = models.CharField(max_length=4, verbose_name="UN Origem")
+    un_origem = models.ForeignKey(
+        UnidadeNegocio,
+        on_delete=models.PROTECT,
+        related_name="notas",
+        limit_choices_to={"ativa": True},
+        verbose_name="UN Origem",
+    )
     qnt_pallet = models.PositiveSmallIntegerField(verbose_name="Quantidade de Pallets")
     tipo_veiculo = models.CharField(max_length=50, verbose_name="Tipo de Veículo")
     peso_nota = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Peso da Nota (kg)")
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["data", "un_origem", "turno"], name="nf_data_un_turno_idx"),
+        ]
+
     def __str__(self):
         return (
             f"Nota {self.nf} - "
@@ -29,3 +59,31 @@ class NotaFiscal(models.Model):
 
 
 
+
+
+class ResumoDiarioNotas(models.Model):
+    """
+    Totais de NotaFiscal por dia / turno / UN, mantidos a cada gravação
+    (receipt.signals). Dashboard e relatórios somam poucas linhas por dia
+    em vez de varrer todas as notas.
+    """
+
+    data = models.DateField(verbose_name="Data")
+    turno = models.IntegerField(choices=NotaFiscal.TURNO_CHOICES, verbose_name="Turno")
+    un_origem = models.ForeignKey(
+        UnidadeNegocio,
+        on_delete=models.PROTECT,
+        related_name="+",
+        verbose_name="UN Origem",
+    )
+    notas = models.PositiveIntegerField(default=0, verbose_name="Notas")
+    pallets = models.PositiveIntegerField(default=0, verbose_name="Pallets")
+    peso = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Peso (kg)")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["data", "turno", "un_origem"], name="resumo_notas_chave_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.data} - Turno {self.turno} - UN {self.un_origem_id}: {self.notas} notas"
@@ -0,0 +1,178 @@
+import re
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+
+from .models import NotaFiscal, ResumoDiarioNotas, UnidadeNegocio
+
+
+# =================== UNIDADES DE NEGÓCIO ===================
+
+def canonizar_un(valor):
+    """
+    Código canônico da UN: maiúsculo, só letras e números, e "UN" na
+    frente quando vier só o número ("un 10", "10" → "UN10")
+    """
+    codigo = re.sub(r"[^0-9A-Z]", "", (valor or "").upper())
+    if not codigo:
+        return "OUTRO"
+    if codigo.isdigit():
+        return f"UN{codigo}"
+    return codigo
+
+
+def buscar_unidade(valor):
+    """
+    UnidadeNegocio ativa para o texto informado, ou None se não existir
+    """
+    return UnidadeNegocio.objects.filter(codigo=canonizar_un(valor), ativa=True).first()
+
+
+# =================== RESUMO DIÁRIO (INCREMENTAL) ===================
+
+def chave_da_nota(nota):
+    return (nota.data, nota.turno, nota.un_origem_id)
+
+
+def aplicar_delta(chave, notas, pallets, peso):
+    """
+    Soma (ou subtrai) na linha do resumo da chave (data, turno, id da UN),
+    criando-a quando ainda não existe. Linhas que chegam a zero notas
+    são removidas.
+    """
+    data, turno, un_origem = chave
+    linha = ResumoDiarioNotas.objects.filter(data=data, turno=turno, un_origem_id=un_origem)
+    incremento = {
+        "notas": F("notas") + notas,
+        "pallets": F("pallets") + pallets,
+        "peso": F("peso") + peso,
+    }
+
+    with transaction.atomic():
+        if linha.update(**incremento):
+            if notas < 0:
+                linha.filter(notas__lte=0).delete()
+            return
+        if notas <= 0:
+            # Resumo já divergente (ver resumo_diario_notas --verificar)
+            return
+        try:
+            with transaction.atomic():
+                ResumoDiarioNotas.objects.create(
+                    data=data, turno=turno, un_origem_id=un_origem,
+                    notas=notas, pallets=pallets, peso=peso,
+                )
+        except IntegrityError:
+            # Outra gravação criou a linha no meio do caminho
+            linha.update(**incremento)
+
+
+def aplicar_notas(notas, sinal=1):
+    """
+    Aplica várias notas de uma vez (bulk_create / delete em massa, que não
+    disparam signals): um delta por chave, não por nota
+    """
+    deltas = defaultdict(lambda: [0, 0, Decimal("0")])
+    for nota in notas:
+        delta = deltas[chave_da_nota(nota)]
+        delta[0] += sinal
+        delta[1] += sinal * nota.qnt_pallet
+        delta[2] += sinal * Decimal(nota.peso_nota)
+    for chave, (quantidade, pallets, peso) in deltas.items():
+        aplicar_delta(chave, quantidade, pallets, peso)
+
+
+def totais_por_un(data=None):
+    """
+    Totais do resumo por UN (um GROUP BY pelo índice da FK), de todas as
+    datas ou só de `data`: código → {"notas", "pallets", "peso"}
+    """
+    resumo = ResumoDiarioNotas.objects.all()
+    if data:
+        resumo = resumo.filter(data=data)
+    linhas = (
+        resumo.values("un_origem__codigo")
+        .annotate(total_notas=Sum("notas"), total_pallets=Sum("pallets"), total_peso=Sum("peso"))
+        .order_by()
+    )
+    return {
+        linha["un_origem__codigo"]: {
+            "notas": linha["total_notas"],
+            "pallets": linha["total_pallets"],
+            "peso": linha["total_peso"],
+        }
+        for linha in linhas
+    }
+
+
+# =================== BACKFILL / VERIFICAÇÃO ===================
+
+def _no_periodo(queryset, desde=None, ate=None):
+    if desde:
+        queryset = queryset.filter(data__gte=desde)
+    if ate:
+        queryset = queryset.filter(data__lte=ate)
+    return queryset
+
+
+def totais_das_notas(desde=None, ate=None):
+    """
+    (data, turno, UN) → (notas, pallets, peso) calculado direto das notas
+    """
+    linhas = (
+        _no_periodo(NotaFiscal.objects.all(), desde, ate)
+        .values("data", "turno", "un_origem_id")
+        .annotate(notas=Count("pk"), pallets=Sum("qnt_pallet"), peso=Sum("peso_nota"))
+        .order_by()
+    )
+    return {
+        (linha["data"], linha["turno"], linha["un_origem_id"]):
+            (linha["notas"], linha["pallets"] or 0, linha["peso"] or Decimal("0"))
+        for linha in linhas
+    }
+
+
+def totais_do_resumo(desde=None, ate=None):
+    linhas = _no_periodo(ResumoDiarioNotas.objects.all(), desde, ate).values_list(
+        "data", "turno", "un_origem_id", "notas", "pallets", "peso",
+    )
+    return {
+        (data, turno, un_origem): (notas, pallets, peso)
+        for data, turno, un_origem, notas, pallets, peso in linhas
+    }
+
+
+def divergencias_do_resumo(desde=None, ate=None):
+    """
+    [(chave, esperado, gravado)] onde o resumo difere das notas
+    """
+    esperado = totais_das_notas(desde, ate)
+    gravado = totais_do_resumo(desde, ate)
+    return [
+        (chave, esperado.get(chave), gravado.get(chave))
+        for chave in sorted(set(esperado) | set(gravado), key=str)
+        if esperado.get(chave) != gravado.get(chave)
+    ]
+
+
+def reconstruir_resumo(desde=None, ate=None, batch_size=1000):
+    """
+    Refaz o resumo do período a partir das notas (um GROUP BY). Retorna
+    quantas linhas de resumo foram gravadas.
+    """
+    totais = totais_das_notas(desde, ate)
+    with transaction.atomic():
+        _no_periodo(ResumoDiarioNotas.objects.all(), desde, ate).delete()
+        ResumoDiarioNotas.objects.bulk_create(
+            [
+                ResumoDiarioNotas(
+                    data=data, turno=turno, un_origem_id=un_origem,
+                    notas=notas, pallets=pallets, peso=peso,
+                )
+                for (data, turno, un_origem), (notas, pallets, peso) in totais.items()
+            ],
+            batch_size=batch_size,
+        )
+    return len(totais)
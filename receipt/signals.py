@@ -0,0 +1,53 @@
+from decimal import Decimal
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import NotaFiscal
+from .services import aplicar_delta, chave_da_nota
+
+
+def _peso(nota):
+    # Aceita float / str vindos de código que grava sem passar por formulário
+    return Decimal(str(nota.peso_nota))
+
+
+@receiver(pre_save, sender=NotaFiscal)
+def guardar_valores_anteriores(sender, instance, raw=False, **kwargs):
+    """
+    Em uma edição, o resumo precisa tirar os valores antigos da nota
+    """
+    instance._resumo_anterior = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    instance._resumo_anterior = (
+        NotaFiscal.objects.filter(pk=instance.pk)
+        .values_list("data", "turno", "un_origem_id", "qnt_pallet", "peso_nota")
+        .first()
+    )
+
+
+@receiver(post_save, sender=NotaFiscal)
+def atualizar_resumo(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    chave = chave_da_nota(instance)
+    anterior = getattr(instance, "_resumo_anterior", None)
+
+    if anterior is None:
+        aplicar_delta(chave, 1, instance.qnt_pallet, _peso(instance))
+        return
+
+    *chave_anterior, pallets, peso = anterior
+    if tuple(chave_anterior) == chave:
+        # Mesma linha do resumo: só a diferença
+        if (pallets, peso) != (instance.qnt_pallet, _peso(instance)):
+            aplicar_delta(chave, 0, instance.qnt_pallet - pallets, _peso(instance) - peso)
+        return
+    aplicar_delta(tuple(chave_anterior), -1, -pallets, -peso)
+    aplicar_delta(chave, 1, instance.qnt_pallet, _peso(instance))
+
+
+@receiver(post_delete, sender=NotaFiscal)
+def remover_do_resumo(sender, instance, **kwargs):
+    aplicar_delta(chave_da_nota(instance), -1, -instance.qnt_pallet, -_peso(instance))
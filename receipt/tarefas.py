@@ -0,0 +1,30 @@
+import shutil
+
+from jobs.services import tarefa
+
+from .importacao import importar_nfes, ler_remessa
+from .models import UnidadeNegocio
+
+
+@tarefa("receipt.importar_nfes")
+def importar_remessa(job, pasta, arquivos, un_origem, turno, tipo_veiculo):
+    """
+    Remessa enviada pela tela de importação: lê os XML neste processo (o
+    pool fica para o comando importar_nfes) e apaga a pasta no fim
+    """
+    job.atualizar_progresso(0, total=len(arquivos), mensagem="Lendo os XML")
+    try:
+        resultado = importar_nfes(
+            ler_remessa(arquivos),
+            un_origem=UnidadeNegocio.objects.get(pk=un_origem),
+            turno=turno,
+            tipo_veiculo=tipo_veiculo,
+        )
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+    job.atualizar_progresso(
+        len(arquivos),
+        mensagem=f"{len(resultado.importadas)} importada(s), {len(resultado.erros)} com erro",
+    )
+    return resultado.como_dict()
@@ -1,3 +1,336 @@
-from django.test import TestCase
+import codecs
+import os
+import tempfile
+import zipfile
+from datetime import date
+from decimal import Decimal
+from importlib import import_module
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.services import executar
+from receipt.importacao import expandir_arquivos, importar_nfes, ler_nfe
+from receipt.models import NotaFiscal, ResumoDiarioNotas, UnidadeNegocio
+from receipt.services import canonizar_un, divergencias_do_resumo
+from receipt.views import DashboardReceiptView
+
+
+def xml_nfe(nf="123", emissao="2026-10-18T08:30:00-03:00", volumes=(("2", "PALLET", "150.50"),),
+            referenciada=None, namespace=True):
+    """
+    NF-e mínima: ide (com NFref opcional), um item e transp/vol
+    """
+    nfref = (
+        f"<NFref><refNF><cUF>35</cUF><nNF>{referenciada}</nNF></refNF></NFref>"
+        if referenciada else ""
+    )
+    vols = "".join(
+        f"<vol><qVol>{quantidade}</qVol><esp>{especie}</esp><pesoB>{peso}</pesoB></vol>"
+        for quantidade, especie, peso in volumes
+    )
+    xmlns = ' xmlns="http://www.portalfiscal.inf.br/nfe"' if namespace else ""
+    return (
+        f'<?xml version="1.0" encoding="UTF-8"?><nfeProc{xmlns}><NFe><infNFe>'
+        f"<ide><cUF>35</cUF><nNF>{nf}</nNF><dhEmi>{emissao}</dhEmi>{nfref}</ide>"
+        f"<det nItem=\"1\"><prod><cProd>1</cProd></prod></det>"
+        f"<transp><modFrete>0</modFrete>{vols}</transp>"
+        f"<infAdic><infCpl>nNF 999</infCpl></infAdic>"
+        f"</infNFe></NFe></nfeProc>"
+    ).encode()
+
+
+class ReversaoUnOrigemTests(SimpleTestCase):
+    """
+    Reverso da 0010: o texto de volta na coluna de 4 caracteres leva ao
+    mesmo código canônico
+    """
+
+    migracao = import_module("receipt.migrations.0010_canonizar_un_origem")
+
+    def test_volta_para_um_texto_equivalente(self):
+        for antigo in ("UN10", "un10", "10", "un 4", "100", "1000", "CD09", "cd9", "", "--", "X"):
+            codigo = canonizar_un(antigo)
+            revertido = self.migracao.descanonizar(codigo)
+            self.assertLessEqual(len(revertido), 4)
+            self.assertEqual(canonizar_un(revertido), codigo, antigo)
+
+    def test_outro_vira_vazio(self):
+        self.assertEqual(self.migracao.descanonizar("OUTRO"), "")
+        self.assertEqual(self.migracao.descanonizar("UN1000"), "1000")
+
+
+class LeituraNfeTests(SimpleTestCase):
+    """
+    ler_nfe: campos tirados do XML e erros por arquivo
+    """
+
+    def test_com_e_sem_namespace(self):
+        for namespace in (True, False):
+            nota = ler_nfe("a.xml", xml_nfe(namespace=namespace))
+            self.assertEqual(nota, {
+                "arquivo": "a.xml", "nf": "123", "data": date(2026, 10, 18),
+                "peso": Decimal("150.50"), "pallets": 2,
+            })
+
+    def test_nnf_da_nota_referenciada_e_ignorado(self):
+        nota = ler_nfe("a.xml", xml_nfe(nf="123", referenciada="999"))
+        self.assertEqual(nota["nf"], "123")
+
+    def test_volumes_sem_pallet_contam_cada_volume(self):
+        nota = ler_nfe("a.xml", xml_nfe(volumes=(("3", "CAIXA", "10"), ("4", "CAIXA", "5.5"))))
+        self.assertEqual((nota["pallets"], nota["peso"]), (7, Decimal("15.50")))
+
+    def test_qvol_invalido(self):
+        nota = ler_nfe("a.xml", xml_nfe(volumes=(("dois", "PALLET", "10"),)))
+        self.assertEqual(nota, {"arquivo": "a.xml", "erro": "Volume ou peso com valor inválido."})
+
+    def test_erros_de_conteudo(self):
+        self.assertIn("nNF", ler_nfe("a.xml", xml_nfe(nf="12A"))["erro"])
+        self.assertIn("dhEmi", ler_nfe("a.xml", xml_nfe(emissao="ontem"))["erro"])
+        self.assertIn("pesoB", ler_nfe("a.xml", xml_nfe(volumes=(("1", "PALLET", "0"),)))["erro"])
+        self.assertIn("XML inválido", ler_nfe("a.xml", b"<nfeProc>")["erro"])
+
+    def test_doctype_em_qualquer_ponto_do_prologo(self):
+        dtd = b'<!DOCTYPE nfeProc [<!ENTITY a "b">]>'
+        for prologo in (
+            b"",
+            b'<?xml version="1.0"?>\n',
+            codecs.BOM_UTF8 + b'<?xml version="1.0"?><!-- ' + b"x" * 5000 + b" -->",
+            b" " * 5000,
+            b"<?xml version='1.0'?>\n<!-- a --> <?estilo x?>\n<!-- b -->\n",
+        ):
+            nota = ler_nfe("a.xml", prologo + dtd + xml_nfe().split(b"?>", 1)[1])
+            self.assertEqual(nota["erro"], "XML com DOCTYPE não é aceito.", prologo[:40])
+
+        # Com prólogo longo e sem DOCTYPE a nota é lida
+        comentario = b"<!-- " + b"x" * 5000 + b" -->"
+        self.assertEqual(ler_nfe("a.xml", comentario + xml_nfe().split(b"?>", 1)[1])["nf"], "123")
+
+    def test_utf16_e_recusado(self):
+        conteudo = '<?xml version="1.0" encoding="UTF-16"?><!DOCTYPE x><x/>'.encode("utf-16")
+        self.assertIn("UTF-8", ler_nfe("a.xml", conteudo)["erro"])
+
+
+class ArquivosDaRemessaTests(SimpleTestCase):
+    """
+    expandir_arquivos: .zip aberto em memória, com leitura limitada
+    """
+
+    def zip(self, **itens):
+        buffer = BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as pacote:
+            for nome, conteudo in itens.items():
+                pacote.writestr(nome, conteudo)
+        return buffer.getvalue()
+
+    def test_zip_com_item_grande_demais(self):
+        pacote = self.zip(**{"a.xml": xml_nfe(), "b.xml": b"<x>" + b" " * 2000 + b"</x>", "c.txt": b""})
+        with mock.patch("receipt.importacao.MAX_TAMANHO_XML", 1000):
+            itens = list(expandir_arquivos([("remessa.zip", pacote)]))
+
+        self.assertEqual([(nome, erro) for nome, _, erro in itens], [
+            ("remessa.zip/a.xml", None),
+            ("remessa.zip/b.xml", "Arquivo grande demais para uma NF-e."),
+        ])
+
+    def test_zip_invalido_e_extensao_desconhecida(self):
+        itens = list(expandir_arquivos([("a.zip", b"nao e zip"), ("a.pdf", b"")]))
+        self.assertEqual([erro for _, _, erro in itens], [
+            "Zip inválido.", "Formato não suportado (envie .xml ou .zip).",
+        ])
+
+
+class ImportacaoNfeTests(TestCase):
+    """
+    importar_nfes: gravação em lote, repetidas e já lançadas
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.unidade, _ = UnidadeNegocio.objects.get_or_create(codigo="UN10", defaults={"ativa": True})
+
+    def importar(self, arquivos):
+        return importar_nfes(arquivos, un_origem=self.unidade, turno=1, tipo_veiculo="Truck")
+
+    def test_repetida_na_remessa_e_ja_lancada(self):
+        NotaFiscal.objects.create(
+            data=date(2026, 10, 17), turno=1, nf="200", un_origem=self.unidade,
+            qnt_pallet=1, tipo_veiculo="Truck", peso_nota=Decimal("1"),
+        )
+        resultado = self.importar([
+            ("a.xml", xml_nfe(nf="100")),
+            ("b.xml", xml_nfe(nf="100")),
+            ("c.xml", xml_nfe(nf="200")),
+            ("d.xml", xml_nfe(nf="300")),
+        ])
+
+        self.assertEqual(resultado.importadas, [("a.xml", "100"), ("d.xml", "300")])
+        self.assertEqual(resultado.existentes, [("c.xml", "200")])
+        self.assertEqual(resultado.erros, [("b.xml", "Nota 100 repetida na remessa (a.xml).")])
+        nota = NotaFiscal.objects.get(nf="100")
+        self.assertEqual((nota.qnt_pallet, nota.peso_nota, nota.un_origem_id), (2, Decimal("150.50"), self.unidade.pk))
+
+    def test_consultas_nao_crescem_com_as_notas(self):
+        # A primeira remessa do dia ainda cria a linha do resumo diário
+        self.importar([("0.xml", xml_nfe(nf="1"))])
+        consultas = []
+        for inicio, quantidade in ((10, 5), (100, 50)):
+            arquivos = [(f"{nf}.xml", xml_nfe(nf=str(nf))) for nf in range(inicio, inicio + quantidade)]
+            with CaptureQueriesContext(connection) as capturadas:
+                resultado = self.importar(arquivos)
+            self.assertEqual(len(resultado.importadas), quantidade)
+            consultas.append(len(capturadas))
+        self.assertEqual(consultas[0], consultas[1])
+
+
+class ResumoDiarioTests(TestCase):
+    """
+    ResumoDiarioNotas mantido pelos signals (inclusão, edição que muda a
+    chave, exclusão) e o comando de backfill / verificação
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.un10, _ = UnidadeNegocio.objects.get_or_create(codigo="UN10", defaults={"ativa": True})
+        cls.un20, _ = UnidadeNegocio.objects.get_or_create(codigo="UN20", defaults={"ativa": True})
+
+    def nota(self, nf, pallets=2, peso="100.50", **campos):
+        valores = {"data": date(2026, 10, 18), "turno": 1, "un_origem": self.un10}
+        valores.update(campos)
+        return NotaFiscal.objects.create(
+            nf=nf, qnt_pallet=pallets, peso_nota=Decimal(peso), tipo_veiculo="Truck", **valores,
+        )
+
+    def resumo(self):
+        return {
+            (linha.data, linha.turno, linha.un_origem_id): (linha.notas, linha.pallets, linha.peso)
+            for linha in ResumoDiarioNotas.objects.all()
+        }
+
+    def test_inclusao_soma_na_linha_da_chave(self):
+        self.nota("1")
+        self.nota("2", pallets=3, peso="10")
+
+        self.assertEqual(self.resumo(), {
+            (date(2026, 10, 18), 1, self.un10.pk): (2, 5, Decimal("110.50")),
+        })
+        self.assertEqual(divergencias_do_resumo(), [])
+
+    def test_edicao_que_muda_data_turno_e_un(self):
+        nota = self.nota("1")
+        self.nota("2")
+        nota.data, nota.turno, nota.un_origem = date(2026, 10, 19), 2, self.un20
+        nota.qnt_pallet = 4
+        nota.save()
+
+        self.assertEqual(self.resumo(), {
+            (date(2026, 10, 18), 1, self.un10.pk): (1, 2, Decimal("100.50")),
+            (date(2026, 10, 19), 2, self.un20.pk): (1, 4, Decimal("100.50")),
+        })
+        self.assertEqual(divergencias_do_resumo(), [])
+
+    def test_edicao_na_mesma_chave_aplica_so_a_diferenca(self):
+        nota = self.nota("1")
+        nota.peso_nota = Decimal("80")
+        nota.save()
+
+        self.assertEqual(self.resumo(), {(date(2026, 10, 18), 1, self.un10.pk): (1, 2, Decimal("80.00"))})
+
+    def test_exclusao_subtrai_e_remove_a_linha_zerada(self):
+        primeira = self.nota("1")
+        segunda = self.nota("2", un_origem=self.un20)
+        primeira.delete()
+
+        self.assertEqual(self.resumo(), {(date(2026, 10, 18), 1, self.un20.pk): (1, 2, Decimal("100.50"))})
+        segunda.delete()
+        self.assertEqual(self.resumo(), {})
+        self.assertEqual(divergencias_do_resumo(), [])
+
+    def test_comando_verifica_e_reconstroi(self):
+        self.nota("1")
+        self.nota("2", data=date(2026, 10, 19))
+        # Gravações que não passam pelos signals deixam o resumo divergente
+        NotaFiscal.objects.filter(nf="1").update(qnt_pallet=9)
+        ResumoDiarioNotas.objects.filter(data=date(2026, 10, 19)).delete()
+
+        saida = StringIO()
+        with self.assertRaisesMessage(CommandError, "2 linha(s) divergente(s)"):
+            call_command("resumo_diario_notas", verificar=True, stdout=saida)
+        self.assertIn("2026-10-18 turno 1 UN UN10", saida.getvalue())
+
+        call_command("resumo_diario_notas", desde="2026-10-19", stdout=StringIO())
+        self.assertEqual(len(divergencias_do_resumo()), 1)
+
+        saida = StringIO()
+        call_command("resumo_diario_notas", stdout=saida)
+        self.assertIn("Resumo reconstruído: 2 linha(s).", saida.getvalue())
+        call_command("resumo_diario_notas", verificar=True, stdout=saida)
+        self.assertIn("Resumo confere com as notas.", saida.getvalue())
+
+        with self.assertRaisesMessage(CommandError, "Data inválida em --ate"):
+            call_command("resumo_diario_notas", ate="ontem")
+
+
+class DashboardReceiptViewTests(TestCase):
+    """
+    Contexto do painel de recebimento: totais do resumo e data de hoje
+    (django.utils.timezone, no fuso do projeto)
+    """
+
+    def test_contexto(self):
+        un10, _ = UnidadeNegocio.objects.get_or_create(codigo="UN10", defaults={"ativa": True})
+        NotaFiscal.objects.create(
+            data=date(2026, 10, 18), turno=1, nf="1", un_origem=un10,
+            qnt_pallet=3, tipo_veiculo="Truck", peso_nota=Decimal("12.50"),
+        )
+        view = DashboardReceiptView()
+        view.setup(RequestFactory().get("/"))
+
+        contexto = view.get_context_data()
+
+        self.assertEqual(contexto["hoje"], timezone.localdate().strftime("%d/%m/%Y"))
+        self.assertEqual((contexto["notas"], contexto["total"], contexto["total_peso"]), (1, 3, Decimal("12.50")))
+        self.assertEqual((contexto["un10"], contexto["un20"]), (1, 0))
+
+
+class ImportarNotasViewTests(TestCase):
+    """
+    A tela só guarda os arquivos e enfileira o job
+    """
+
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(self.pasta.cleanup)
+        self.unidade, _ = UnidadeNegocio.objects.get_or_create(codigo="UN10", defaults={"ativa": True})
+        self.client.force_login(User.objects.create_user("conferente"))
+
+    def test_enfileira_e_o_job_importa(self):
+        with override_settings(IMPORTACAO_NFE_DIR=self.pasta.name):
+            resposta = self.client.post(reverse("importar_notas"), {
+                "arquivos": [
+                    SimpleUploadedFile("a.xml", xml_nfe(nf="100")),
+                    SimpleUploadedFile("b.xml", xml_nfe(nf="101")),
+                ],
+                "un_origem": self.unidade.pk, "turno": 2, "tipo_veiculo": "Truck",
+            })
+
+        job = Job.objects.get()
+        self.assertRedirects(resposta, reverse("jobs:detalhe", args=[job.pk]), fetch_redirect_response=False)
+        self.assertEqual(job.tipo, "receipt.importar_nfes")
+        self.assertFalse(NotaFiscal.objects.exists())
+
+        self.assertTrue(executar(job))
+        job.refresh_from_db()
+        self.assertEqual(job.resultado["importadas"], 2)
+        self.assertEqual(sorted(NotaFiscal.objects.values_list("nf", "turno")), [("100", 2), ("101", 2)])
+        self.assertFalse(os.path.exists(job.parametros["pasta"]))
@@ -1,10 +1,12 @@
 from django.urls import path
-from .views import ReceiptListView, ReceiptCreateView,  salvo_sucesso_view
+from .views import ImportarNotasView, ReceiptListView, ReceiptCreateView, ReceiptExportView, salvo_sucesso_view
 
 urlpatterns = [
     path("", ReceiptListView.as_view(), name="index"),
     path("notas/", ReceiptListView.as_view(), name="notas_list"),
+    path("notas/exportar/<str:formato>/", ReceiptExportView.as_view(), name="notas_exportar"),
     path("create/", ReceiptCreateView.as_view(), name="create_list"),
+    path("notas/importar/", ImportarNotasView.as_view(), name="importar_notas"),
     path("sucesso/", salvo_sucesso_view, name="salvo_sucesso"),
 ]
 
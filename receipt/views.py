@@ -1,21 +1,29 @@
-from datetime import timezone
+from django.utils import timezone
 from django.db.models import Sum
-from django.views.generic import ListView, CreateView, UpdateView, TemplateView
-from django.shortcuts import render
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.views.generic import ListView, CreateView, UpdateView, TemplateView, FormView
+from django.shortcuts import redirect, render
 from django.urls import reverse_lazy
-from .models import NotaFiscal
+from core.exportacao import ExportacaoMixin
+from core.pagination import KeysetPaginationMixin
+from .forms import ImportacaoNotasForm
+from jobs.services import enfileirar
+from .importacao import guardar_remessa
+from .models import NotaFiscal, ResumoDiarioNotas, UnidadeNegocio
+from .services import canonizar_un, totais_por_un
 
 
 def salvo_sucesso_view(request):
     return render(request, "receipt/sucesso.html")
 
 
-class ReceiptListView(ListView):
+class ReceiptListView(KeysetPaginationMixin, ListView):
     model = NotaFiscal
     ordering = ['-id']
+    keyset_ordering = ('-id',)
     
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().select_related('un_origem')
 
         # Captura filtros do GET
         data = self.request.GET.get('data')
@@ -34,22 +42,61 @@ class ReceiptListView(ListView):
         if turno:
             queryset = queryset.filter(turno=turno)
         if un_origem:
-            queryset = queryset.filter(un_origem=un_origem)
+            queryset = queryset.filter(un_origem__codigo=canonizar_un(un_origem))
 
         return queryset
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['request'] = self.request  # mantém filtros selecionados no template
+        context['unidades'] = UnidadeNegocio.objects.values_list('codigo', flat=True)
         return context
 
 
+class ReceiptExportView(ExportacaoMixin, ReceiptListView):
+    nome_exportacao = "notas_fiscais"
+    ordenacao_exportacao = ('-id',)
+    colunas_exportacao = [
+        ("Data", "data"),
+        ("Turno", "turno"),
+        ("NF", "nf"),
+        ("UN Origem", "un_origem__codigo"),
+        ("Pallets", "qnt_pallet"),
+        ("Tipo de Veículo", "tipo_veiculo"),
+        ("Peso da Nota (kg)", "peso_nota"),
+    ]
+
+
 class ReceiptCreateView(CreateView):
     model = NotaFiscal
     fields = ["turno", "nf", "un_origem", "qnt_pallet", "tipo_veiculo", "peso_nota"]
     success_url = reverse_lazy('salvo_sucesso')
     
     
+class ImportarNotasView(LoginRequiredMixin, FormView):
+    """
+    Upload de XML de NF-e (ou .zip com vários): guarda os arquivos e
+    enfileira o job de importação; o relatório por arquivo sai no
+    resultado do job
+    """
+
+    template_name = "receipt/importar_notas.html"
+    form_class = ImportacaoNotasForm
+
+    def form_valid(self, form):
+        pasta, arquivos = guardar_remessa(form.cleaned_data["arquivos"])
+        job = enfileirar(
+            "receipt.importar_nfes",
+            criado_por=self.request.user,
+            pasta=pasta,
+            arquivos=arquivos,
+            un_origem=form.cleaned_data["un_origem"].pk,
+            turno=form.cleaned_data["turno"],
+            tipo_veiculo=form.cleaned_data["tipo_veiculo"],
+        )
+        return redirect("jobs:detalhe", pk=job.pk)
+
+
 class NotasUpdateView(UpdateView):
 
     model = NotaFiscal
@@ -63,23 +110,18 @@ class DashboardReceiptView(TemplateView):
         context = super().get_context_data(**kwargs)
         
         hoje = timezone.localdate()
-        notas_qs = NotaFiscal.objects.all()
-
-        # Total de notas
-        context['notas'] = notas_qs.count()
-
-        # Total por UN
-        context['un10'] = notas_qs.filter(un_origem="10").count()
-        context['un20'] = notas_qs.filter(un_origem="20").count()
-        context['un40'] = notas_qs.filter(un_origem="40").count()
-
-        # Total de pallets
-        total_pallets = notas_qs.aggregate(total=Sum('qnt_pallet'))['total'] or 0
-        context['total'] = total_pallets
-
-        # Total peso bruto
-        total_peso = notas_qs.aggregate(total=Sum('peso_nota'))['total'] or 0
-        context['total_peso'] = total_peso
+        # Totais pelo resumo diário: uma consulta, sem varrer as notas
+        totais = ResumoDiarioNotas.objects.aggregate(
+            total_notas=Sum("notas"),
+            total=Sum("pallets"),
+            total_peso=Sum("peso"),
+        )
+        context.update({chave: valor or 0 for chave, valor in totais.items()})
+        context['notas'] = context.pop('total_notas')
+
+        por_un = totais_por_un()
+        for codigo in ("UN10", "UN20", "UN40"):
+            context[codigo.lower()] = por_un.get(codigo, {}).get("notas") or 0
 
         # Data de hoje
         context['hoje'] = hoje.strftime("%d/%m/%Y")
@@ -0,0 +1,77 @@
+// Gráficos de tendência do dashboard: uma chamada a /dashboard/serie/
+// devolve todas as séries do intervalo
+document.addEventListener("DOMContentLoaded", () => {
+    const painel = document.getElementById("serie-kpis");
+    if (!painel || typeof Chart === "undefined") return;
+
+    const inicio = document.getElementById("serie-inicio");
+    const fim = document.getElementById("serie-fim");
+    const granularidade = document.getElementById("serie-granularidade");
+    const erro = document.getElementById("serie-erro");
+    const CORES_TURNO = { "1": "#0d6efd", "2": "#ffc107", "3": "#6f42c1" };
+
+    function rotulo(periodo) {
+        const [ano, mes, dia] = periodo.split("-");
+        return granularidade.value === "mes" ? `${mes}/${ano}` : `${dia}/${mes}`;
+    }
+
+    const notas = new Chart(document.getElementById("grafico-notas"), {
+        type: "bar",
+        data: { labels: [], datasets: [] },
+        options: {
+            plugins: { title: { display: true, text: "Notas fiscais por turno" } },
+            scales: { x: { stacked: true }, y: { stacked: true, beginAtZero: true } },
+        },
+    });
+
+    const lecoms = new Chart(document.getElementById("grafico-lecoms"), {
+        type: "line",
+        data: { labels: [], datasets: [] },
+        options: {
+            plugins: { title: { display: true, text: "LECOMs, peso e m³" } },
+            scales: {
+                y: { beginAtZero: true, position: "left" },
+                y1: { beginAtZero: true, position: "right", grid: { drawOnChartArea: false } },
+            },
+        },
+    });
+
+    async function atualizar() {
+        const parametros = new URLSearchParams({
+            inicio: inicio.value,
+            fim: fim.value,
+            granularidade: granularidade.value,
+        });
+        const resposta = await fetch(`${painel.dataset.url}?${parametros}`, {
+            headers: { "Accept": "application/json" },
+        });
+        const serie = await resposta.json();
+
+        erro.classList.toggle("d-none", resposta.ok);
+        if (!resposta.ok) {
+            erro.textContent = serie.erro;
+            return;
+        }
+
+        const rotulos = serie.periodos.map(rotulo);
+
+        notas.data.labels = rotulos;
+        notas.data.datasets = Object.entries(serie.notas.turnos).map(([turno, valores]) => ({
+            label: `Turno ${turno}`,
+            data: valores.notas,
+            backgroundColor: CORES_TURNO[turno],
+        }));
+        notas.update();
+
+        lecoms.data.labels = rotulos;
+        lecoms.data.datasets = [
+            { label: "LECOMs", data: serie.lecoms.lecoms, borderColor: "#198754", yAxisID: "y" },
+            { label: "Peso (kg)", data: serie.lecoms.peso, borderColor: "#dc3545", yAxisID: "y1" },
+            { label: "M³", data: serie.lecoms.m3, borderColor: "#0dcaf0", yAxisID: "y" },
+        ];
+        lecoms.update();
+    }
+
+    [inicio, fim, granularidade].forEach((campo) => campo.addEventListener("change", atualizar));
+    atualizar();
+});
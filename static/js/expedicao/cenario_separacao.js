@@ -0,0 +1,31 @@
+// Seleção de cargas para as ações em lote do cenário de separação
+document.addEventListener("DOMContentLoaded", () => {
+    const cargas = document.querySelectorAll(".lote-carga");
+    const grupos = document.querySelectorAll(".lote-grupo");
+    const botoes = document.querySelectorAll(".lote-acao");
+    const contador = document.getElementById("lote-contador");
+
+    function atualizarSelecao() {
+        const selecionadas = document.querySelectorAll(".lote-carga:checked").length;
+        contador.textContent = selecionadas;
+        botoes.forEach(botao => { botao.disabled = selecionadas === 0; });
+
+        grupos.forEach(grupo => {
+            const doGrupo = document.querySelectorAll(`.lote-carga[data-grupo="${grupo.dataset.grupo}"]`);
+            const marcadas = [...doGrupo].filter(carga => carga.checked).length;
+            grupo.checked = doGrupo.length > 0 && marcadas === doGrupo.length;
+            grupo.indeterminate = marcadas > 0 && marcadas < doGrupo.length;
+        });
+    }
+
+    cargas.forEach(carga => carga.addEventListener("change", atualizarSelecao));
+
+    grupos.forEach(grupo => grupo.addEventListener("change", () => {
+        document
+            .querySelectorAll(`.lote-carga[data-grupo="${grupo.dataset.grupo}"]`)
+            .forEach(carga => { carga.checked = grupo.checked; });
+        atualizarSelecao();
+    }));
+
+    atualizarSelecao();
+});
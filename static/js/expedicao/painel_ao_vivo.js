@@ -0,0 +1,40 @@
+// Painel ao vivo: aplica nos cards as mudanças de status recebidas por SSE
+document.addEventListener("DOMContentLoaded", () => {
+    const painel = document.getElementById("painel-ao-vivo");
+    if (!painel || !window.EventSource) return;
+
+    // Badges renderizados pelo servidor (components/status_badge.html)
+    const badges = {};
+    painel.querySelectorAll("template[data-status]").forEach(modelo => {
+        badges[modelo.dataset.status] = modelo.innerHTML.trim();
+    });
+
+    function destacar(elemento) {
+        const card = elemento.closest(".sgl-subcard, .sgl-card") || elemento;
+        card.classList.add("sgl-atualizado");
+        setTimeout(() => card.classList.remove("sgl-atualizado"), 2000);
+    }
+
+    function trocarBadge(elemento, status) {
+        if (!badges[status] || elemento.dataset.status === status) return;
+        elemento.innerHTML = badges[status];
+        elemento.dataset.status = status;
+        destacar(elemento);
+    }
+
+    const fonte = new EventSource(painel.dataset.url);
+
+    fonte.onmessage = (mensagem) => {
+        const evento = JSON.parse(mensagem.data);
+
+        if (evento.carga) {
+            document.querySelectorAll(`[data-status-carga="${evento.carga}"]`)
+                .forEach(elemento => trocarBadge(elemento, evento.status));
+            document.querySelectorAll(`[data-conferente-carga="${evento.carga}"]`)
+                .forEach(elemento => { elemento.textContent = evento.conferente || "—"; });
+        }
+
+        document.querySelectorAll(`[data-status-controle="${evento.controle}"]`)
+            .forEach(elemento => trocarBadge(elemento, evento.status_controle));
+    };
+});
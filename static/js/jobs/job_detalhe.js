@@ -0,0 +1,36 @@
+// Consulta o progresso do job até ele terminar
+document.addEventListener("DOMContentLoaded", () => {
+    const painel = document.getElementById("job");
+    if (!painel) return;
+
+    const url = painel.dataset.statusUrl;
+    const barra = document.getElementById("job-barra");
+    const INTERVALO = 2000;
+
+    async function atualizar() {
+        const resposta = await fetch(url, { headers: { "Accept": "application/json" } });
+        if (!resposta.ok) return setTimeout(atualizar, INTERVALO * 2);
+        const job = await resposta.json();
+
+        document.getElementById("job-status").textContent = job.status;
+        document.getElementById("job-mensagem").textContent = job.mensagem;
+        document.getElementById("job-contagem").textContent =
+            `${job.progresso_atual} / ${job.progresso_total}`;
+        barra.style.width = `${job.percentual}%`;
+        barra.textContent = `${job.percentual}%`;
+
+        if (job.finalizado) {
+            barra.classList.remove("progress-bar-animated");
+            barra.classList.add(job.status === "Falhou" ? "bg-danger" : "bg-success");
+            if (job.resultado) {
+                const resultado = document.getElementById("job-resultado");
+                resultado.textContent = JSON.stringify(job.resultado, null, 2);
+                resultado.classList.remove("d-none");
+            }
+            return;
+        }
+        setTimeout(atualizar, INTERVALO);
+    }
+
+    atualizar();
+});
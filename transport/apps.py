@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class TransportConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "transport"
+
+    def ready(self):
+        from core.concorrencia import registrar_metricas_de_conflito
+        from core.search import reinstalar_indices_sqlite
+
+        from . import signals  # noqa: F401
+        from .models import Lecom
+
+        registrar_metricas_de_conflito(Lecom)
+        post_migrate.connect(reinstalar_indices_sqlite, sender=self)
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.3 on 2026-10-18 10:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transport', '0013_busca_texto'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='carga',
+            index=models.Index(fields=['lecom', 'seq'], name='carga_lecom_seq_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lecom',
+            index=models.Index(fields=['status', 'data'], name='lecom_status_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lecom',
+            index=models.Index(fields=['data'], name='lecom_data_idx'),
+        ),
+    ]
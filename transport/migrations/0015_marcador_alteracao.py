@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-18 10:45
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transport', '0014_indices_filtros'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarcadorAlteracao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tabela', models.CharField(max_length=63, unique=True)),
+                ('versao', models.PositiveBigIntegerField(default=0)),
+                ('alterado_em', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
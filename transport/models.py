@@ -1,6 +1,7 @@
 from django.db import models
 from decimal import Decimal
 from django.db import models
+from django.utils import timezone
 
 
 class Lecom(models.Model):
@@ -35,6 +36,15 @@ class Lecom(models.Model):
         default='Bloqueado'
     )
 
+    # Controle otimista de concorrência (core.concorrencia)
+    versao = models.PositiveIntegerField(default=1, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "data"], name="lecom_status_data_idx"),
+            models.Index(fields=["data"], name="lecom_data_idx"),
+        ]
+
     def __str__(self):
         return f'{self.lecom} - {self.get_status_display()}'
 
@@ -47,6 +57,11 @@ class Carga(models.Model):
     total_entregas = models.CharField(max_length=2, default="1")
     mod = models.CharField(max_length=10, default="-")
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["lecom", "seq"], name="carga_lecom_seq_idx"),
+        ]
+
 
 class Entrega(models.Model):
     numero = models.CharField(max_length=10)
@@ -58,6 +73,20 @@ class Mod(models.Model):
     carga = models.ForeignKey(Carga, on_delete=models.CASCADE, related_name="mods")
 
 
+class MarcadorAlteracao(models.Model):
+    """
+    Versão por tabela, incrementada a cada escrita. Permite responder
+    um GET condicional (ETag / Last-Modified) sem rodar a consulta.
+    """
+
+    tabela = models.CharField(max_length=63, unique=True)
+    versao = models.PositiveBigIntegerField(default=0)
+    alterado_em = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.tabela} v{self.versao}"
+
+
 class Veiculo(models.Model):
     TIPO_VEICULO_CHOICES = [
         ("Utilitario", "Utilitário"),
@@ -0,0 +1,259 @@
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Carga, Entrega, MarcadorAlteracao
+
+
+def _valor(lista, i, padrao):
+    """
+    Valor da posição i de uma lista do POST (carga[], seq[]...), ou o padrão
+    """
+    if i < len(lista) and lista[i]:
+        return lista[i]
+    return padrao
+
+
+def registrar_alteracao(*modelos):
+    """
+    Incrementa o marcador de alteração das tabelas dos modelos. Chamado
+    pelos signals e pelas escritas em bulk (que não disparam signals).
+    Dentro de uma transação, o marcador é gravado junto com os dados.
+    """
+    tabelas = {modelo._meta.db_table for modelo in modelos}
+    agora = timezone.now()
+    atualizadas = MarcadorAlteracao.objects.filter(tabela__in=tabelas).update(
+        versao=F("versao") + 1, alterado_em=agora,
+    )
+    if atualizadas < len(tabelas):
+        for tabela in tabelas:
+            MarcadorAlteracao.objects.get_or_create(
+                tabela=tabela, defaults={"versao": 1, "alterado_em": agora},
+            )
+
+
+def estado_das_tabelas(*modelos):
+    """
+    (versões, última alteração) das tabelas dos modelos, numa consulta
+    """
+    tabelas = [modelo._meta.db_table for modelo in modelos]
+    marcadores = {
+        marcador.tabela: marcador
+        for marcador in MarcadorAlteracao.objects.filter(tabela__in=tabelas)
+    }
+    versoes = [
+        marcadores[tabela].versao if tabela in marcadores else 0
+        for tabela in tabelas
+    ]
+    alterado_em = max(
+        (marcador.alterado_em for marcador in marcadores.values()), default=None
+    )
+    return versoes, alterado_em
+
+
+def montar_cargas(cargas_list, seq_list, total_entregas_list, mod_list,
+                  entrega_numeros, entrega_carga_ref):
+    """
+    Valida o payload de cargas/entregas em memória, sem tocar no banco.
+
+    Retorna (cargas, entregas, erros): cargas são instâncias de Carga ainda
+    sem lecom, entregas são pares (índice da carga, número).
+    """
+    erros = []
+    cargas = []
+    vistos = set()
+
+    for i, carga_num in enumerate(cargas_list):
+        if carga_num in vistos:
+            erros.append(f"A carga {carga_num} já existe para este LECOM.")
+            continue
+        vistos.add(carga_num)
+
+        try:
+            seq = int(_valor(seq_list, i, i + 1))
+        except ValueError:
+            erros.append(f"Sequência inválida para a carga {carga_num}.")
+            continue
+
+        cargas.append(Carga(
+            carga=carga_num,
+            seq=seq,
+            total_entregas=_valor(total_entregas_list, i, "1"),
+            mod=_valor(mod_list, i, "-"),
+        ))
+
+    entregas = []
+    for i, numero in enumerate(entrega_numeros):
+        if not numero.strip():
+            continue
+        try:
+            carga_index = int(entrega_carga_ref[i])
+        except (IndexError, ValueError):
+            erros.append(f"Entrega {numero} sem carga de referência.")
+            continue
+        if not 0 <= carga_index < len(cargas):
+            erros.append(f"Entrega {numero} aponta para uma carga inexistente.")
+            continue
+        entregas.append((carga_index, numero))
+
+    return cargas, entregas, erros
+
+
+def criar_cargas(lecom, cargas, entregas):
+    """
+    Grava as cargas e entregas já validadas com dois bulk_create
+    """
+    for carga in cargas:
+        carga.lecom = lecom
+    Carga.objects.bulk_create(cargas)
+
+    # Bancos sem RETURNING no insert em bulk não preenchem as pks
+    if cargas and cargas[0].pk is None and not connection.features.can_return_rows_from_bulk_insert:
+        cargas[:] = list(lecom.cargas.order_by("id"))
+
+    Entrega.objects.bulk_create([
+        Entrega(numero=numero, carga=cargas[carga_index])
+        for carga_index, numero in entregas
+    ])
+    registrar_alteracao(Carga)
+    return cargas
+
+
+# Campos da Carga editáveis pelo formulário de transporte
+CAMPOS_CARGA = ("carga", "seq", "total_entregas", "mod")
+
+
+class DiffCargas:
+    """
+    Resultado da comparação entre o formulário e as cargas gravadas
+    """
+
+    def __init__(self):
+        self.cargas = []
+        self.criar = []
+        self.atualizar = []
+        self.remover = []
+        self.campos_alterados = set()
+
+    @property
+    def vazio(self):
+        return not (self.criar or self.atualizar or self.remover)
+
+
+def diff_cargas(existentes, carga_ids, carga_nomes, seqs, total_entregas_list, mods):
+    """
+    Descobre em memória quais cargas foram incluídas, alteradas ou
+    removidas no formulário. Linhas sem carga_id[] (formulário antigo)
+    casam com as cargas existentes pela posição e só incluem ou alteram:
+    sem os ids não dá para saber se uma carga a mais foi removida ou se o
+    formulário estava desatualizado, e a remoção apagaria em cascata a
+    separação e as entregas.
+    """
+    diff = DiffCargas()
+    por_id = {carga.pk: carga for carga in existentes}
+    restantes = dict(por_id)
+
+    for i, carga_nome in enumerate(carga_nomes):
+        valores = {
+            "carga": carga_nome,
+            "seq": int(_valor(seqs, i, i + 1)),
+            "total_entregas": _valor(total_entregas_list, i, "1"),
+            "mod": _valor(mods, i, "-"),
+        }
+
+        carga = None
+        if carga_ids:
+            carga_id = _valor(carga_ids, i, "")
+            if carga_id.isdigit():
+                carga = restantes.pop(int(carga_id), None)
+        elif i < len(existentes):
+            carga = restantes.pop(existentes[i].pk, None)
+
+        if carga is None:
+            carga = Carga(**valores)
+            diff.criar.append(carga)
+        else:
+            alterados = [
+                campo for campo, valor in valores.items()
+                if getattr(carga, campo) != valor
+            ]
+            if alterados:
+                for campo in alterados:
+                    setattr(carga, campo, valores[campo])
+                diff.atualizar.append(carga)
+                diff.campos_alterados.update(alterados)
+
+        diff.cargas.append(carga)
+
+    if carga_ids:
+        diff.remover = list(restantes.values())
+    else:
+        # Formulário antigo: as cargas que não vieram continuam como estão
+        diff.cargas.extend(carga for carga in existentes if carga.pk in restantes)
+    return diff
+
+
+def aplicar_diff_cargas(lecom, diff):
+    """
+    Grava o diff com um delete, um bulk_update (só dos campos alterados)
+    e um bulk_create. Linhas sem alteração não geram escrita.
+    """
+    if diff.remover:
+        Carga.objects.filter(pk__in=[carga.pk for carga in diff.remover]).delete()
+
+    if diff.atualizar:
+        Carga.objects.bulk_update(
+            diff.atualizar,
+            [campo for campo in CAMPOS_CARGA if campo in diff.campos_alterados],
+        )
+
+    if diff.criar:
+        for carga in diff.criar:
+            carga.lecom = lecom
+        Carga.objects.bulk_create(diff.criar)
+
+    if not diff.vazio:
+        registrar_alteracao(Carga)
+
+    return diff
+
+
+def cargas_do_formulario(carga_ids, carga_nomes, seqs, total_entregas_list, mods):
+    """
+    Linhas de carga enviadas no POST, no formato que o template de
+    edição monta (para devolver o formulário sem perder o que foi digitado)
+    """
+    return [
+        {
+            "id": _valor(carga_ids, i, ""),
+            "carga": carga_nome,
+            "seq": _valor(seqs, i, str(i + 1)),
+            "total_entregas": _valor(total_entregas_list, i, "1"),
+            "mod": _valor(mods, i, "-"),
+        }
+        for i, carga_nome in enumerate(carga_nomes)
+    ]
+
+
+def _resumo_carga(carga):
+    return f"{carga['carga']} · seq {carga['seq']} · {carga['total_entregas']} entrega(s) · {carga['mod']}"
+
+
+def diferencas_de_cargas(enviadas, atuais):
+    """
+    (carga, seu valor, valor atual) das cargas que divergem entre o
+    formulário enviado e o banco: alteradas, incluídas ou removidas por
+    outro usuário. Cargas novas do formulário (sem id) não entram.
+    """
+    por_id = {carga["id"]: carga for carga in enviadas if carga["id"]}
+    diferencas = []
+    for atual in atuais:
+        gravada = {campo: str(getattr(atual, campo)) for campo in CAMPOS_CARGA}
+        enviada = por_id.pop(str(atual.pk), None)
+        if enviada is None:
+            diferencas.append((atual.carga, None, _resumo_carga(gravada)))
+        elif any(str(enviada[campo]) != gravada[campo] for campo in CAMPOS_CARGA):
+            diferencas.append((atual.carga, _resumo_carga(enviada), _resumo_carga(gravada)))
+    for enviada in por_id.values():
+        diferencas.append((enviada["carga"], _resumo_carga(enviada), None))
+    return diferencas
@@ -0,0 +1,20 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Carga, Lecom, Veiculo
+from .services import registrar_alteracao
+
+
+@receiver(post_save, sender=Lecom)
+@receiver(post_save, sender=Carga)
+@receiver(post_save, sender=Veiculo)
+@receiver(post_delete, sender=Lecom)
+@receiver(post_delete, sender=Carga)
+@receiver(post_delete, sender=Veiculo)
+def marcar_alteracao(sender, **kwargs):
+    """
+    Mantém os marcadores de alteração (ETag da API) em dia a cada escrita
+    """
+    if kwargs.get("raw"):
+        return
+    registrar_alteracao(sender)
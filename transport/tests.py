@@ -1,3 +1,87 @@
+from datetime import date
+
 from django.test import TestCase
+from django.urls import reverse
+
+from transport.models import Carga, Lecom
+from transport.services import aplicar_diff_cargas, diferencas_de_cargas, diff_cargas
+
+
+class DiffCargasTests(TestCase):
+
+    def setUp(self):
+        self.lecom = Lecom.objects.create(lecom="1", destino="Destino", uf="SP", data=date(2026, 10, 18))
+        self.cargas = Carga.objects.bulk_create([
+            Carga(lecom=self.lecom, carga=f"C{seq}", seq=seq) for seq in range(1, 4)
+        ])
+        self.existentes = list(self.lecom.cargas.order_by("seq"))
+
+    def test_formulario_com_ids_remove_as_cargas_que_nao_vieram(self):
+        primeira, segunda, _ = self.existentes
+        diff = diff_cargas(
+            self.existentes, [str(primeira.pk), str(segunda.pk)],
+            ["C1", "C2"], ["1", "2"], ["1", "1"], ["-", "-"],
+        )
+        aplicar_diff_cargas(self.lecom, diff)
+
+        self.assertEqual(list(self.lecom.cargas.values_list("carga", flat=True)), ["C1", "C2"])
+
+    def test_formulario_antigo_por_posicao_nao_remove_cargas(self):
+        diff = diff_cargas(self.existentes, [], ["C1", "C2-novo"], ["1", "2"], ["1", "1"], ["-", "-"])
+        aplicar_diff_cargas(self.lecom, diff)
+
+        self.assertEqual(diff.remover, [])
+        self.assertEqual(
+            list(self.lecom.cargas.order_by("seq").values_list("carga", flat=True)),
+            ["C1", "C2-novo", "C3"],
+        )
+        # A sincronização recebe todas as cargas, inclusive as que não vieram
+        self.assertEqual([carga.carga for carga in diff.cargas], ["C1", "C2-novo", "C3"])
+
+
+class EditarTransporteConflitoTests(TestCase):
+    """
+    POST com versão antiga: nada gravado, formulário volta com o que foi
+    enviado e as cargas do outro usuário no quadro de diferenças
+    """
+
+    def setUp(self):
+        self.lecom = Lecom.objects.create(lecom="1", destino="Destino", uf="SP", data=date(2026, 10, 18))
+        self.carga = Carga.objects.create(lecom=self.lecom, carga="C1", seq=1)
+        # Outro planejador grava antes: versão 2 e carga renomeada
+        Lecom.objects.filter(pk=self.lecom.pk).update(versao=2)
+        Carga.objects.filter(pk=self.carga.pk).update(carga="C1-outro")
+
+    def test_versao_antiga_devolve_as_cargas_enviadas(self):
+        resposta = self.client.post(reverse("transport:editar_transporte", args=[self.lecom.pk]), {
+            "versao": "1", "lecom": "1", "destino": "Novo destino", "uf": "SP",
+            "data": "2026-10-18", "status": "LIBERADO", "peso": "10", "m3": "1",
+            "carga_id[]": [str(self.carga.pk), ""], "carga[]": ["C1-meu", "999"],
+            "seq[]": ["1", "2"], "total_entregas[]": ["1", "3"], "mod[]": ["-", "X"],
+        })
+
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(
+            [carga["carga"] for carga in resposta.context["cargas"]], ["C1-meu", "999"]
+        )
+        self.assertEqual(resposta.context["lecom"].versao, 2)
+        self.assertEqual(resposta.context["diferencas_cargas"], [
+            ("C1-outro", "C1-meu · seq 1 · 1 entrega(s) · -", "C1-outro · seq 1 · 1 entrega(s) · -"),
+        ])
+        self.assertContains(resposta, 'carga: "999"')
+
+        # Nada foi gravado
+        self.lecom.refresh_from_db()
+        self.assertEqual(self.lecom.destino, "Destino")
+        self.assertEqual(list(self.lecom.cargas.values_list("carga", flat=True)), ["C1-outro"])
+
+    def test_cargas_removidas_e_incluidas_pelo_outro_usuario(self):
+        nova = Carga.objects.create(lecom=self.lecom, carga="C2", seq=2)
+        # Lida no GET e apagada pelo outro usuário antes do POST
+        enviadas = [{"id": "99999", "carga": "C9", "seq": "9", "total_entregas": "1", "mod": "-"}]
 
-# Create your tests here.
+        diferencas = diferencas_de_cargas(enviadas, [nova])
+        self.assertEqual(diferencas, [
+            ("C2", None, "C2 · seq 2 · 1 entrega(s) · -"),
+            ("C9", "C9 · seq 9 · 1 entrega(s) · -", None),
+        ])
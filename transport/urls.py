@@ -1,10 +1,13 @@
 from django.urls import path
-from .views import CriarTransporteView, CenarioTransporteView, EditarTransporteView
+from .views import (CriarTransporteView, CenarioTransporteView,
+                    EditarTransporteView, ExportarTransporteView, LecomApiView)
 
 app_name = "transport"
 
 urlpatterns = [
     path("criar/", CriarTransporteView.as_view(), name="criar_transporte"),
     path("editar/<int:pk>/", EditarTransporteView.as_view(), name="editar_transporte"),
-    path("cenario/", CenarioTransporteView.as_view(), name="cenario_transporte"),    
+    path("cenario/", CenarioTransporteView.as_view(), name="cenario_transporte"),
+    path("cenario/exportar/<str:formato>/", ExportarTransporteView.as_view(), name="exportar_transporte"),
+    path("api/lecoms/", LecomApiView.as_view(), name="api_lecoms"),
 ]
@@ -1,13 +1,29 @@
+import hashlib
+
 from django.shortcuts import get_object_or_404, render, redirect
 from django.urls import reverse_lazy
 from django.views import View
+from django.views.decorators.http import condition
 from django.views.generic import ListView
 from django.contrib import messages
 from decimal import Decimal, InvalidOperation
 from django.db import transaction
+from django.http import Http404, JsonResponse
 from django.utils.dateparse import parse_date
-from .models import Lecom, Carga, Entrega, Veiculo
-from expedicao.services import sincronizar_expedicao
+from django.utils.decorators import method_decorator
+from .models import Carga, Lecom, Veiculo
+from .services import (
+    aplicar_diff_cargas, cargas_do_formulario, criar_cargas, diferencas_de_cargas,
+    diff_cargas, estado_das_tabelas, montar_cargas, registrar_alteracao,
+)
+from core.concorrencia import ConflitoDeVersao, gravar_com_versao
+from core.exportacao import ExportacaoMixin
+from core.pagination import KeysetPaginationMixin, paginar_keyset
+from core.search import filtrar_texto
+from expedicao.models import ControleSeparacao
+from expedicao.services import (
+    agendar_sincronizacao, agrupar_cenario, prefetch_cargas_transporte,
+)
 
 
 # Função auxiliar para Decimal
@@ -77,6 +93,16 @@ class CriarTransporteView(View):
             messages.error(request, "Informe ao menos uma carga.")
             return render(request, self.template_name)
 
+        # Valida tudo em memória antes de abrir a transação
+        cargas, entregas, erros_cargas = montar_cargas(
+            cargas_list, seq_list, total_entregas_list, mod_list,
+            entrega_numeros, entrega_carga_ref,
+        )
+        if erros_cargas:
+            for e in erros_cargas:
+                messages.error(request, e)
+            return render(request, self.template_name)
+
         try:
             with transaction.atomic():
                 # LECOM
@@ -97,41 +123,11 @@ class CriarTransporteView(View):
                     tipo_veiculo=tipo_veiculo
                 )
 
-                # Cargas
-                cargas_salvas = []
-                for i, carga_num in enumerate(cargas_list):
-                    if Carga.objects.filter(lecom=lecom, carga=carga_num).exists():
-                        messages.error(
-                            request,
-                            f"A carga {carga_num} já existe para este LECOM."
-                        )
-                        raise ValueError
-
-                    carga_obj = Carga.objects.create(
-                        lecom=lecom,
-                        carga=carga_num,
-                        seq=int(
-                            seq_list[i]) if seq_list and seq_list[i] else i + 1,
-                        total_entregas=total_entregas_list[i] if total_entregas_list and total_entregas_list[i] else "1",
-                        mod=mod_list[i] if mod_list and mod_list[i] else "-",
-                    )
-                    cargas_salvas.append(carga_obj)
-
-                # Entregas
-                for i, numero in enumerate(entrega_numeros):
-                    if not numero.strip():
-                        continue
-                    carga_index = int(entrega_carga_ref[i])
-                    Entrega.objects.create(
-                        numero=numero,
-                        carga=cargas_salvas[carga_index]
-                    )
-
-                # 🔄 Sincroniza com expedição
-                sincronizar_expedicao(lecom)
+                # Cargas e entregas
+                cargas = criar_cargas(lecom, cargas, entregas)
 
-        except ValueError:
-            return render(request, self.template_name)
+                # 🔄 Sincroniza com expedição (worker, após o commit)
+                agendar_sincronizacao(lecom, cargas=cargas)
 
         except Exception:
             messages.error(request, "Erro inesperado ao salvar o transporte.")
@@ -141,14 +137,20 @@ class CriarTransporteView(View):
         return render(request, "transport/cenario_transporte.html")
 
 
-class CenarioTransporteView(ListView):
+class CenarioTransporteView(KeysetPaginationMixin, ListView):
     model = Lecom
     template_name = "transport/cenario_transporte.html"
     context_object_name = "lecoms"
     ordering = ["-id"]
+    keyset_ordering = ("-id",)
 
     def get_queryset(self):
-        queryset = super().get_queryset().prefetch_related("cargas", "veiculo")
+        queryset = (
+            super()
+            .get_queryset()
+            .select_related("veiculo")
+            .prefetch_related(prefetch_cargas_transporte())
+        )
 
         # Filtragem via GET
         transporte_id = self.request.GET.get("transporte_id")
@@ -162,23 +164,17 @@ class CenarioTransporteView(ListView):
         if transporte_id and transporte_id.isdigit():
             queryset = queryset.filter(id=int(transporte_id))
         if lecom:
-            queryset = queryset.filter(lecom__icontains=lecom)
+            queryset = filtrar_texto(queryset, "lecom", lecom)
         if status in ["LIBERADO", "BLOQUEADO"]:
             queryset = queryset.filter(status=status)
         if data:
             queryset = queryset.filter(data=data)
         if carga:
-            queryset = queryset.filter(
-                cargas__carga__icontains=carga).distinct()
+            queryset = filtrar_texto(queryset, "cargas__carga", carga)
         if veiculo:
             queryset = queryset.filter(veiculo__tipo_veiculo=veiculo)
         if destino:
-            queryset = queryset.filter(destino__icontains=destino)
-
-        # Garante que peso e m3 sejam Decimal válidos
-        for lecom_obj in queryset:
-            lecom_obj.peso = safe_decimal(lecom_obj.peso)
-            lecom_obj.m3 = safe_decimal(lecom_obj.m3)
+            queryset = filtrar_texto(queryset, "destino", destino)
 
         return queryset
 
@@ -189,18 +185,170 @@ class CenarioTransporteView(ListView):
         context["veiculos"] = Veiculo.TIPO_VEICULO_CHOICES
 
         # Agrupamento de cargas por lecom
-        grupo_cargas = []
-        for lecom_obj in context["lecoms"]:
-            grupo_cargas.append({
-                "grupo": lecom_obj,
-                "cargas": lecom_obj.cargas.all().order_by("seq")
-            })
-        context["grupo_cargas"] = grupo_cargas
-        context["total_lecoms"] = context["lecoms"].count()
+        context["grupo_cargas"] = agrupar_cenario(context["lecoms"])
+        context["total_lecoms"] = len(context["grupo_cargas"])
 
         return context
 
 
+class ExportarTransporteView(ExportacaoMixin, CenarioTransporteView):
+    """
+    Cenário de transporte em CSV/XLSX: uma linha por carga, com os filtros da tela
+    """
+
+    nome_exportacao = "cenario_transporte"
+    ordenacao_exportacao = ("-id", "cargas__seq")
+    colunas_exportacao = [
+        ("ID", "id"),
+        ("LECOM", "lecom"),
+        ("Destino", "destino"),
+        ("UF", "uf"),
+        ("Data", "data"),
+        ("Status", "status"),
+        ("Veículo", "veiculo__tipo_veiculo"),
+        ("Peso", "peso"),
+        ("M³", "m3"),
+        ("SEQ", "cargas__seq"),
+        ("Carga", "cargas__carga"),
+        ("Entregas", "cargas__total_entregas"),
+        ("MOD", "cargas__mod"),
+        ("Observação", "observacao"),
+    ]
+
+
+# =================== API JSON ===================
+
+def _veiculo(lecom):
+    veiculo = getattr(lecom, "veiculo", None)
+    return veiculo.tipo_veiculo if veiculo else None
+
+
+def _status_separacao(lecom):
+    controle = getattr(lecom, "controle_separacao", None)
+    return controle.status if controle else None
+
+
+def _cargas(lecom):
+    return [
+        {
+            "id": carga.id,
+            "seq": carga.seq,
+            "carga": carga.carga,
+            "total_entregas": carga.total_entregas,
+            "mod": carga.mod,
+        }
+        for carga in lecom.cargas.all()
+    ]
+
+
+# Campo da API → valor a partir do Lecom (com relações já carregadas)
+CAMPOS_API = {
+    "id": lambda lecom: lecom.id,
+    "lecom": lambda lecom: lecom.lecom,
+    "destino": lambda lecom: lecom.destino,
+    "uf": lambda lecom: lecom.uf,
+    "data": lambda lecom: lecom.data,
+    "peso": lambda lecom: lecom.peso,
+    "m3": lambda lecom: lecom.m3,
+    "status": lambda lecom: lecom.status,
+    "observacao": lambda lecom: lecom.observacao,
+    "veiculo": _veiculo,
+    "status_separacao": _status_separacao,
+    "cargas": _cargas,
+}
+
+RELACOES_API = {
+    "veiculo": "veiculo",
+    "status_separacao": "controle_separacao",
+}
+
+# Tabelas que compõem a resposta; qualquer escrita nelas muda o ETag
+MODELOS_API = (Lecom, Carga, Veiculo, ControleSeparacao)
+
+
+def _estado_api(request):
+    # O decorator condition chama etag e last_modified: uma consulta só
+    if not hasattr(request, "_estado_api"):
+        request._estado_api = estado_das_tabelas(*MODELOS_API)
+    return request._estado_api
+
+
+def etag_api(request, *args, **kwargs):
+    versoes, _ = _estado_api(request)
+    chave = "%s|%s" % ("-".join(map(str, versoes)), request.GET.urlencode())
+    return hashlib.md5(chave.encode()).hexdigest()
+
+
+def last_modified_api(request, *args, **kwargs):
+    _, alterado_em = _estado_api(request)
+    return alterado_em
+
+
+class LecomApiView(CenarioTransporteView):
+    """
+    API somente leitura dos LECOMs, com os filtros do cenário de transporte.
+
+    ?fields=lecom,status,cargas escolhe os campos; ?cursor= pagina.
+    Com If-None-Match / If-Modified-Since, responde 304 sem consultar os
+    LECOMs enquanto nenhuma das tabelas da resposta mudar.
+    """
+
+    paginate_by = 100
+    limite_maximo = 500
+
+    def campos(self):
+        pedidos = self.request.GET.get("fields")
+        if not pedidos:
+            return list(CAMPOS_API)
+        return [campo.strip() for campo in pedidos.split(",") if campo.strip()]
+
+    def consulta(self, campos):
+        # Só carrega as relações dos campos pedidos
+        queryset = self.get_queryset().select_related(None)
+        relacoes = [RELACOES_API[campo] for campo in campos if campo in RELACOES_API]
+        if relacoes:
+            queryset = queryset.select_related(*relacoes)
+        if "cargas" not in campos:
+            queryset = queryset.prefetch_related(None)
+        return queryset
+
+    def limite(self):
+        try:
+            limite = int(self.request.GET.get("limit", self.paginate_by))
+        except ValueError:
+            return self.paginate_by
+        return max(1, min(limite, self.limite_maximo))
+
+    @method_decorator(condition(etag_func=etag_api, last_modified_func=last_modified_api))
+    def get(self, request, *args, **kwargs):
+        campos = self.campos()
+        invalidos = [campo for campo in campos if campo not in CAMPOS_API]
+        if invalidos:
+            return JsonResponse(
+                {"erro": f"Campos inválidos: {', '.join(invalidos)}",
+                 "campos_disponiveis": list(CAMPOS_API)},
+                status=400,
+            )
+
+        pagina = paginar_keyset(
+            request, self.consulta(campos), self.keyset_ordering, self.limite()
+        )
+        resultados = [
+            {campo: CAMPOS_API[campo](lecom) for campo in campos}
+            for lecom in pagina
+        ]
+
+        return JsonResponse({
+            "resultados": resultados,
+            "proximo": request.build_absolute_uri(pagina.next_url) if pagina.has_next() else None,
+            "anterior": request.build_absolute_uri(pagina.previous_url) if pagina.has_previous() else None,
+        })
+
+
+# Campos do Lecom gravados pela edição
+CAMPOS_EDICAO_LECOM = ["lecom", "destino", "uf", "data", "observacao", "status", "peso", "m3"]
+
+
 class EditarTransporteView(View):
     template_name = "transport/editar_transporte.html"
     success_url = reverse_lazy("transport:cenario_transporte")
@@ -218,57 +366,73 @@ class EditarTransporteView(View):
         lecom = get_object_or_404(Lecom, pk=pk)
 
         try:
-            # Atualiza campos do Lecom
-            lecom.lecom = request.POST.get("lecom")
-            lecom.destino = request.POST.get("destino")
-            lecom.uf = request.POST.get("uf")
-            lecom.data = request.POST.get("data")
-            lecom.observacao = request.POST.get("observacao")
-            lecom.status = request.POST.get("status", "BLOQUEADO")
-            lecom.peso = safe_decimal(request.POST.get("peso"))
-            lecom.m3 = safe_decimal(request.POST.get("m3"))
-            lecom.save()
-
-            # Atualiza veículo
-            tipo_veiculo = request.POST.get("tipo_veiculo", "Não informado")
-            Veiculo.objects.update_or_create(
-                lecom=lecom,
-                defaults={"tipo_veiculo": tipo_veiculo}
-            )
+            with transaction.atomic():
+                # Atualiza campos do Lecom: UPDATE condicional à versão
+                # lida no GET (outro planejador pode ter gravado antes)
+                lecom.lecom = request.POST.get("lecom")
+                lecom.destino = request.POST.get("destino")
+                lecom.uf = request.POST.get("uf")
+                lecom.data = parse_date(request.POST.get("data", "").strip())
+                lecom.observacao = request.POST.get("observacao")
+                lecom.status = request.POST.get("status", "BLOQUEADO")
+                lecom.peso = safe_decimal(request.POST.get("peso"))
+                lecom.m3 = safe_decimal(request.POST.get("m3"))
+                lecom.versao = int(request.POST.get("versao") or lecom.versao)
+                gravar_com_versao([lecom], CAMPOS_EDICAO_LECOM)
+                registrar_alteracao(Lecom)
+
+                # Atualiza veículo
+                tipo_veiculo = request.POST.get("tipo_veiculo", "Não informado")
+                Veiculo.objects.update_or_create(
+                    lecom=lecom,
+                    defaults={"tipo_veiculo": tipo_veiculo}
+                )
 
-            # Atualiza cargas
-            carga_nomes = request.POST.getlist("carga[]")
-            seqs = request.POST.getlist("seq[]")
-            total_entregas_list = request.POST.getlist("total_entregas[]")
-            mods = request.POST.getlist("mod[]")
-            carga_ids = request.POST.getlist("carga_id[]")
-            cargas_existentes = list(lecom.cargas.all().order_by("seq"))
-
-            for i, carga_nome in enumerate(carga_nomes):
-                if carga_ids and i < len(carga_ids):
-                    carga = get_object_or_404(Carga, pk=carga_ids[i])
-                elif i < len(cargas_existentes):
-                    carga = cargas_existentes[i]
-                else:
-                    continue
-
-                carga.carga = carga_nome
-                carga.seq = int(seqs[i]) if i < len(
-                    seqs) and seqs[i] else i + 1
-                carga.total_entregas = (
-                    total_entregas_list[i]
-                    if i < len(total_entregas_list) and total_entregas_list[i]
-                    else "1"
+                # Atualiza cargas: uma leitura, e só escreve o que mudou
+                diff = diff_cargas(
+                    list(lecom.cargas.all().order_by("seq")),
+                    request.POST.getlist("carga_id[]"),
+                    request.POST.getlist("carga[]"),
+                    request.POST.getlist("seq[]"),
+                    request.POST.getlist("total_entregas[]"),
+                    request.POST.getlist("mod[]"),
                 )
-                carga.mod = mods[i] if i < len(mods) and mods[i] else "-"
-                carga.save()
+                aplicar_diff_cargas(lecom, diff)
 
-            # 🔄 Regras de negócio da expedição
-            sincronizar_expedicao(lecom)
+                # 🔄 Regras de negócio da expedição (worker, após o commit)
+                agendar_sincronizacao(lecom, cargas=diff.cargas)
 
             messages.success(request, f"Transporte {lecom.lecom} atualizado com sucesso.")
             return redirect("transport:cenario_transporte")
 
+        except ConflitoDeVersao as conflito:
+            # Nada foi gravado: o formulário volta com os valores enviados
+            # (Lecom e cargas) e a versão atual; as cargas gravadas pelo
+            # outro usuário aparecem no quadro de diferenças
+            atual = conflito.conflitos[0].atual
+            if atual is None:
+                raise Http404("Transporte removido.")
+            lecom.versao = atual.versao
+            cargas = cargas_do_formulario(
+                request.POST.getlist("carga_id[]"),
+                request.POST.getlist("carga[]"),
+                request.POST.getlist("seq[]"),
+                request.POST.getlist("total_entregas[]"),
+                request.POST.getlist("mod[]"),
+            )
+            messages.warning(
+                request,
+                f"O transporte {atual.lecom} foi alterado por outro usuário. "
+                "Confira as diferenças e salve novamente para manter os seus valores.",
+            )
+            return render(request, self.template_name, {
+                "lecom": lecom,
+                "cargas": cargas,
+                "modo_edicao": True,
+                "conflitos": conflito.conflitos,
+                "diferencas_cargas": diferencas_de_cargas(cargas, atual.cargas.all().order_by("seq")),
+            })
+
         except Exception:
             messages.error(request, f"Erro ao atualizar o transporte {lecom.lecom}")
 